@@ -1,5 +1,10 @@
+import json
+
 from django.contrib import admin
-from .models import IncomingCall, CallDisposition, CallNote
+from django.db.models import Q
+from django.utils.html import format_html
+from .models import ArchivedCall, ArchivedCallNote, IncomingCall, CallDisposition, CallNote
+from .search import search_filter
 
 
 @admin.register(CallDisposition)
@@ -12,6 +17,19 @@ class CallDispositionAdmin(admin.ModelAdmin):
     ordering = ['category', 'name']
 
 
+class CallSearchMixin:
+    """Search calls through the search.py indexes (number or name fragment) or by exact call_id"""
+
+    search_fields = ['call_id', 'caller_number', 'caller_name', 'customer_name']
+    search_help_text = 'Part of a phone number or name, or a call ID'
+
+    def get_search_results(self, request, queryset, search_term):
+        condition = search_filter(search_term)
+        if condition is None:
+            return queryset, False
+        return queryset.filter(condition | Q(call_id=search_term.strip())), False
+
+
 class CallNoteInline(admin.TabularInline):
     """Inline admin for CallNote"""
 
@@ -22,7 +40,7 @@ class CallNoteInline(admin.TabularInline):
 
 
 @admin.register(IncomingCall)
-class IncomingCallAdmin(admin.ModelAdmin):
+class IncomingCallAdmin(CallSearchMixin, admin.ModelAdmin):
     """Admin interface for IncomingCall"""
 
     list_display = [
@@ -35,12 +53,7 @@ class IncomingCallAdmin(admin.ModelAdmin):
         'disposition__category', 'call_start_time'
     ]
 
-    search_fields = [
-        'call_id', 'caller_number', 'caller_name', 'customer_name',
-        'staff_name', 'vehicle_model'
-    ]
-
-    readonly_fields = ['created_at', 'updated_at', 'raw_webhook_data']
+    readonly_fields = ['created_at', 'updated_at', 'raw_payload']
 
     fieldsets = (
         ('Call Information', {
@@ -69,7 +82,7 @@ class IncomingCallAdmin(admin.ModelAdmin):
             'fields': ('is_lead', 'lead_quality')
         }),
         ('Metadata', {
-            'fields': ('raw_webhook_data', 'created_at', 'updated_at'),
+            'fields': ('raw_payload', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
@@ -79,6 +92,14 @@ class IncomingCallAdmin(admin.ModelAdmin):
     date_hierarchy = 'call_start_time'
     ordering = ['-call_start_time']
 
+    @admin.display(description='Raw webhook data')
+    def raw_payload(self, obj):
+        """Payload from CallPayload (or inline), loaded only on the change page"""
+        data = obj.get_raw_webhook_data()
+        if data is None:
+            return '-'
+        return format_html('<pre>{}</pre>', json.dumps(data, indent=2, ensure_ascii=False))
+
 
 @admin.register(CallNote)
 class CallNoteAdmin(admin.ModelAdmin):
@@ -89,3 +110,40 @@ class CallNoteAdmin(admin.ModelAdmin):
     search_fields = ['note', 'created_by', 'call__call_id']
     readonly_fields = ['created_at']
     ordering = ['-created_at']
+
+
+class ArchivedCallNoteInline(admin.TabularInline):
+    """Inline admin for ArchivedCallNote"""
+
+    model = ArchivedCallNote
+    extra = 0
+    fields = ['note', 'created_by', 'created_at']
+
+
+@admin.register(ArchivedCall)
+class ArchivedCallAdmin(CallSearchMixin, admin.ModelAdmin):
+    """Read-only admin for calls moved to the archive by archive_calls"""
+
+    list_display = [
+        'call_id', 'caller_number', 'caller_name', 'call_start_time',
+        'call_status', 'disposition', 'staff_name', 'archived_at'
+    ]
+    list_filter = ['call_status', 'is_lead', 'lead_quality']
+
+    exclude = ['payload']
+    readonly_fields = ['raw_payload']
+    inlines = [ArchivedCallNoteInline]
+
+    date_hierarchy = 'call_start_time'
+    ordering = ['-call_start_time']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    raw_payload = IncomingCallAdmin.raw_payload
@@ -0,0 +1,368 @@
+"""
+Shared response cache for the analytics actions (stats, by_disposition, recent)
+
+Responses are cached in settings.ANALYTICS_CACHE (any Django cache backend)
+under the action plus the query parameters it reads (KEY_PARAMS). Each
+entry records when it was computed, the start of the time window it covers
+and the ChangeVersion versions of the disposition and note tables.
+
+Saving a call stamps the day (UTC) the call started on in the cache, and
+an entry is stale once any day in its window was stamped after it was
+computed - a call outside the window leaves it alone. Stamps reach other
+workers, drain_webhook_spool and import_calls through a shared cache
+(ANALYTICS_CACHE_BACKEND). Disposition and note changes are not tied to a
+day: an entry is also stale once those tables' versions differ from the
+ones @conditional loaded for the request reading it, which holds for writes
+from any process. Entries also expire after ANALYTICS_CACHE_TTL seconds, as
+the windows move with the clock.
+
+Concurrent misses for the same key are coalesced: one request recomputes
+(per process via a lock, across processes via cache.add()) and the others
+wait for its result. Async views use the a-prefixed methods, which go
+through the cache's async API.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from rest_framework.response import Response
+
+from .versions import request_versions
+
+# Query parameters each action's response depends on - anything else (cache
+# busters, ?format=) shares the entry
+KEY_PARAMS = {
+    'stats': ('days', 'group_by'),
+    'by_disposition': ('days',),
+    'recent': ('view', 'fields', 'omit', 'cursor', 'approx_total', 'include_archive'),
+}
+
+# Tables whose writes are not stamped per day; entries are checked against their versions
+VERSIONED_TABLES = ('callnote', 'calldisposition')
+
+ALL_DAYS_KEY = 'analytics:changed:all'
+
+
+def _day_key(day):
+    return f'analytics:changed:{day.isoformat()}'
+
+
+def _utc_day(value):
+    if isinstance(value, (int, float)):
+        value = datetime.fromtimestamp(value, tz=dt_timezone.utc)
+    elif isinstance(value, str):
+        value = parse_datetime(value)
+        if value is None:
+            return None
+    if value.tzinfo is not None:
+        value = value.astimezone(dt_timezone.utc)
+    return value.date()
+
+
+class AnalyticsCache:
+    """Cached analytics responses with per-day invalidation and single-flight recompute"""
+
+    def __init__(self, alias, ttl=300, lock_timeout=30):
+        self.cache = caches[alias]
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self._locks = {}
+        # asyncio locks for aget_or_compute() (async views run on one event loop)
+        self._async_locks = {}
+        self._locks_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.stale = 0
+
+    def _count(self, name):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @staticmethod
+    def make_key(action, query_params):
+        """Cache key for an action and the KEY_PARAMS it reads (order does not matter)"""
+        params = sorted(
+            (name, value)
+            for name in KEY_PARAMS[action]
+            for value in query_params.getlist(name)
+        )
+        digest = hashlib.sha1(repr(params).encode('utf-8')).hexdigest()
+        return f'analytics:{action}:{digest}'
+
+    def _stamp_keys(self, entry):
+        """Change stamps an entry must be newer than: every day of its window"""
+        first_day = _utc_day(entry['window_start'])
+        last_day = _utc_day(time.time())
+        keys = [ALL_DAYS_KEY]
+        day = first_day
+        while day <= last_day:
+            keys.append(_day_key(day))
+            day += timedelta(days=1)
+        return keys
+
+    @staticmethod
+    def _versions(versions):
+        """The VERSIONED_TABLES part of a request's {table: version}"""
+        return {table: version for table, version in (versions or {}).items() if table in VERSIONED_TABLES}
+
+    def _is_fresh(self, entry, versions):
+        if entry['versions'] != self._versions(versions):
+            return False
+        stamps = self.cache.get_many(self._stamp_keys(entry))
+        return all(stamp < entry['computed_at'] for stamp in stamps.values())
+
+    def _entry(self, data, status, computed_at, window_start, versions):
+        return {
+            'data': data,
+            'status': status,
+            'computed_at': computed_at,
+            'window_start': window_start,
+            'versions': self._versions(versions),
+        }
+
+    def get(self, key, versions=None):
+        """(data, status) of an entry fresh at these table versions, or None"""
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        if not self._is_fresh(entry, versions):
+            self._count('stale')
+            return None
+        return entry['data'], entry['status']
+
+    def _hold(self, locks, key, new_lock):
+        """The lock of key in locks, counting one more user"""
+        with self._locks_lock:
+            slot = locks.get(key)
+            if slot is None:
+                slot = locks[key] = [new_lock(), 0]
+            slot[1] += 1
+            return slot[0]
+
+    def _unhold(self, locks, key):
+        """Count one user less; the lock is dropped with its last user"""
+        with self._locks_lock:
+            slot = locks[key]
+            slot[1] -= 1
+            if not slot[1]:
+                del locks[key]
+
+    @contextmanager
+    def _local_lock(self, key):
+        """Per-key lock of this process, kept only while a thread holds or waits for it"""
+        lock = self._hold(self._locks, key, threading.Lock)
+        try:
+            with lock:
+                yield
+        finally:
+            self._unhold(self._locks, key)
+
+    def get_or_compute(self, key, window_start, compute, versions=None):
+        """
+        Cached (data, status) for key, or compute() -> (data, status, cacheable)
+
+        window_start is a unix timestamp: the oldest call time the data covers;
+        versions the request's {table: version} (see request_versions()).
+        """
+        hit = self.get(key, versions)
+        if hit is not None:
+            self._count('hits')
+            return hit
+
+        with self._local_lock(key):
+            # Another thread of this process may have filled it meanwhile
+            hit = self.get(key, versions)
+            if hit is not None:
+                self._count('waits')
+                return hit
+
+            lock_key = f'{key}:lock'
+            deadline = time.monotonic() + self.lock_timeout
+            while not (locked := self.cache.add(lock_key, 1, timeout=self.lock_timeout)):
+                # Another process is computing it
+                time.sleep(0.05)
+                hit = self.get(key, versions)
+                if hit is not None:
+                    self._count('waits')
+                    return hit
+                if time.monotonic() > deadline:
+                    # Compute without the lock, which stays its holder's
+                    break
+
+            try:
+                self._count('misses')
+                # Stamped before computing: a write committed during the
+                # computation makes this entry stale straight away
+                computed_at = time.time()
+                data, status, cacheable = compute()
+                if cacheable:
+                    self.cache.set(
+                        key, self._entry(data, status, computed_at, window_start, versions), timeout=self.ttl
+                    )
+                return data, status
+            finally:
+                if locked:
+                    self.cache.delete(lock_key)
+
+    async def aget(self, key, versions=None):
+        """get() for async views"""
+        entry = await self.cache.aget(key)
+        if entry is None:
+            return None
+        fresh = entry['versions'] == self._versions(versions)
+        if fresh:
+            stamps = await self.cache.aget_many(self._stamp_keys(entry))
+            fresh = all(stamp < entry['computed_at'] for stamp in stamps.values())
+        if not fresh:
+            self._count('stale')
+            return None
+        return entry['data'], entry['status']
+
+    @asynccontextmanager
+    async def _async_lock(self, key):
+        """_local_lock() for coroutines"""
+        lock = self._hold(self._async_locks, key, asyncio.Lock)
+        try:
+            async with lock:
+                yield
+        finally:
+            self._unhold(self._async_locks, key)
+
+    async def aget_or_compute(self, key, window_start, compute, versions=None):
+        """get_or_compute() for async views; compute is a coroutine function"""
+        hit = await self.aget(key, versions)
+        if hit is not None:
+            self._count('hits')
+            return hit
+
+        async with self._async_lock(key):
+            hit = await self.aget(key, versions)
+            if hit is not None:
+                self._count('waits')
+                return hit
+
+            lock_key = f'{key}:lock'
+            deadline = time.monotonic() + self.lock_timeout
+            while not (locked := await self.cache.aadd(lock_key, 1, timeout=self.lock_timeout)):
+                await asyncio.sleep(0.05)
+                hit = await self.aget(key, versions)
+                if hit is not None:
+                    self._count('waits')
+                    return hit
+                if time.monotonic() > deadline:
+                    break
+
+            try:
+                self._count('misses')
+                computed_at = time.time()
+                data, status, cacheable = await compute()
+                if cacheable:
+                    await self.cache.aset(
+                        key, self._entry(data, status, computed_at, window_start, versions), timeout=self.ttl
+                    )
+                return data, status
+            finally:
+                if locked:
+                    await self.cache.adelete(lock_key)
+
+    def invalidate_days(self, call_times):
+        """Mark the days these calls started on as changed"""
+        now = time.time()
+        days = {_utc_day(value) for value in call_times if value is not None} - {None}
+        if days:
+            self.cache.set_many({_day_key(day): now for day in days}, timeout=self.ttl)
+
+    def invalidate_all(self):
+        self.cache.set(ALL_DAYS_KEY, time.time(), timeout=self.ttl)
+
+    def stats(self):
+        with self._counter_lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'waits': self.waits,
+                'stale': self.stale,
+                'ttl_seconds': self.ttl,
+            }
+
+
+_analytics_cache = None
+_analytics_cache_lock = threading.Lock()
+
+
+def get_analytics_cache():
+    """Cache configured by settings.ANALYTICS_CACHE, or None when ANALYTICS_CACHE_TTL is 0"""
+    global _analytics_cache
+    if settings.ANALYTICS_CACHE_TTL <= 0:
+        return None
+
+    if _analytics_cache is None:
+        with _analytics_cache_lock:
+            if _analytics_cache is None:
+                _analytics_cache = AnalyticsCache(
+                    settings.ANALYTICS_CACHE,
+                    ttl=settings.ANALYTICS_CACHE_TTL,
+                    lock_timeout=settings.ANALYTICS_CACHE_LOCK_TIMEOUT,
+                )
+    return _analytics_cache
+
+
+def calls_changed(call_times):
+    """Invalidate cached analytics covering these call start times once the transaction commits"""
+    analytics_cache = get_analytics_cache()
+    if analytics_cache is not None:
+        call_times = list(call_times)
+        transaction.on_commit(lambda: analytics_cache.invalidate_days(call_times))
+
+
+def everything_changed():
+    analytics_cache = get_analytics_cache()
+    if analytics_cache is not None:
+        transaction.on_commit(analytics_cache.invalidate_all)
+
+
+def cached_analytics(window):
+    """
+    Cache a viewset action's 200 responses
+
+    window(request) returns how far back the action's data reaches (a
+    timedelta); a ValueError there skips the cache and lets the view answer.
+    Put it inside @conditional, whose table versions the entries are checked
+    against.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            analytics_cache = get_analytics_cache()
+            if analytics_cache is None:
+                return view(self, request, *args, **kwargs)
+
+            try:
+                window_start = time.time() - window(request).total_seconds()
+            except (TypeError, ValueError):
+                return view(self, request, *args, **kwargs)
+
+            def compute():
+                response = view(self, request, *args, **kwargs)
+                cacheable = isinstance(response, Response) and response.status_code == 200
+                return response.data, response.status_code, cacheable
+
+            key = AnalyticsCache.make_key(view.__name__, request.query_params)
+            data, status = analytics_cache.get_or_compute(key, window_start, compute, request_versions(request))
+            return Response(data, status=status)
+
+        return wrapper
+
+    return decorator
@@ -5,3 +5,6 @@ class CallmanagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'callmanagement'
     verbose_name = 'Call Management'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,100 @@
+"""
+Hot/archive split of the calls table
+
+archive_calls() moves calls that started before a cutoff - with their
+notes and payloads - from IncomingCall / CallNote / CallPayload to
+ArchivedCall / ArchivedCallNote, so the tables every webhook upsert and
+dashboard query touches only hold the recent calls. The lists, detail and
+export read both with ?include_archive=true (AnyCall).
+
+The hot rows are removed without the delete signals: an archived call is
+still a call, so it stays counted in CallRollup and is not published as
+'deleted' on the event stream.
+
+A webhook for a call that is already archived creates a new hot row,
+which the lists show instead of the archived one; the rollups count both
+until the next run merges it into the archived row (the newer values win).
+"""
+
+from django.db import transaction
+
+from .analytics_cache import calls_changed
+from .models import IncomingCall, ArchivedCall, ArchivedCallNote, CallNote, CallPayload, ROLLUP_FIELDS
+from .rollups import apply_rollup_changes
+from .versions import mark_changed
+
+CALL_FIELDS = tuple(field.attname for field in IncomingCall._meta.concrete_fields)
+
+NOTE_FIELDS = ('id', 'call_id', 'note', 'created_by', 'created_at')
+
+# Columns an archived row takes from a newer hot row of the same call
+MERGE_FIELDS = [name for name in CALL_FIELDS if name not in ('id', 'call_id')] + ['payload', 'archived_at']
+
+
+def archive_chunk(before, chunk_size):
+    """Move up to chunk_size of the oldest calls started before `before`; returns the calls moved"""
+    with transaction.atomic():
+        # Locked, so a webhook updating one of them waits for the move
+        rows = list(
+            IncomingCall.objects.select_for_update()
+            .filter(call_start_time__lt=before)
+            .order_by('call_start_time', 'id')
+            .values(*CALL_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            return []
+
+        pks = [row['id'] for row in rows]
+        call_ids = [row['call_id'] for row in rows]
+        payloads = dict(CallPayload.objects.filter(call_id__in=pks).values_list('call_id', 'data'))
+
+        # Calls archived before: their old values leave the rollups, the
+        # hot row replacing them was counted when it was saved
+        merged = list(ArchivedCall.objects.filter(call_id__in=call_ids).values(*ROLLUP_FIELDS))
+        if merged:
+            apply_rollup_changes([(values, None) for values in merged])
+
+        ArchivedCall.objects.bulk_create(
+            [ArchivedCall(**row, payload=payloads.get(row['id'])) for row in rows],
+            update_conflicts=True,
+            unique_fields=['call_id'],
+            update_fields=MERGE_FIELDS,
+        )
+
+        # A merged call keeps its archived id - point its new notes there
+        archived_pks = dict(ArchivedCall.objects.filter(call_id__in=call_ids).values_list('call_id', 'pk'))
+        new_pks = {row['id']: archived_pks[row['call_id']] for row in rows}
+        notes = CallNote.objects.filter(call_id__in=pks).values(*NOTE_FIELDS)
+        ArchivedCallNote.objects.bulk_create(
+            [ArchivedCallNote(**{**note, 'call_id': new_pks[note['call_id']]}) for note in notes]
+        )
+
+        # No post_delete: rollups, events and the callback registry are left alone
+        for queryset in (
+            CallPayload.objects.filter(call_id__in=pks),
+            CallNote.objects.filter(call_id__in=pks),
+            IncomingCall.objects.filter(pk__in=pks),
+        ):
+            queryset._raw_delete(queryset.db)
+
+        mark_changed(IncomingCall, CallNote)
+        calls_changed([row['call_start_time'] for row in rows])
+    return rows
+
+
+def archive_calls(before, chunk_size=1000, stdout=None):
+    """
+    Move every call started before `before` to the archive
+
+    One transaction per chunk, oldest calls first, so it can be interrupted
+    and rerun. Returns the number of calls moved.
+    """
+    archived = 0
+    while True:
+        rows = archive_chunk(before, chunk_size)
+        if not rows:
+            break
+        archived += len(rows)
+        if stdout is not None:
+            stdout.write(f"Archived {archived} calls (up to {rows[-1]['call_start_time']:%Y-%m-%d %H:%M})")
+    return archived
@@ -0,0 +1,204 @@
+"""
+Async webhook receiver and call lists (missed, pending, recent)
+
+Routed in place of the same URLs of WebhookViewSet / IncomingCallViewSet
+when settings.ASYNC_VIEWS is on, under the ASGI entry point
+(incomingcall.asgi, e.g. uvicorn). The database work of each request -
+the list queries and serializers, the webhook's validation and save, the
+replay lookups of the db store - runs through dbthreads.in_db_thread(), in
+a pool of threads with a connection each. Django's async ORM would queue
+all of it on one thread per worker, so a slow query would stall every
+request of the worker; in the pool it only holds its own thread.
+
+Responses are the same JSON as the sync views return (no browsable API).
+"""
+
+import logging
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.utils import timezone
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from .analytics_cache import AnalyticsCache, get_analytics_cache
+from .dbthreads import in_db_thread
+from .log import PhaseTimer
+from .models import IncomingCall, CallDisposition, CallNote, MISSED_CALL_STATUSES
+from .pagination import CallPagination
+from .replays import fingerprint, get_replay_cache
+from .versions import conditional_view, request_versions
+from .views import IncomingCallViewSet, WebhookViewSet
+
+logger = logging.getLogger(__name__)
+webhook_logger = logging.getLogger('callmanagement.webhook')
+
+
+def render(data, status_code=status.HTTP_200_OK, headers=None):
+    """JSON response rendered as the DRF views render it"""
+    return HttpResponse(
+        JSONRenderer().render(data), status=status_code, content_type='application/json', headers=headers
+    )
+
+
+def api_errors(view):
+    """Answer DRF exceptions (NotFound, ValidationError, ParseError) as DRF would"""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        except APIException as exc:
+            response = exception_handler(exc, {})
+            return render(response.data, response.status_code)
+
+    return wrapper
+
+
+@csrf_exempt
+@require_POST
+@api_errors
+async def webhook(request):
+    """WebhookViewSet.create"""
+    timer = PhaseTimer()
+
+    request = Request(request, parsers=[parser() for parser in WebhookViewSet.parser_classes])
+    with timer.phase('parse'):
+        webhook_data = request.data
+
+    if not webhook_data or not isinstance(webhook_data, dict):
+        logger.warning('Webhook body is not a dict: %s', type(webhook_data).__name__)
+        webhook_data = {}
+
+    summary = {'call_id': webhook_data.get('call_id')}
+
+    replays = get_replay_cache()
+    payload_key = None
+    if replays is not None and webhook_data:
+        with timer.phase('dedupe'):
+            payload_key = fingerprint(webhook_data)
+            replayed = await replays.aget(payload_key)
+            if replayed is None and not await replays.aclaim(payload_key):
+                replayed = await replays.await_for(payload_key)
+                if replayed is None:
+                    response = WebhookViewSet._in_flight(timer, summary)
+                    return render(response.data, response.status_code)
+        if replayed is not None:
+            status_code, data = replayed
+            summary['outcome'] = 'duplicate'
+            summary['status'] = status_code
+            webhook_logger.info('webhook duplicate', extra={'fields': {**summary, **timer.fields()}})
+            return render(data, status_code, headers={'X-Webhook-Replay': 'true'})
+
+    # Validation and the save need a transaction - sync, in a database thread
+    try:
+        response = await in_db_thread(WebhookViewSet()._process, webhook_data, timer, summary)
+    except Exception:
+        if payload_key is not None:
+            await replays.arelease(payload_key)
+        raise
+
+    if payload_key is not None:
+        if status.is_success(response.status_code):
+            await replays.aput(payload_key, response.status_code, response.data)
+        else:
+            await replays.arelease(payload_key)
+
+    summary['status'] = response.status_code
+    webhook_logger.info('webhook %s', summary['outcome'], extra={'fields': {**summary, **timer.fields()}})
+    return render(response.data, response.status_code)
+
+
+def call_view(request, action):
+    """IncomingCallViewSet set up for request, for its serializers, projection and paginator"""
+    return IncomingCallViewSet(request=Request(request), action=action, format_kwarg=None, args=(), kwargs={})
+
+
+def paginated(view, queryset, total_key):
+    """(data, status) of a list action: a page, or every row when pagination is off"""
+    page = view.paginate_queryset(queryset)
+    if page is not None:
+        serializer = view.get_serializer(page, many=True)
+        return view.get_paginated_response(serializer.data).data, status.HTTP_200_OK
+
+    serializer = view.get_serializer(queryset, many=True)
+    data = serializer.data
+    return {
+        'status': 'success',
+        total_key: len(data),
+        'data': data
+    }, status.HTTP_200_OK
+
+
+@require_GET
+@conditional_view(IncomingCall, CallDisposition, CallNote, windowed=True)
+@api_errors
+async def missed(request):
+    """IncomingCallViewSet.missed"""
+    view = call_view(request, 'missed')
+
+    def read():
+        missed_calls = view.project(view.calls().filter(
+            call_status__in=MISSED_CALL_STATUSES
+        ).order_by('-call_start_time'))
+
+        days = int(view.request.query_params.get('days', 30))
+        start_date = timezone.now() - timedelta(days=days)
+        return paginated(view, missed_calls.filter(call_start_time__gte=start_date), 'total_missed')
+
+    return render(*await in_db_thread(read))
+
+
+@require_GET
+@conditional_view(IncomingCall, CallDisposition, CallNote)
+@api_errors
+async def pending(request):
+    """IncomingCallViewSet.pending"""
+    view = call_view(request, 'pending')
+
+    def read():
+        pending_calls = view.project(view.calls().filter(
+            disposition__isnull=True
+        ).order_by('-call_start_time'))
+        return paginated(view, pending_calls, 'total_pending')
+
+    return render(*await in_db_thread(read))
+
+
+@require_GET
+@conditional_view(IncomingCall, CallDisposition, CallNote, windowed=True)
+@api_errors
+async def recent(request):
+    """IncomingCallViewSet.recent, sharing its entries in the analytics cache"""
+    view = call_view(request, 'recent')
+    window = timedelta(days=1)
+
+    def read():
+        yesterday = timezone.now() - window
+        recent_calls = view.project(view.calls().filter(call_start_time__gte=yesterday))
+
+        if CallPagination.is_cursor_request(view.request):
+            data, status_code = paginated(view, recent_calls, 'total')
+        else:
+            data, status_code = view.get_serializer(recent_calls, many=True).data, status.HTTP_200_OK
+        return data, status_code, status_code == status.HTTP_200_OK
+
+    async def compute():
+        return await in_db_thread(read)
+
+    analytics_cache = get_analytics_cache()
+    if analytics_cache is None:
+        data, status_code, _ = await compute()
+    else:
+        key = AnalyticsCache.make_key('recent', view.request.query_params)
+        data, status_code = await analytics_cache.aget_or_compute(
+            key, time.time() - window.total_seconds(), compute, request_versions(request)
+        )
+    return render(data, status_code)
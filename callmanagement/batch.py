@@ -0,0 +1,98 @@
+"""
+Bulk ingestion of webhook events (/api/webhook/batch/)
+
+Events are validated one by one with WebhookCallSerializer - the same
+normalization as the single-event webhook - and written by
+CallBatchWriter: one bulk upsert and one transaction per chunk.
+"""
+
+import logging
+
+from rest_framework import serializers
+
+from .serializers import WebhookCallSerializer, is_ignored_outbound
+from .writer import CallBatchWriter
+
+logger = logging.getLogger(__name__)
+
+RESULTS = ('created', 'updated', 'ignored', 'error')
+
+
+def _error(index, call_id, errors):
+    return {'index': index, 'call_id': call_id, 'result': 'error', 'errors': errors}
+
+
+def ingest_events(events, chunk_size=500):
+    """
+    Validate and upsert a list of webhook events
+
+    Returns one result per event, in order:
+    {'index', 'call_id', 'result': created|updated|ignored|error[, 'errors']}
+    A chunk that fails to write marks all its events as errors; the other
+    chunks are still written.
+    """
+    results = [None] * len(events)
+    call_ids = {}
+    # Events repeating a call queued earlier in the batch: the writer merges
+    # them into its row, so they update what the first one created
+    queued = set()
+    repeats = set()
+
+    def written(indexes):
+        for index in indexes:
+            call_id = call_ids[index]
+            created = call_id in writer.last_created and index not in repeats
+            results[index] = {'index': index, 'call_id': call_id, 'result': 'created' if created else 'updated'}
+        queued.clear()
+
+    def fail_pending(error):
+        for index in writer.pending_keys:
+            results[index] = _error(index, call_ids[index], {'non_field_errors': [str(error)]})
+        writer.clear()
+        queued.clear()
+
+    writer = CallBatchWriter(batch_size=chunk_size, on_flush=written)
+    # Outbound callbacks have to see missed calls earlier in the same batch
+    context = {'before_callback_match': writer.flush_for_callback}
+    # One serializer for the whole batch: building its fields is the
+    # costliest part of validating an event
+    serializer = WebhookCallSerializer(context=context)
+
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            results[index] = _error(index, None, {'non_field_errors': ['Event must be a JSON object.']})
+            continue
+
+        call_id = event.get('call_id')
+        try:
+            serializer.initial_data = event
+            try:
+                validated_data = serializer.run_validation(event)
+            except serializers.ValidationError as exc:
+                errors = serializers.as_serializer_error(exc)
+                if is_ignored_outbound(errors):
+                    results[index] = {'index': index, 'call_id': call_id, 'result': 'ignored'}
+                else:
+                    results[index] = _error(index, call_id, errors)
+                continue
+
+            fields = serializer.get_call_fields(validated_data)
+            call_ids[index] = fields['call_id']
+            if fields['call_id'] in queued:
+                repeats.add(index)
+            queued.add(fields['call_id'])
+            writer.add(fields, key=index)
+        except Exception as e:
+            # A flush triggered by add() or the callback match failed
+            logger.exception('Batch ingest failed at event %s (%s)', index, call_id)
+            fail_pending(e)
+            if results[index] is None:
+                results[index] = _error(index, call_id, {'non_field_errors': [str(e)]})
+
+    try:
+        writer.flush()
+    except Exception as e:
+        logger.exception('Batch ingest failed writing the last chunk')
+        fail_pending(e)
+
+    return results
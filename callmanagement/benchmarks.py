@@ -0,0 +1,169 @@
+"""
+Helpers for the bench_* management commands
+
+Benchmarks run against a throwaway test database (test_<NAME> on Postgres,
+in-memory on SQLite) so they never touch real call data.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import IncomingCall, CallDisposition, normalize_phone_number
+from .rollups import rebuild_rollups
+from .search import rebuild_search_terms
+
+FIRST_NAMES = (
+    'Aarav', 'Aditi', 'Amit', 'Ananya', 'Anita', 'Arjun', 'Deepak', 'Divya', 'Gaurav', 'Ishaan',
+    'Kavya', 'Manoj', 'Meera', 'Neha', 'Nikhil', 'Pooja', 'Priya', 'Rahul', 'Rajesh', 'Ritu',
+    'Rohan', 'Sanjay', 'Sneha', 'Suresh', 'Tanvi', 'Varun', 'Vikram', 'Vivek', 'Yash', 'Zoya',
+)
+LAST_NAMES = (
+    'Agarwal', 'Bansal', 'Chopra', 'Desai', 'Gupta', 'Iyer', 'Jain', 'Joshi', 'Kapoor', 'Khan',
+    'Kumar', 'Malhotra', 'Mehta', 'Menon', 'Mishra', 'Nair', 'Patel', 'Rao', 'Reddy', 'Saxena',
+    'Shah', 'Sharma', 'Singh', 'Sinha', 'Srivastava', 'Thakur', 'Trivedi', 'Verma', 'Yadav', 'Zaveri',
+)
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    """Create (and afterwards drop) a migrated test database"""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def customer_number(index):
+    """Synthetic customer number, formatted the ways Tata sends them"""
+    national = f'9{index:09d}'
+    return ('+91' + national, '91' + national, national)[index % 3]
+
+
+def customer_name(index):
+    """Synthetic name of a customer number (None for a third of them)"""
+    # Scattered over the numbers, every first name with every last name
+    key = index * 7919 % 2700
+    if key >= 1800:
+        return None
+    return f'{FIRST_NAMES[key % 30]} {LAST_NAMES[key // 30 % 30]}'
+
+
+def generate_calls(count, days=30, numbers=100000, batch_size=5000, seed=0, stdout=None):
+    """
+    Bulk-load synthetic calls spread over the last `days` days
+
+    Roughly: 65% inbound, a third of inbound calls missed, 40% without a
+    disposition, 20% leads, two thirds of the customers named. Rows go in
+    with executemany() rather than bulk_create() - the ORM's per-field
+    overhead dominates at 1M rows.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    window = days * 24 * 3600
+    adapt = connection.ops.adapt_datetimefield_value
+
+    disposition_ids = [
+        CallDisposition.objects.get_or_create(
+            code=f'BENCH{i:02d}',
+            defaults={'name': f'Benchmark disposition {i}', 'category': 'other'}
+        )[0].pk
+        for i in range(10)
+    ]
+
+    columns = [
+        'call_id', 'caller_number', 'caller_name', 'normalized_number', 'call_start_time', 'call_end_time',
+        'call_duration', 'call_status', 'call_direction', 'is_callback', 'staff_name',
+        'disposition_id', 'is_lead', 'lead_quality', 'created_at', 'updated_at',
+    ]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(IncomingCall._meta.db_table),
+        ', '.join(connection.ops.quote_name(c) for c in columns),
+        ', '.join(['%s'] * len(columns))
+    )
+
+    created = 0
+    started = time.perf_counter()
+
+    while created < count:
+        batch = []
+        for i in range(created, min(created + batch_size, count)):
+            customer = rng.randrange(numbers)
+            number = customer_number(customer)
+            inbound = rng.random() < 0.65
+            status = rng.choice(('missed', 'no-answer', 'busy')) if inbound and rng.random() < 0.33 else 'completed'
+            start = now - timedelta(seconds=rng.randrange(window))
+            duration = 0 if status != 'completed' else rng.randrange(10, 600)
+            is_lead = rng.random() < 0.2
+
+            batch.append((
+                f'bench-{i}',
+                number,
+                customer_name(customer),
+                normalize_phone_number(number),
+                adapt(start),
+                adapt(start + timedelta(seconds=duration)),
+                duration,
+                status,
+                'inbound' if inbound else 'outbound',
+                False,
+                None if inbound else f'Agent {rng.randrange(25)}',
+                None if rng.random() < 0.4 else rng.choice(disposition_ids),
+                is_lead,
+                rng.choice(('hot', 'warm', 'cold')) if is_lead else None,
+                adapt(start),
+                adapt(start),
+            ))
+
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+        created += len(batch)
+
+        if stdout is not None and (created % (batch_size * 20) == 0 or created == count):
+            stdout.write(f'  loaded {created}/{count} calls ({time.perf_counter() - started:.0f}s)')
+
+    # Rows were inserted behind the ORM's back, so no signal updated the
+    # rollups or search terms
+    rebuild_rollups()
+    rebuild_search_terms(chunk_size=batch_size * 4)
+
+    # Fresh planner statistics so EXPLAIN shows the plans production would get
+    if connection.vendor in ('postgresql', 'sqlite'):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    return created
+
+
+def best_of(func, repeat=5):
+    """Best wall time of func() in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def explain_sql(sql, analyze=False):
+    """Query plan for a captured SQL statement as text"""
+    options = {'analyze': True} if analyze and connection.vendor == 'postgresql' else {}
+    prefix = connection.ops.explain_query_prefix(**options)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}')
+        rows = cursor.fetchall()
+    return '\n'.join(' '.join(str(col) for col in row) for row in rows)
+
+
+def capture_queries(func):
+    """Run func() and return (result, list of SQL statements it executed)"""
+    with CaptureQueriesContext(connection) as context:
+        result = func()
+    return result, [query['sql'] for query in context.captured_queries]
@@ -0,0 +1,236 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .analytics_cache import calls_changed
+from .events import publish_calls
+from .models import IncomingCall, MISSED_CALL_STATUSES, normalize_phone_number
+from .versions import mark_changed
+
+# Callbacks only count for missed calls from the last 24 hours
+CALLBACK_WINDOW_SECONDS = 24 * 3600
+
+# Key of validated webhook data (and the call fields built from it) holding
+# the missed IncomingCall an outbound callback answers
+CALLBACK_MATCH = 'callback_match'
+
+
+def _timestamp(value):
+    """call_start_time as a unix timestamp (webhook data may still hold a string)"""
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return None
+
+
+def _value(call, name):
+    if isinstance(call, dict):
+        return call.get(name)
+    return getattr(call, name, None)
+
+
+class PendingCallbackRegistry:
+    """
+    Numbers with an open missed incoming call from the last 24 hours
+
+    Lets WebhookCallSerializer reject outbound calls that are not callbacks
+    (most of the staff's dialing) without querying the database. A hit is
+    still verified against the database, so the registry only has to never
+    miss a pending number; stale extra entries are harmless.
+
+    Entries map normalized_number -> call_start_time (unix timestamp) and
+    expire 24 hours after the missed call. The registry is loaded from the
+    database on first use in each process.
+    """
+
+    def __init__(self, ttl=CALLBACK_WINDOW_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._entries = {}
+        self._writes = 0
+
+    # Storage - overridden by CachePendingCallbackRegistry
+
+    def _get(self, number):
+        return self._entries.get(number)
+
+    def _set(self, number, started):
+        self._entries[number] = started
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._purge()
+
+    def _delete(self, number):
+        self._entries.pop(number, None)
+
+    def _replace_all(self, entries):
+        self._entries = entries
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl
+        self._entries = {n: t for n, t in self._entries.items() if t >= cutoff}
+
+    # Public API
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.rebuild()
+                    self._loaded = True
+
+    def rebuild(self):
+        """Reload from the latest inbound call per number in the last 24 hours"""
+        latest = {}
+        calls = IncomingCall.objects.filter(
+            call_direction='inbound',
+            call_start_time__gte=timezone.now() - timedelta(seconds=self.ttl),
+        ).order_by('call_start_time').values_list(
+            'normalized_number', 'call_status', 'contacted_at', 'call_start_time'
+        )
+        for number, call_status, contacted_at, started in calls.iterator(chunk_size=2000):
+            if not number:
+                continue
+            if call_status in MISSED_CALL_STATUSES and contacted_at is None:
+                latest[number] = started.timestamp()
+            else:
+                latest.pop(number, None)
+        self._replace_all(latest)
+        return len(latest)
+
+    def is_pending(self, number):
+        """True if the number may have a missed call waiting for a callback"""
+        number = normalize_phone_number(number)
+        if not number:
+            return False
+        self.ensure_loaded()
+        started = self._get(number)
+        return started is not None and started >= time.time() - self.ttl
+
+    def record(self, call):
+        """Update the registry for a saved (or about to be saved) IncomingCall or field dict"""
+        if _value(call, 'call_direction') != 'inbound':
+            return
+
+        number = _value(call, 'normalized_number') or normalize_phone_number(_value(call, 'caller_number'))
+        started = _timestamp(_value(call, 'call_start_time'))
+        if not number or started is None:
+            return
+
+        self.ensure_loaded()
+        with self._lock:
+            current = self._get(number)
+            # Same test as the database check in WebhookCallSerializer.validate
+            is_open = (
+                _value(call, 'call_status') in MISSED_CALL_STATUSES
+                and _value(call, 'contacted_at') is None
+            )
+            if is_open:
+                if started >= time.time() - self.ttl and (current is None or started >= current):
+                    self._set(number, started)
+            elif current is not None and started >= current:
+                # A newer answered call (or the missed call itself being
+                # contacted) closes the pending callback
+                self._delete(number)
+
+    def discard(self, number):
+        """Forget a number once its missed call has been called back"""
+        number = normalize_phone_number(number)
+        if number:
+            self.ensure_loaded()
+            with self._lock:
+                self._delete(number)
+
+
+class CachePendingCallbackRegistry(PendingCallbackRegistry):
+    """PendingCallbackRegistry stored in a Django cache shared by all workers"""
+
+    key_prefix = 'callmanagement:callback:'
+
+    def __init__(self, cache_alias, ttl=CALLBACK_WINDOW_SECONDS):
+        super().__init__(ttl=ttl)
+        if not cache_alias:
+            raise ImproperlyConfigured('CALLBACK_REGISTRY=shared needs CALLBACK_REGISTRY_CACHE set to a shared cache')
+        self.cache = caches[cache_alias]
+        # Per-process (or no) storage: each worker would miss the others' missed
+        # calls and reject their callbacks
+        if isinstance(self.cache, (LocMemCache, DummyCache)):
+            raise ImproperlyConfigured(
+                f'CALLBACK_REGISTRY_CACHE {cache_alias!r} is a {type(self.cache).__name__}, which workers do not '
+                'share - use e.g. Redis, Memcached or the database cache, or CALLBACK_REGISTRY=off'
+            )
+
+    def _timeout(self, started):
+        return max(1, int(started + self.ttl - time.time()))
+
+    def _get(self, number):
+        return self.cache.get(self.key_prefix + number)
+
+    def _set(self, number, started):
+        self.cache.set(self.key_prefix + number, started, timeout=self._timeout(started))
+
+    def _delete(self, number):
+        self.cache.delete(self.key_prefix + number)
+
+    def _replace_all(self, entries):
+        # Only adds - entries of other numbers simply expire
+        for number, started in entries.items():
+            self._set(number, started)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_callback_registry():
+    """Registry configured by settings.CALLBACK_REGISTRY, or None when it is 'off'"""
+    global _registry
+    mode = settings.CALLBACK_REGISTRY
+    if mode == 'off':
+        return None
+
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                if mode == 'shared':
+                    _registry = CachePendingCallbackRegistry(settings.CALLBACK_REGISTRY_CACHE)
+                else:
+                    _registry = PendingCallbackRegistry()
+    return _registry
+
+
+def pop_callback_match(fields):
+    """Take the answered missed call out of IncomingCall field values (None if not a callback)"""
+    return fields.pop(CALLBACK_MATCH, None)
+
+
+def mark_contacted(missed_call, contacted_at):
+    """
+    Mark the missed call an outbound callback answers as contacted
+
+    Runs in the transaction that saves the callback: if that write fails the
+    missed call stays pending, so a retry of the callback still matches it.
+    """
+    missed_call.contacted_at = contacted_at
+    missed_call.updated_at = contacted_at
+    IncomingCall.objects.filter(pk=missed_call.pk).update(contacted_at=contacted_at, updated_at=contacted_at)
+    # update() sends no post_save
+    publish_calls([missed_call], 'contacted')
+    mark_changed(IncomingCall)
+    calls_changed([missed_call.call_start_time])
+
+    registry = get_callback_registry()
+    if registry is not None:
+        number = missed_call.normalized_number
+        transaction.on_commit(lambda: registry.discard(number))
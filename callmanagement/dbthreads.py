@@ -0,0 +1,47 @@
+"""
+Database work of the async views, off the thread-sensitive executor
+
+In Django 5.0 the async ORM (acount(), afirst(), async iteration) and
+sync_to_async() run every query on the one thread-sensitive executor of
+the process, so a slow query holds up all database work of an ASGI worker.
+in_db_thread() runs a function in a pool of ASYNC_DB_THREADS threads
+instead, each on a database connection of its own: that many queries can
+wait on the network at once, and each worker holds up to that many
+connections (plus one).
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.ASYNC_DB_THREADS, thread_name_prefix='db')
+    return _executor
+
+
+def _call(func, args, kwargs):
+    # What request_started / request_finished do for a request thread: drop
+    # a broken connection, and close it afterwards unless CONN_MAX_AGE keeps it
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def in_db_thread(func, *args, **kwargs):
+    """Await func(*args, **kwargs) run in the database thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(_call, func, args, kwargs))
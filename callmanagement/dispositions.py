@@ -0,0 +1,94 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import CallDisposition
+
+# Reload at least this often even if no invalidation reached this process
+# (e.g. CACHES is per-process and another worker changed a disposition)
+DISPOSITION_MAX_AGE_SECONDS = 300
+
+
+class DispositionRegistry:
+    """
+    All CallDispositions, loaded once per process
+
+    Webhook ingestion resolves disposition codes here instead of a
+    get_or_create() query per call. Saving or deleting a disposition bumps
+    a version stamp in the Django cache (settings.DISPOSITION_CACHE); every
+    process compares it on each lookup and reloads when it changed. Use a
+    shared cache so workers see each other's changes at once - otherwise
+    they catch up within DISPOSITION_MAX_AGE_SECONDS.
+    """
+
+    version_key = 'callmanagement:dispositions:version'
+
+    def __init__(self, cache_alias, max_age=DISPOSITION_MAX_AGE_SECONDS):
+        self.cache = caches[cache_alias]
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._by_code = None
+        self._version = None
+        self._loaded_at = 0
+
+    def _dispositions(self):
+        """code -> CallDisposition, reloaded when the version stamp moved"""
+        version = self.cache.get(self.version_key)
+        by_code = self._by_code
+        if by_code is not None and version == self._version and time.monotonic() - self._loaded_at < self.max_age:
+            return by_code
+
+        with self._lock:
+            by_code = {disposition.code: disposition for disposition in CallDisposition.objects.all()}
+            self._by_code = by_code
+            self._version = version
+            self._loaded_at = time.monotonic()
+        return by_code
+
+    def get(self, code):
+        """CallDisposition with this code, or None"""
+        return self._dispositions().get(code)
+
+    def get_or_create(self, code, defaults=None):
+        """Like CallDisposition.objects.get_or_create(code=...) but without a query for known codes"""
+        disposition = self.get(code)
+        if disposition is not None:
+            return disposition, False
+
+        # Unique code + get_or_create() make concurrent creation safe
+        disposition, created = CallDisposition.objects.get_or_create(code=code, defaults=defaults)
+        with self._lock:
+            if self._by_code is not None:
+                self._by_code = {**self._by_code, code: disposition}
+        return disposition, created
+
+    def active(self, category=None):
+        """Active dispositions in CallDisposition's default order, optionally of one category"""
+        dispositions = [
+            disposition for disposition in self._dispositions().values()
+            if disposition.is_active and (category is None or disposition.category == category)
+        ]
+        dispositions.sort(key=lambda disposition: (disposition.category, disposition.name))
+        return dispositions
+
+    def invalidate(self):
+        """Make every process reload on its next lookup"""
+        self.cache.set(self.version_key, uuid.uuid4().hex, timeout=None)
+        with self._lock:
+            self._by_code = None
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_disposition_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = DispositionRegistry(settings.DISPOSITION_CACHE)
+    return _registry
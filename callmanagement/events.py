@@ -0,0 +1,340 @@
+"""
+Live call events for /api/incoming-calls/stream/ (Server-Sent Events)
+
+Saved calls are published once their transaction commits, as
+new / updated / contacted / deleted events carrying the call in its list
+(summary) form. Open streams wait on an in-process broker, so an idle
+stream costs no database queries.
+
+settings.CALL_EVENTS picks how events reach the process serving the stream:
+- 'local':    in-process only (webhooks and streams served by one process)
+- 'postgres': NOTIFY in the writing transaction, LISTEN in a background
+              thread of every process that serves streams
+- 'off':      publish nothing
+
+Event ids are '<unix ms>-<seq>'. A reconnecting client sends the last one
+as Last-Event-ID and gets the events it missed from the broker's buffer, or
+- after a restart or from another worker - the calls updated since then
+(or a 'reset' event when there are too many; the client then reloads).
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import select
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+from django.db.models import QuerySet
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('new', 'updated', 'contacted', 'deleted')
+
+NOTIFY_CHANNEL = 'callmanagement_call_events'
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_BYTES = 7500
+
+# Events that may have committed just before the Last-Event-ID was assigned
+REPLAY_SLACK_SECONDS = 5
+
+
+def _summary_serializer(instance, many=False):
+    from .serializers import IncomingCallSummarySerializer
+
+    # disposition_name would load the disposition of every call
+    return IncomingCallSummarySerializer(instance, many=many, omit=['disposition_name'])
+
+
+def call_event(event_type, call):
+    """(event_type, data) for a saved IncomingCall"""
+    return event_type, dict(_summary_serializer(call).data)
+
+
+def _encode(events):
+    return json.dumps([[event_type, data] for event_type, data in events], cls=DjangoJSONEncoder)
+
+
+def publish(events):
+    """Send (event_type, data) pairs to the streams once the current transaction commits"""
+    backend = settings.CALL_EVENTS
+    if backend == 'off' or not events:
+        return
+
+    if backend == 'postgres':
+        # Delivered by Postgres on commit, dropped on rollback
+        chunks, chunk = [], []
+        for event in events:
+            if chunk and len(_encode(chunk + [event])) > NOTIFY_MAX_BYTES:
+                chunks.append(chunk)
+                chunk = []
+            chunk.append(event)
+        chunks.append(chunk)
+        with connection.cursor() as cursor:
+            for chunk in chunks:
+                cursor.execute('SELECT pg_notify(%s, %s)', [NOTIFY_CHANNEL, _encode(chunk)])
+        return
+
+    broker = get_broker()
+    transaction.on_commit(lambda: broker.publish_many(events))
+
+
+def publish_calls(calls, event_type=None, created=()):
+    """
+    Publish events for saved calls
+
+    event_type applies to all calls; without it calls whose call_id is in
+    created are 'new', the others 'updated'.
+    """
+    if settings.CALL_EVENTS == 'off':
+        return
+    serializer = _summary_serializer(calls, many=True)
+    if isinstance(calls, QuerySet):
+        serializer.instance = serializer.child.project_queryset(calls)
+    data = serializer.data
+    publish([
+        (event_type or ('new' if call['call_id'] in created else 'updated'), dict(call))
+        for call in data
+    ])
+
+
+def parse_event_id(event_id):
+    """Unix time in seconds from an event id, or None"""
+    try:
+        return int(str(event_id).split('-', 1)[0]) / 1000
+    except (TypeError, ValueError):
+        return None
+
+
+class Subscription:
+    """One open stream: events pushed from any thread, read from its event loop"""
+
+    def __init__(self, broker, loop, max_queued):
+        self.broker = broker
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_queued)
+        self.overflowed = False
+
+    def push(self, entry):
+        self.loop.call_soon_threadsafe(self._put, entry)
+
+    def _put(self, entry):
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            # A client this far behind reloads instead
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """Next (id, event_type, data), or None after timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class CallEventBroker:
+    """Fans published events out to the open streams of this process and keeps the last few"""
+
+    def __init__(self, buffer_size=1000):
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+
+    def publish_many(self, events):
+        with self._lock:
+            entries = []
+            for event_type, data in events:
+                entry = (f'{int(time.time() * 1000)}-{next(self._seq)}', event_type, data)
+                self._buffer.append(entry)
+                entries.append(entry)
+            subscribers = list(self._subscribers)
+
+        for subscription in subscribers:
+            for entry in entries:
+                subscription.push(entry)
+
+    def since(self, last_event_id):
+        """Buffered entries after last_event_id, or None if it is not in the buffer"""
+        with self._lock:
+            entries = list(self._buffer)
+        for position, entry in enumerate(entries):
+            if entry[0] == last_event_id:
+                return entries[position + 1:]
+        return None
+
+    def subscribe(self, loop, max_queued=1000):
+        subscription = Subscription(self, loop, max_queued)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def current_id(self):
+        """An id to resume from now (for events that did not come from the buffer)"""
+        return f'{int(time.time() * 1000)}-0'
+
+
+class PostgresEventListener(threading.Thread):
+    """LISTENs on NOTIFY_CHANNEL on its own connection and hands events to the broker"""
+
+    def __init__(self, broker, alias='default', reconnect_delay=5):
+        super().__init__(name='call-events-listener', daemon=True)
+        self.broker = broker
+        self.alias = alias
+        self.reconnect_delay = reconnect_delay
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.exception('Call event listener lost its connection, reconnecting')
+            time.sleep(self.reconnect_delay)
+
+    def _listen(self):
+        wrapper = connections[self.alias]
+        conn = wrapper.get_new_connection(wrapper.get_connection_params())
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+            logger.info('Listening for call events on %s', NOTIFY_CHANNEL)
+
+            while True:
+                # Blocks without a query until a notification (or the timeout) arrives
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    self.broker.publish_many([tuple(event) for event in json.loads(notify.payload)])
+        finally:
+            conn.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """This process's broker; with CALL_EVENTS='postgres' also starts its listener"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker = CallEventBroker(buffer_size=settings.CALL_EVENTS_BUFFER)
+                if settings.CALL_EVENTS == 'postgres':
+                    PostgresEventListener(broker).start()
+                _broker = broker
+    return _broker
+
+
+def replay_from_database(since, limit):
+    """
+    Events for calls updated after since (unix seconds), oldest first
+
+    Returns None when there are more than limit - the client should reload.
+    """
+    from .models import IncomingCall
+
+    cutoff = datetime.fromtimestamp(since - REPLAY_SLACK_SECONDS, tz=dt_timezone.utc)
+    calls = list(
+        IncomingCall.objects.defer('raw_webhook_data')
+        .filter(updated_at__gte=cutoff)
+        .order_by('updated_at', 'id')[:limit + 1]
+    )
+    if len(calls) > limit:
+        return None
+
+    events = []
+    for call in calls:
+        if call.created_at >= cutoff:
+            event_type = 'new'
+        elif call.contacted_at is not None and call.contacted_at >= cutoff:
+            event_type = 'contacted'
+        else:
+            event_type = 'updated'
+        events.append((event_type, dict(_summary_serializer(call).data)))
+    return events
+
+
+def format_event(event_type, data, event_id=None):
+    """One SSE message"""
+    lines = []
+    if event_id:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(data, cls=DjangoJSONEncoder)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def event_stream(last_event_id=None):
+    """SSE body: missed events (if resuming), then live events and keep-alive comments"""
+    from asgiref.sync import sync_to_async
+
+    broker = get_broker()
+    subscription = broker.subscribe(asyncio.get_running_loop(), max_queued=settings.CALL_EVENTS_BUFFER)
+    try:
+        yield f'retry: {settings.CALL_EVENTS_RETRY_MS}\n\n'
+
+        if last_event_id:
+            missed = broker.since(last_event_id)
+            if missed is not None:
+                for entry_id, event_type, data in missed:
+                    yield format_event(event_type, data, entry_id)
+            else:
+                since = parse_event_id(last_event_id)
+                replayed = None
+                if since is not None:
+                    replayed = await sync_to_async(replay_from_database)(since, settings.CALL_EVENTS_REPLAY_MAX)
+                if replayed is None:
+                    yield format_event('reset', {}, broker.current_id())
+                else:
+                    resume_id = broker.current_id()
+                    for event_type, data in replayed:
+                        yield format_event(event_type, data, resume_id)
+
+        while True:
+            entry = await subscription.get(timeout=settings.CALL_EVENTS_HEARTBEAT)
+            if subscription.overflowed:
+                yield format_event('reset', {}, broker.current_id())
+                return
+            if entry is None:
+                # Keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+                continue
+            entry_id, event_type, data = entry
+            yield format_event(event_type, data, entry_id)
+    finally:
+        subscription.close()
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets Accept: text/event-stream through DRF content negotiation
+
+    The stream itself is a StreamingHttpResponse and never rendered; only
+    error responses come through here.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder).encode(self.charset)
@@ -0,0 +1,116 @@
+"""
+Streaming export of calls as CSV or NDJSON
+
+Rows are read with values() through queryset.iterator(), which uses a
+server-side cursor on Postgres, and written out a chunk at a time, so
+memory stays flat however many calls the date range covers.
+"""
+
+import csv
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+# Columns in export order (no raw_webhook_data - it would dwarf the rest)
+EXPORT_FIELDS = (
+    'id', 'call_id', 'call_sid', 'caller_number', 'caller_name',
+    'call_start_time', 'call_end_time', 'call_duration',
+    'call_status', 'call_direction', 'is_callback', 'contacted_at',
+    'staff_name', 'staff_id', 'recording_url',
+    'disposition__code', 'disposition__name', 'disposition__category', 'disposition_notes',
+    'customer_name', 'customer_email', 'customer_address',
+    'vehicle_model', 'vehicle_variant',
+    'is_lead', 'lead_quality',
+    'created_at', 'updated_at',
+)
+
+# Rows fetched per database round trip / written per yielded chunk
+EXPORT_CHUNK_SIZE = 2000
+
+
+# Positions of the datetime columns, written in local time as the API does
+DATETIME_COLUMNS = tuple(
+    index for index, name in enumerate(EXPORT_FIELDS)
+    if name in ('call_start_time', 'call_end_time', 'contacted_at', 'created_at', 'updated_at')
+)
+
+
+def export_rows(queryset, chunk_size=None):
+    """Export rows (lists in EXPORT_FIELDS order) of a queryset of calls, oldest first"""
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    tz = timezone.get_current_timezone()
+    rows = queryset.select_related(None).prefetch_related(None).order_by(
+        'call_start_time', 'id'
+    ).values_list(*EXPORT_FIELDS)
+    for row in rows.iterator(chunk_size=chunk_size):
+        row = list(row)
+        for index in DATETIME_COLUMNS:
+            if row[index] is not None:
+                row[index] = row[index].astimezone(tz).isoformat()
+        yield row
+
+
+def iter_csv(queryset, chunk_size=None):
+    """CSV text (header first) in chunks of up to chunk_size rows"""
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+
+    for count, row in enumerate(export_rows(queryset, chunk_size), 1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ndjson(queryset, chunk_size=None):
+    """One JSON object per line, in chunks of up to chunk_size rows"""
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    lines = []
+    for row in export_rows(queryset, chunk_size):
+        lines.append(encoder.encode(dict(zip(EXPORT_FIELDS, row))))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+EXPORTERS = {
+    'csv': (iter_csv, 'text/csv'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Lets ?format=csv|ndjson through DRF content negotiation
+
+    Successful exports are StreamingHttpResponses and never rendered;
+    only error responses (e.g. an invalid filter) come through here.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder).encode(self.charset)
+
+
+class CSVExportRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONExportRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
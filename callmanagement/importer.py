@@ -0,0 +1,488 @@
+"""
+Bulk import of historical Tata call-detail records (manage.py import_calls)
+
+Records are read as a stream from CSV (one column per webhook field,
+'agent.name' style columns for the nested ones), a JSON array or NDJSON,
+normalized with WebhookCallSerializer's rules, merged per call_id within
+a chunk and upserted one chunk per transaction with bulk_create(). On
+Postgres, use_copy=True writes through COPY into a staging table plus one
+INSERT ... ON CONFLICT instead; that path has not been run against a
+Postgres server yet, so it is off unless asked for.
+
+Unlike the webhook path an import sends no events and does not touch
+CallRollup per call; CallImporter.finish() rebuilds the rollups of the
+days it wrote instead.
+"""
+
+import bisect
+import csv
+import io
+import itertools
+import json
+import logging
+import re
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.fields import SkipField, empty, get_error_detail
+
+from .analytics_cache import everything_changed
+from .callbacks import get_callback_registry
+from .models import IncomingCall, MISSED_CALL_STATUSES, normalize_phone_number
+from .payloads import pop_payload, store_payloads
+from .rollups import bucket_start, rebuild_rollups
+from .search import reindex_calls
+from .serializers import WebhookCallSerializer, is_ignored_outbound
+from .versions import mark_changed
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'json', 'ndjson')
+
+RESULTS = ('created', 'updated', 'ignored', 'error')
+
+# Separators between the objects of a JSON array
+_ARRAY_GAP = re.compile(r'[\s,]*')
+
+
+def detect_format(path):
+    """csv, json (array) or ndjson, from the extension and the first character"""
+    name = str(path).lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    with open(path, encoding='utf-8') as handle:
+        start = handle.read(64).lstrip()
+    return 'json' if start.startswith('[') else 'ndjson'
+
+
+def _csv_record(row):
+    """CSV row -> webhook-shaped dict: empty cells are left out, 'agent.name' nests"""
+    record = {}
+    for key, value in row.items():
+        if key is None or value is None or value == '':
+            continue
+        if '.' in key:
+            parent, _, child = key.partition('.')
+            record.setdefault(parent, {})[child] = value
+        else:
+            record[key] = value
+    return record
+
+
+def _iter_json_array(handle, buffer_size=1 << 20):
+    decoder = json.JSONDecoder()
+    buffer = handle.read(buffer_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Expected a JSON array')
+    position = 1
+    eof = False
+
+    while True:
+        position = _ARRAY_GAP.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            # An object cut off at the end of the buffer - read on
+            if eof:
+                raise
+            more = handle.read(buffer_size)
+            eof = not more
+            buffer = buffer[position:] + more
+            position = 0
+            continue
+        yield item
+
+
+def iter_records(path, file_format=None, start=0):
+    """
+    Records of a CSV, JSON array or NDJSON file, read as a stream
+
+    Skips the first `start` records (without decoding NDJSON lines).
+    Entries that are not objects are yielded as they are, NDJSON lines
+    that are not JSON as their ValueError.
+    """
+    file_format = file_format or detect_format(path)
+    with open(path, encoding='utf-8', newline='' if file_format == 'csv' else None) as handle:
+        if file_format == 'csv':
+            records = map(_csv_record, itertools.islice(csv.DictReader(handle), start, None))
+        elif file_format == 'json':
+            records = itertools.islice(_iter_json_array(handle), start, None)
+        else:
+            records = map(_decode_line, itertools.islice((line for line in handle if line.strip()), start, None))
+        yield from records
+
+
+def _decode_line(line):
+    """An NDJSON line's object - or the ValueError, so one broken line is one rejected record"""
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return e
+
+
+class RowNormalizer:
+    """
+    WebhookCallSerializer's validation of one record, without its per-call overhead
+
+    Runs the serializer's own fields - only those the record carries, with
+    the defaults of the others - and then its normalize(), so records get
+    the same rules as webhooks. Callbacks are matched by CallbackMatcher.
+    """
+
+    def __init__(self):
+        self.serializer = WebhookCallSerializer()
+        self.fields = {name: field for name, field in self.serializer.fields.items() if not field.read_only}
+        self.defaults = {
+            name: field.get_default() for name, field in self.fields.items() if field.default is not empty
+        }
+
+    def __call__(self, record):
+        """(IncomingCall field values, None) or (None, errors)"""
+        if isinstance(record, ValueError):
+            return None, {'non_field_errors': [f'Invalid JSON: {record}']}
+        if not isinstance(record, dict):
+            return None, {'non_field_errors': ['Record must be a JSON object.']}
+
+        data = dict(self.defaults)
+        errors = {}
+        for name in self.fields.keys() & record.keys():
+            try:
+                data[name] = self.fields[name].run_validation(record[name])
+            except serializers.ValidationError as exc:
+                errors[name] = exc.detail
+            except DjangoValidationError as exc:
+                errors[name] = get_error_detail(exc)
+            except SkipField:
+                pass
+        if errors:
+            return None, errors
+
+        self.serializer.initial_data = record
+        try:
+            data = self.serializer.normalize(data)
+        except serializers.ValidationError as exc:
+            return None, serializers.as_serializer_error(exc)
+        return self.serializer.get_call_fields(data), None
+
+
+class CallbackMatcher:
+    """
+    WebhookCallSerializer.match_callback for records in time order
+
+    An outbound call is kept, as a callback, only if the latest inbound
+    call from the customer in the 24 hours before it was missed and not
+    contacted yet; that call is then contacted at the outbound call's
+    start. Inbound calls are remembered as they are imported; calls
+    already in the database are looked up once per chunk (prefetch()).
+    """
+
+    window = timedelta(days=1)
+
+    def __init__(self):
+        # normalized number -> [start, call_id, missed, contacted] of its latest inbound call
+        self.latest = {}
+        # normalized number -> database rows [start, call_id, missed, contacted], oldest first
+        self._stored = {}
+
+    @staticmethod
+    def customer_number(fields):
+        record = fields['raw_webhook_data'] or {}
+        return normalize_phone_number(record.get('call_to_number') or fields['caller_number'])
+
+    def _remember(self, number, entry):
+        current = self.latest.get(number)
+        if current is not None and entry[1] == current[1]:
+            # A later record of the same call - a callback found earlier still counts
+            entry[3] = entry[3] or current[3]
+            self.latest[number] = entry
+        elif current is None or entry[0] > current[0]:
+            self.latest[number] = entry
+
+    def prefetch(self, outbound):
+        """Load the stored inbound calls the outbound calls of a chunk could answer"""
+        self._stored = {}
+        if not outbound:
+            return
+        starts = [fields['call_start_time'] for fields in outbound]
+        rows = IncomingCall.objects.filter(
+            normalized_number__in={self.customer_number(fields) for fields in outbound},
+            call_direction='inbound',
+            call_start_time__gte=min(starts) - self.window,
+            call_start_time__lte=max(starts),
+        ).order_by('call_start_time').values_list(
+            'normalized_number', 'call_start_time', 'call_id', 'call_status', 'contacted_at'
+        )
+        for number, start, call_id, call_status, contacted_at in rows:
+            self._stored.setdefault(number, []).append(
+                [start, call_id, call_status in MISSED_CALL_STATUSES, contacted_at is not None]
+            )
+
+    def inbound(self, fields):
+        number = normalize_phone_number(fields['caller_number'])
+        self._remember(number, [
+            fields['call_start_time'], fields['call_id'],
+            fields.get('call_status') in MISSED_CALL_STATUSES, fields.get('contacted_at') is not None,
+        ])
+
+    def match(self, fields):
+        """call_id of the missed call this outbound call answers (now contacted), or None"""
+        number = self.customer_number(fields)
+        start = fields['call_start_time']
+
+        stored = self._stored.get(number)
+        if stored:
+            # Stored calls up to this one's start compete with the imported ones
+            end = bisect.bisect_right([entry[0] for entry in stored], start)
+            for entry in stored[:end]:
+                current = self.latest.get(number)
+                # A call imported in this run is newer than its stored row
+                if current is None or entry[0] > current[0]:
+                    self.latest[number] = entry
+            del stored[:end]
+
+        entry = self.latest.get(number)
+        if entry is None or entry[0] < start - self.window or not entry[2] or entry[3]:
+            return None
+        entry[3] = True
+        return entry[1]
+
+
+class CallImporter:
+    """
+    Normalizes records and upserts them on call_id, chunk_size records per transaction
+
+    add() queues a record and writes a full chunk; flush() writes the rest.
+    counts holds the RESULTS per record so far, as /webhook/batch/ reports
+    them; errors a list of
+    {'record', 'call_id', 'errors'} when keep_errors is set. first_start /
+    last_start span the call start times written (starting from those of
+    an interrupted run); call finish() once at the end to rebuild the
+    rollups of those days.
+    """
+
+    def __init__(self, chunk_size=5000, use_copy=False, keep_errors=False, first_start=None, last_start=None):
+        self.chunk_size = chunk_size
+        # Postgres only (see copy_upsert)
+        self.use_copy = use_copy
+        self.keep_errors = keep_errors
+        self.normalize = RowNormalizer()
+        self.matcher = CallbackMatcher()
+        self.counts = dict.fromkeys(RESULTS, 0)
+        self.errors = []
+        self.first_start = first_start
+        self.last_start = last_start
+        self._records = []
+
+    def add(self, index, record):
+        """Queue record number `index`; returns the number of records written (0 until a chunk is full)"""
+        self._records.append((index, record))
+        if len(self._records) >= self.chunk_size:
+            return self.flush()
+        return 0
+
+    def _error(self, index, record, errors):
+        self.counts['error'] += 1
+        if self.keep_errors:
+            call_id = record.get('call_id') if isinstance(record, dict) else None
+            self.errors.append({'record': index, 'call_id': call_id, 'errors': errors})
+
+    def _cover(self, *starts):
+        for start in starts:
+            if self.first_start is None or start < self.first_start:
+                self.first_start = start
+            if self.last_start is None or start > self.last_start:
+                self.last_start = start
+
+    def flush(self):
+        """Normalize and write the queued records in one transaction; returns how many were read"""
+        records, self._records = self._records, []
+        if not records:
+            return 0
+
+        normalized = []
+        for index, record in records:
+            fields, errors = self.normalize(record)
+            if errors is None:
+                normalized.append(fields)
+            elif is_ignored_outbound(errors):
+                self.counts['ignored'] += 1
+            else:
+                self._error(index, record, errors)
+
+        with transaction.atomic():
+            self.matcher.prefetch([fields for fields in normalized if fields['call_direction'] == 'outbound'])
+
+            rows = {}
+            contacted = {}
+            for fields in normalized:
+                if fields['call_direction'] == 'outbound':
+                    answered = self.matcher.match(fields)
+                    if answered is None:
+                        self.counts['ignored'] += 1
+                        continue
+                    fields['is_callback'] = True
+                    fields['contacted_at'] = fields['call_start_time']
+                    if answered in rows:
+                        rows[answered]['contacted_at'] = fields['call_start_time']
+                    else:
+                        contacted[answered] = fields['call_start_time']
+                else:
+                    self.matcher.inbound(fields)
+
+                # A later record of the same call updates the fields it carries
+                previous = rows.pop(fields['call_id'], None)
+                if previous:
+                    self.counts['updated'] += 1
+                    fields = {**previous, **fields}
+                rows[fields['call_id']] = fields
+
+            if rows:
+                self._write(rows)
+            for call_id, contacted_at in contacted.items():
+                IncomingCall.objects.filter(call_id=call_id).update(contacted_at=contacted_at, updated_at=timezone.now())
+            mark_changed(IncomingCall)
+
+        registry = get_callback_registry()
+        if registry is not None:
+            for fields in rows.values():
+                registry.record(fields)
+        return len(records)
+
+    def _write(self, rows):
+        existing = dict(
+            IncomingCall.objects.filter(call_id__in=list(rows)).values_list('call_id', 'call_start_time')
+        )
+        self.counts['updated'] += len(existing)
+        self.counts['created'] += len(rows) - len(existing)
+        self._cover(*existing.values(), *(fields['call_start_time'] for fields in rows.values()))
+
+        # Calls written with the fields their records carried, so a field a
+        # record leaves out keeps its stored value (as with webhooks)
+        groups = defaultdict(list)
+        payloads = {}
+        for fields in rows.values():
+            payload = pop_payload(fields)
+            if payload is not None:
+                payloads[fields['call_id']] = payload
+            fields['normalized_number'] = normalize_phone_number(fields['caller_number'])
+            groups[frozenset(fields)].append(fields)
+
+        call_pks = {}
+        for field_names, group in groups.items():
+            update_fields = [name for name in field_names if name != 'call_id'] + ['updated_at']
+            if self.use_copy:
+                call_pks.update(copy_upsert(group, update_fields))
+            else:
+                calls = IncomingCall.objects.bulk_create(
+                    [IncomingCall(**fields) for fields in group],
+                    update_conflicts=True,
+                    unique_fields=['call_id'],
+                    update_fields=update_fields,
+                )
+                call_pks.update((call.call_id, call.pk) for call in calls)
+
+        if payloads:
+            # Backends that cannot return ids from an upsert leave pk unset
+            missing = [call_id for call_id in payloads if call_pks.get(call_id) is None]
+            if missing:
+                call_pks.update(IncomingCall.objects.filter(call_id__in=missing).values_list('call_id', 'pk'))
+            store_payloads({call_pks[call_id]: payload for call_id, payload in payloads.items()})
+
+        # Terms from the stored rows: a record may leave a name out
+        reindex_calls(list(rows))
+
+    def finish(self, stdout=None):
+        """Rebuild CallRollup for the days written; returns the number of buckets"""
+        everything_changed()
+        if self.first_start is None:
+            return 0
+
+        buckets = 0
+        current = bucket_start(self.first_start, 'day')
+        end = bucket_start(self.last_start, 'day') + timedelta(days=1)
+        while current < end:
+            chunk_end = min(bucket_start(current + timedelta(days=7), 'day'), end)
+            buckets += rebuild_rollups(current, chunk_end)
+            current = chunk_end
+        if stdout is not None:
+            stdout.write(f'Rebuilt {buckets} rollup buckets from {self.first_start:%Y-%m-%d} to {self.last_start:%Y-%m-%d}')
+        return buckets
+
+
+# IncomingCall columns written by copy_upsert (all but the id)
+COPY_FIELDS = [field for field in IncomingCall._meta.concrete_fields if not field.primary_key]
+
+
+def _copy_value(value):
+    """A value in COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, cls=DjangoJSONEncoder)
+    elif hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_upsert(group, update_fields):
+    """
+    Upsert calls with the same field names via COPY (Postgres)
+
+    The rows are copied into a temporary staging table and moved with one
+    INSERT ... ON CONFLICT (call_id) DO UPDATE. Returns {call_id: pk}.
+    """
+    now = timezone.now()
+    defaults = {field.attname: field.get_default() for field in COPY_FIELDS}
+    defaults['created_at'] = defaults['updated_at'] = now
+
+    buffer = io.StringIO()
+    for fields in group:
+        values = {**defaults, **fields, 'updated_at': now}
+        if 'disposition' in values:
+            disposition = values.pop('disposition')
+            values['disposition_id'] = disposition.pk if disposition else None
+        buffer.write('\t'.join(_copy_value(values[field.attname]) for field in COPY_FIELDS))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    table = IncomingCall._meta.db_table
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in COPY_FIELDS)
+    assignments = ', '.join(
+        f'{quote(column)} = EXCLUDED.{quote(column)}'
+        for column in (IncomingCall._meta.get_field(name).column for name in update_fields)
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE IF NOT EXISTS import_calls_stage ON COMMIT DELETE ROWS '
+            f'AS SELECT {columns} FROM {table} WITH NO DATA'
+        )
+        cursor.execute('TRUNCATE import_calls_stage')
+        copy_sql = f'COPY import_calls_stage ({columns}) FROM STDIN'
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):
+            # psycopg2
+            raw.copy_expert(copy_sql, buffer)
+        else:
+            # psycopg 3
+            with raw.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) SELECT {columns} FROM import_calls_stage '
+            f'ON CONFLICT (call_id) DO UPDATE SET {assignments} RETURNING call_id, id'
+        )
+        return dict(cursor.fetchall())
@@ -0,0 +1,373 @@
+"""
+Webhook load generation for bench_webhook_load
+
+WebhookEventGenerator turns recorded Tata payloads (test_tata_format.json
+or any NDJSON capture) into a realistic stream of webhooks: answered and
+missed inbound calls, calls that arrive in two steps (ringing, then the
+final state), outbound callbacks to earlier missed numbers, outbound calls
+that are not callbacks, and exact retries of earlier payloads.
+
+LoadRunner posts them to a running server at a fixed rate (open loop) or as
+fast as the workers allow, optionally mixed with GETs of the dashboard
+lists, using only the standard library, and collects latencies per
+scenario, HTTP status and outcome.
+"""
+
+import http.client
+import itertools
+import json
+import math
+import queue
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+from .timestamps import IST
+
+SCENARIOS = ('inbound', 'missed', 'lifecycle', 'callback', 'outbound', 'duplicate')
+
+DEFAULT_MIX = {
+    'inbound': 45,
+    'missed': 20,
+    'lifecycle': 10,
+    'callback': 10,
+    'outbound': 10,
+    'duplicate': 5,
+}
+
+# Lists the dashboards poll, for LoadRunner(read_share=...)
+READ_PATHS = {
+    'read:missed': '/api/incoming-calls/missed/',
+    'read:pending': '/api/incoming-calls/pending/',
+    'read:recent': '/api/incoming-calls/recent/',
+}
+
+
+def parse_mix(text):
+    """'inbound=50,missed=20' -> weights per scenario (unlisted scenarios get 0)"""
+    mix = dict.fromkeys(SCENARIOS, 0)
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in mix:
+            raise ValueError(f"Unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight)
+    if not any(mix.values()):
+        raise ValueError('At least one scenario needs a weight above 0')
+    return mix
+
+
+def is_webhook_payload(payload):
+    """True for dicts that look like a Tata call webhook"""
+    return isinstance(payload, dict) and ('call_id' in payload or 'caller_id_number' in payload)
+
+
+def encode_body(payload, encoding):
+    """(body, content type) as Tata sends it (JSON as a form key) or as plain JSON"""
+    if encoding == 'json':
+        return json.dumps(payload).encode('utf-8'), 'application/json'
+    return urlencode({json.dumps(payload): ''}).encode('ascii'), 'application/x-www-form-urlencoded'
+
+
+class WebhookEventGenerator:
+    """Yields (scenario, payload) pairs built from template payloads"""
+
+    def __init__(self, templates, mix=None, seed=None, numbers=5000):
+        if not templates:
+            raise ValueError('No template payloads')
+        self.templates = templates
+        weights = mix or DEFAULT_MIX
+        self.scenarios = [name for name in SCENARIOS if weights.get(name)]
+        self.weights = [weights[name] for name in self.scenarios]
+        self.random = random.Random(seed)
+        self.numbers = numbers
+        self._ids = itertools.count(1)
+        self._run = int(time.time())
+        # Missed numbers not called back yet, and payloads already sent
+        self._open_missed = []
+        self._sent = []
+        # Second halves of lifecycle calls, sent a few events later
+        self._pending_finals = []
+
+    def _customer_number(self):
+        return f'+9198{self.random.randrange(self.numbers):08d}'
+
+    def _call(self, direction, status, number, started=None, duration=None):
+        payload = json.loads(json.dumps(self.random.choice(self.templates)))
+        started = started or datetime.now(IST)
+        duration = duration if duration is not None else (
+            0 if status != 'Answered' else self.random.randint(5, 600)
+        )
+        ended = started + timedelta(seconds=duration)
+        call_id = f'{self._run}.{next(self._ids)}'
+
+        payload.update({
+            'call_id': call_id,
+            'direction': direction,
+            'call_status': status,
+            'start_stamp': started.isoformat(timespec='seconds'),
+            'start_date': started.strftime('%Y-%m-%d'),
+            'start_time': started.strftime('%H:%M:%S'),
+            'end_stamp': ended.isoformat(timespec='seconds'),
+            'end_date': ended.strftime('%Y-%m-%d'),
+            'end_time': ended.strftime('%H:%M:%S'),
+            'duration': str(duration),
+        })
+        if 'recording_url' in payload:
+            payload['recording_url'] = f'https://example.invalid/recording?callId={call_id}' if duration else ''
+
+        if direction == 'inbound':
+            payload['caller_id_number'] = number
+        else:
+            # Outbound: the agent calls the customer on call_to_number
+            payload['caller_id_number'] = payload.get('agent_number') or '+910000000000'
+            payload['call_to_number'] = number
+            payload.setdefault('agent_name', 'Load Test Agent')
+        return payload
+
+    def _remember(self, payload):
+        self._sent.append(payload)
+        if len(self._sent) > 1000:
+            del self._sent[:500]
+        return payload
+
+    def next_event(self):
+        if self._pending_finals and self.random.random() < 0.5:
+            return 'lifecycle', self._remember(self._pending_finals.pop(0))
+
+        scenario = self.random.choices(self.scenarios, self.weights)[0]
+
+        if scenario == 'duplicate' and self._sent:
+            # Exact retry of something already sent
+            return scenario, self.random.choice(self._sent)
+
+        if scenario == 'callback' and self._open_missed:
+            number = self._open_missed.pop(self.random.randrange(len(self._open_missed)))
+            return scenario, self._remember(self._call('outbound', 'Answered', number))
+
+        if scenario in ('duplicate', 'callback', 'missed'):
+            # Nothing to retry / call back yet - start with a missed call
+            number = self._customer_number()
+            self._open_missed.append(number)
+            if len(self._open_missed) > 1000:
+                del self._open_missed[:500]
+            return 'missed', self._remember(self._call('inbound', self.random.choice(['Missed', 'No Answer']), number))
+
+        if scenario == 'outbound':
+            return scenario, self._remember(self._call('outbound', 'Answered', self._customer_number()))
+
+        if scenario == 'lifecycle':
+            final = self._call('inbound', 'Answered', self._customer_number())
+            first = dict(final, call_status='Ringing', duration='0')
+            for name in ('end_stamp', 'end_date', 'end_time', 'recording_url', 'disposition'):
+                first.pop(name, None)
+            self._pending_finals.append(final)
+            return scenario, self._remember(first)
+
+        return 'inbound', self._remember(self._call('inbound', 'Answered', self._customer_number()))
+
+    def __iter__(self):
+        while True:
+            yield self.next_event()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies_ms):
+    values = sorted(latencies_ms)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 0.50), 2),
+        'p95_ms': round(percentile(values, 0.95), 2),
+        'p99_ms': round(percentile(values, 0.99), 2),
+        'max_ms': round(values[-1], 2),
+    }
+
+
+class LoadRunner:
+    """
+    Posts generated webhooks to url with concurrency worker threads
+
+    rate > 0 sends on a fixed schedule (open loop) and measures latency from
+    the scheduled send time, so a slow server shows up as latency instead of
+    a silently lower request rate; rate 0 sends as fast as the workers go.
+
+    read_share of the requests are GETs of read_paths (name -> path on the
+    same server) instead of webhooks.
+    """
+
+    def __init__(self, url, generator, rate=0, concurrency=8, encoding='tata', timeout=30,
+                 read_share=0, read_paths=None, seed=None):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f'Unsupported URL: {url}')
+        self.parts = parts
+        self.path = parts.path or '/'
+        self.generator = generator
+        self.rate = rate
+        self.concurrency = concurrency
+        self.encoding = encoding
+        self.timeout = timeout
+        self.read_share = read_share
+        self.read_paths = list((read_paths or READ_PATHS).items())
+        self.random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.by_scenario = defaultdict(list)
+        self.statuses = Counter()
+        self.outcomes = Counter()
+        self.errors = Counter()
+        self.replays = 0
+        self.lateness = []
+        # Requests sent and not answered yet, and the most at any moment
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.connections = 0
+
+    def _connection(self):
+        connection_class = http.client.HTTPSConnection if self.parts.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.parts.hostname, self.parts.port, timeout=self.timeout)
+
+    def _send(self, connection, method, path, body, content_type):
+        headers = {'Content-Type': content_type} if content_type else {}
+        if connection.sock is None:
+            # New connection, or reopened after the server closed the last one
+            with self._lock:
+                self.connections += 1
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        data = response.read()
+        return response.status, response.getheader('X-Webhook-Replay'), data
+
+    def _worker(self, jobs):
+        connection = self._connection()
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            scheduled, scenario, request = job
+
+            started = time.perf_counter()
+            with self._lock:
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                try:
+                    status, replay, data = self._send(connection, *request)
+                except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                    # Server closed the keep-alive connection - retry once on a new one
+                    connection.close()
+                    connection = self._connection()
+                    status, replay, data = self._send(connection, *request)
+            except Exception as e:
+                connection.close()
+                connection = self._connection()
+                with self._lock:
+                    self.in_flight -= 1
+                    self.errors[type(e).__name__] += 1
+                continue
+
+            finished = time.perf_counter()
+            latency = (finished - (scheduled if scheduled is not None else started)) * 1000
+            try:
+                body = json.loads(data)
+                outcome = body.get('status', '-') if isinstance(body, dict) else '-'
+            except ValueError:
+                outcome = 'unparseable'
+
+            with self._lock:
+                self.in_flight -= 1
+                self.latencies.append(latency)
+                self.by_scenario[scenario].append(latency)
+                self.statuses[status] += 1
+                self.outcomes[outcome] += 1
+                if replay:
+                    self.replays += 1
+                if scheduled is not None:
+                    self.lateness.append((started - scheduled) * 1000)
+                if status >= 500:
+                    self.errors[f'HTTP {status}'] += 1
+        connection.close()
+
+    def run(self, duration=None, requests=None):
+        """Send until duration seconds passed or requests were sent; returns the report"""
+        jobs = queue.Queue(maxsize=self.concurrency * 4 if not self.rate else 0)
+        workers = [
+            threading.Thread(target=self._worker, args=(jobs,), daemon=True)
+            for _ in range(self.concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+
+        sent = 0
+        began = time.perf_counter()
+        deadline = began + duration if duration else None
+        for scenario, request in self._requests():
+            if requests is not None and sent >= requests:
+                break
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                break
+
+            scheduled = None
+            if self.rate:
+                scheduled = began + sent / self.rate
+                if scheduled > now:
+                    time.sleep(scheduled - now)
+            jobs.put((scheduled, scenario, request))
+            sent += 1
+
+        for _ in workers:
+            jobs.put(None)
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - began
+        return self.report(sent, elapsed)
+
+    def _requests(self):
+        """(scenario, (method, path, body, content type)) to send"""
+        base = self.path.rsplit('/api/', 1)[0] if '/api/' in self.path else ''
+        while True:
+            if self.read_share and self.random.random() < self.read_share:
+                name, path = self.random.choice(self.read_paths)
+                yield name, ('GET', base + path, None, None)
+                continue
+            scenario, payload = self.generator.next_event()
+            yield scenario, ('POST', self.path, *encode_body(payload, self.encoding))
+
+    def report(self, sent, elapsed):
+        completed = len(self.latencies)
+        report = {
+            'url': self.parts.geturl(),
+            'target_rate': self.rate or None,
+            'concurrency': self.concurrency,
+            'sent': sent,
+            'completed': completed,
+            'elapsed_s': round(elapsed, 2),
+            'throughput_rps': round(completed / elapsed, 1) if elapsed else 0,
+            'peak_in_flight': self.peak_in_flight,
+            'connections_opened': self.connections,
+            'latency': summarize(self.latencies),
+            'scenarios': {name: summarize(values) for name, values in sorted(self.by_scenario.items())},
+            'http_status': dict(sorted(self.statuses.items())),
+            'outcomes': dict(self.outcomes.most_common()),
+            'replayed': self.replays,
+            'errors': dict(self.errors.most_common()),
+        }
+        if self.lateness:
+            report['send_lag'] = summarize(self.lateness)
+        return report
@@ -0,0 +1,144 @@
+"""
+Logging helpers for the callmanagement loggers (configured in settings.LOGGING)
+
+- StructuredFormatter: message plus key=value fields (or one JSON object
+  per line), fields passed as logger.info(msg, extra={'fields': {...}})
+- SamplingFilter: keeps 1 in N records of noisy levels, e.g. DEBUG:100
+- QueueStreamHandler: hands records to a background thread so a slow
+  stdout never blocks a request
+- PhaseTimer: per-phase timings for the one summary line per webhook
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+
+def _logfmt_value(value):
+    text = str(value)
+    if not text or any(ch in text for ch in ' ="'):
+        return json.dumps(text)
+    return text
+
+
+class StructuredFormatter(logging.Formatter):
+    """Appends record.fields as key=value pairs, or renders the record as JSON with json_lines=True"""
+
+    def __init__(self, fmt=None, datefmt=None, json_lines=False):
+        super().__init__(fmt=fmt, datefmt=datefmt)
+        self.json_lines = json_lines
+
+    def format(self, record):
+        fields = getattr(record, 'fields', None) or {}
+
+        if self.json_lines:
+            entry = {
+                'time': self.formatTime(record, self.datefmt),
+                'level': record.levelname,
+                'logger': record.name,
+                'message': record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                entry['exc_info'] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+
+        line = super().format(record)
+        if fields:
+            pairs = ' '.join(f'{key}={_logfmt_value(value)}' for key, value in fields.items())
+            # Keep a traceback (if any) below the fields
+            head, sep, tail = line.partition('\n')
+            line = f'{head} {pairs}{sep}{tail}'
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through 1 in N records per level
+
+    rates maps level names to N, as a dict or a 'DEBUG:100,INFO:10' string.
+    Levels not listed are never sampled; WARNING and above should not be.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        if isinstance(rates, str):
+            rates = dict(item.split(':') for item in rates.split(',') if item.strip())
+        self.rates = {
+            logging.getLevelName(name.strip().upper()): int(every)
+            for name, every in (rates or {}).items()
+        }
+        self._counters = {level: itertools.count() for level in self.rates}
+
+    def filter(self, record):
+        every = self.rates.get(record.levelno)
+        if not every or every <= 1:
+            return True
+        # itertools.count() is atomic under the GIL
+        return next(self._counters[record.levelno]) % every == 0
+
+
+class QueueStreamHandler(QueueHandler):
+    """
+    Non-blocking stream handler
+
+    Records are formatted in the calling thread (so lazy %-args are
+    resolved while still valid) and written to the stream by a
+    QueueListener thread. The listener is started lazily in each process,
+    so it survives gunicorn forking workers after settings are loaded.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.stream = stream
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            target = logging.StreamHandler(self.stream or sys.stderr)
+            # Messages arrive already formatted by prepare()
+            target.setFormatter(logging.Formatter('%(message)s'))
+            self._listener = QueueListener(self.queue, target)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self._listener.stop)
+
+    def emit(self, record):
+        self._ensure_listener()
+        super().emit(record)
+
+
+class PhaseTimer:
+    """Wall-clock milliseconds spent in named phases of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def fields(self):
+        """Timing fields for a log record: <phase>_ms and total_ms"""
+        timings = {f'{name}_ms': round(ms, 2) for name, ms in self.phases.items()}
+        timings['total_ms'] = round((time.perf_counter() - self.started) * 1000, 2)
+        return timings
@@ -0,0 +1,50 @@
+"""
+Move old calls (with their notes and payloads) to the archive tables
+
+Calls that started more than CALL_ARCHIVE_AFTER_DAYS days ago go to
+ArchivedCall / ArchivedCallNote in chunks, one transaction each (see
+archive.py). Run it daily, e.g. from cron; archived calls are listed with
+?include_archive=true and stay in the stats.
+
+Usage:
+    python manage.py archive_calls                    # older than CALL_ARCHIVE_AFTER_DAYS
+    python manage.py archive_calls --days 180 --chunk-size 500
+    python manage.py archive_calls --dry-run          # only count them
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from callmanagement.archive import archive_calls
+from callmanagement.models import IncomingCall
+
+
+class Command(BaseCommand):
+    help = 'Move calls older than CALL_ARCHIVE_AFTER_DAYS to the archive tables in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.CALL_ARCHIVE_AFTER_DAYS,
+            help='Archive calls that started more than this many days ago'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Calls per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the calls that would be moved')
+
+    def handle(self, *args, **options):
+        # Callback matching looks at the last 24 hours of the hot table
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        before = timezone.now() - timedelta(days=options['days'])
+        if options['dry_run']:
+            count = IncomingCall.objects.filter(call_start_time__lt=before).count()
+            self.stdout.write(f'{count} calls started before {before:%Y-%m-%d %H:%M} would be archived')
+            return
+
+        count = archive_calls(before, chunk_size=options['chunk_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Done - {count} calls archived'))
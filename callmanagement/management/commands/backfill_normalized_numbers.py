@@ -0,0 +1,56 @@
+"""
+Fill IncomingCall.normalized_number for calls saved before the column existed
+
+Walks the table in primary-key order, one short transaction per chunk, so
+it can run against a live database and be restarted at any time.
+
+Usage:
+    python manage.py backfill_normalized_numbers --chunk-size 5000
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from callmanagement.models import IncomingCall, normalize_phone_number
+from callmanagement.search import reindex_calls
+
+
+class Command(BaseCommand):
+    help = 'Backfill normalized_number on existing calls in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per transaction')
+        parser.add_argument('--all', action='store_true', help='Recompute every row, not only empty ones')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        queryset = IncomingCall.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(normalized_number='')
+
+        last_pk = 0
+        updated = 0
+
+        while True:
+            chunk = list(
+                queryset.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'caller_number', 'call_id')[:chunk_size]
+            )
+            if not chunk:
+                break
+
+            calls = [
+                IncomingCall(pk=pk, normalized_number=normalize_phone_number(number))
+                for pk, number, call_id in chunk
+            ]
+            with transaction.atomic():
+                IncomingCall.objects.bulk_update(calls, ['normalized_number'])
+                # bulk_update() sends no post_save: the reversed numbers searched for suffixes
+                reindex_calls([call_id for pk, number, call_id in chunk])
+
+            last_pk = chunk[-1][0]
+            updated += len(chunk)
+            self.stdout.write(f'Updated {updated} calls (last id {last_pk})')
+
+        self.stdout.write(self.style.SUCCESS(f'Done - {updated} calls backfilled'))
@@ -0,0 +1,64 @@
+"""
+Benchmark: outbound callback matching before/after normalized_number
+
+Loads synthetic calls into a throwaway test database and prints the query
+plan and timing of the old endswith/contains lookup and the indexed
+normalized_number lookup.
+
+Usage:
+    python manage.py bench_callback_match --rows 1000000
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from callmanagement.benchmarks import benchmark_database, best_of, customer_number, generate_calls
+from callmanagement.models import IncomingCall, normalize_phone_number
+
+
+class Command(BaseCommand):
+    help = 'Compare callback-matching query plans and timings on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Synthetic calls to load')
+        parser.add_argument('--lookups', type=int, default=200, help='Customer numbers to match per run')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per query (best is reported)')
+
+    def handle(self, *args, **options):
+        with benchmark_database() as connection:
+            self.stdout.write(f'Loading {options["rows"]} calls into {connection.vendor} test database...')
+            generate_calls(options['rows'], stdout=self.stdout)
+
+            cutoff = timezone.now() - timedelta(days=1)
+            # Outbound webhooks usually carry the national number without +91
+            numbers = [customer_number(i * 3 + 2) for i in range(options['lookups'])]
+
+            def legacy(number):
+                return IncomingCall.objects.filter(
+                    call_direction='inbound',
+                    call_start_time__gte=cutoff
+                ).filter(
+                    Q(caller_number=number) |
+                    Q(caller_number__endswith=number[-10:] if len(number) >= 10 else number) |
+                    Q(caller_number__contains=number)
+                ).order_by('-call_start_time')
+
+            def indexed(number):
+                return IncomingCall.objects.filter(
+                    normalized_number=normalize_phone_number(number),
+                    call_direction='inbound',
+                    call_start_time__gte=cutoff
+                ).order_by('-call_start_time')
+
+            for label, query in (('before (endswith/contains)', legacy), ('after (normalized_number)', indexed)):
+                self.stdout.write(f'\n=== {label} ===')
+                self.stdout.write(query(numbers[0])[:1].explain())
+
+                elapsed = best_of(lambda: [query(n).first() for n in numbers], options['repeat'])
+                self.stdout.write(f'{len(numbers)} lookups: {elapsed:.1f} ms ({elapsed / len(numbers):.3f} ms/lookup)')
+
+                matched = sum(1 for n in numbers if query(n).first() is not None)
+                self.stdout.write(f'matched {matched}/{len(numbers)}')
@@ -0,0 +1,99 @@
+"""
+Benchmark: /incoming-calls/export/ throughput and memory
+
+Loads synthetic calls into a throwaway test database, streams the export
+through the test client and reports rows per second, bytes written, peak
+Python allocations during the export (tracemalloc) and the process peak RSS.
+--compare also measures building the same rows as one in-memory list.
+
+Usage:
+    python manage.py bench_export --rows 500000
+    python manage.py bench_export --format ndjson --chunk-size 5000 --compare
+"""
+
+import json
+import resource
+import sys
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from callmanagement import export
+from callmanagement.benchmarks import benchmark_database, generate_calls
+from callmanagement.models import IncomingCall
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class Command(BaseCommand):
+    help = 'Measure rows/s and memory of the streaming call export on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000, help='Synthetic calls to load')
+        parser.add_argument('--days', type=int, default=30, help='Spread the calls over this many days')
+        parser.add_argument(
+            '--format', dest='formats', action='append', choices=export.EXPORT_FORMATS,
+            help='Export format (repeatable, default: all)'
+        )
+        parser.add_argument('--chunk-size', type=int, default=export.EXPORT_CHUNK_SIZE, help='Rows per chunk')
+        parser.add_argument('--compare', action='store_true', help='Also time a fully materialized export')
+
+    def handle(self, *args, **options):
+        export.EXPORT_CHUNK_SIZE = options['chunk_size']
+        client = APIClient()
+
+        with benchmark_database() as connection:
+            self.stdout.write(f'Loading {options["rows"]} calls into {connection.vendor} test database...')
+            generate_calls(options['rows'], days=options['days'], stdout=self.stdout)
+            self.stdout.write(f'Peak RSS after loading: {peak_rss_mb():.0f} MB')
+
+            for export_format in options['formats'] or export.EXPORT_FORMATS:
+                url = f'/api/incoming-calls/export/?format={export_format}'
+                self.stdout.write(f'\n=== GET {url} (chunk size {options["chunk_size"]}) ===')
+
+                elapsed, lines, size = self.consume(lambda: client.get(url))
+                # Header line in CSV
+                rows = lines - 1 if export_format == 'csv' else lines
+                self.stdout.write(
+                    f'{rows} rows, {size / 1e6:.1f} MB in {elapsed:.2f}s '
+                    f'({rows / elapsed:,.0f} rows/s, {size / 1e6 / elapsed:.1f} MB/s)'
+                )
+
+                tracemalloc.start()
+                self.consume(lambda: client.get(url))
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.stdout.write(f'Peak Python allocations while streaming: {peak / 1e6:.1f} MB')
+                self.stdout.write(f'Process peak RSS: {peak_rss_mb():.0f} MB')
+
+            if options['compare']:
+                self.stdout.write('\n=== Materialized: list(values()) + json.dumps ===')
+                tracemalloc.start()
+                started = time.perf_counter()
+                body = json.dumps(
+                    list(IncomingCall.objects.values_list(*export.EXPORT_FIELDS)), default=str
+                )
+                elapsed = time.perf_counter() - started
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.stdout.write(
+                    f'{len(body) / 1e6:.1f} MB in {elapsed:.2f}s (traced), '
+                    f'peak Python allocations {peak / 1e6:.1f} MB'
+                )
+                self.stdout.write(f'Process peak RSS: {peak_rss_mb():.0f} MB')
+
+    def consume(self, request):
+        """Run request() and read the streamed body; returns (seconds, lines, bytes)"""
+        started = time.perf_counter()
+        response = request()
+        lines = size = 0
+        for chunk in response.streaming_content:
+            lines += chunk.count(b'\n')
+            size += len(chunk)
+        return time.perf_counter() - started, lines, size
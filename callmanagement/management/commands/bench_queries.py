@@ -0,0 +1,81 @@
+"""
+Benchmark: query plans and timings of the IncomingCallViewSet endpoints
+
+Loads synthetic calls into a throwaway test database, requests each
+endpoint through the test client and prints EXPLAIN output for every
+SELECT it ran plus the query count and best response time. Works on
+SQLite and Postgres.
+
+The query budget of each endpoint is asserted by
+callmanagement.tests.EndpointQueryBudgetTests (manage.py test).
+
+Usage:
+    python manage.py bench_queries --rows 200000
+    python manage.py bench_queries --endpoint missed --endpoint pending --analyze
+"""
+
+import re
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from callmanagement.benchmarks import benchmark_database, best_of, capture_queries, explain_sql, generate_calls
+
+
+LITERAL_RE = re.compile(r"'[^']*'|\b\d+(\.\d+)?\b")
+
+# name -> url
+ENDPOINTS = {
+    'list': '/api/incoming-calls/',
+    'missed': '/api/incoming-calls/missed/',
+    'pending': '/api/incoming-calls/pending/',
+    'formatted': '/api/incoming-calls/formatted/',
+    'stats': '/api/incoming-calls/stats/',
+    'by_disposition': '/api/incoming-calls/by_disposition/',
+    'recent': '/api/incoming-calls/recent/',
+}
+
+
+class Command(BaseCommand):
+    help = 'Print query plans and timings for the incoming-calls endpoints on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Synthetic calls to load')
+        parser.add_argument('--days', type=int, default=30, help='Spread the calls over this many days')
+        parser.add_argument(
+            '--endpoint', action='append', choices=sorted(ENDPOINTS),
+            help='Endpoint to benchmark (repeatable, default: all)'
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Requests per endpoint (best is reported)')
+        parser.add_argument('--analyze', action='store_true', help='EXPLAIN ANALYZE (Postgres only)')
+
+    def handle(self, *args, **options):
+        endpoints = options['endpoint'] or list(ENDPOINTS)
+        client = APIClient()
+
+        with benchmark_database() as connection:
+            self.stdout.write(f'Loading {options["rows"]} calls into {connection.vendor} test database...')
+            generate_calls(options['rows'], days=options['days'], stdout=self.stdout)
+
+            for name in endpoints:
+                url = ENDPOINTS[name]
+                self.stdout.write(f'\n=== {name}: GET {url} ===')
+
+                response, queries = capture_queries(lambda: client.get(url))
+                if response.status_code != 200:
+                    self.stderr.write(f'HTTP {response.status_code}: {response.content[:200]!r}')
+                    continue
+
+                # Explain each distinct statement once (N+1 queries differ only in literals)
+                shapes = {}
+                for sql in queries:
+                    if sql.lstrip().upper().startswith('SELECT'):
+                        shape = LITERAL_RE.sub('?', sql)
+                        shapes.setdefault(shape, [sql, 0])[1] += 1
+
+                for sql, count in shapes.values():
+                    self.stdout.write(f'-- [{count}x] {sql[:160]}{"..." if len(sql) > 160 else ""}')
+                    self.stdout.write(explain_sql(sql, analyze=options['analyze']))
+
+                elapsed = best_of(lambda: client.get(url), options['repeat'])
+                self.stdout.write(f'{len(queries)} queries, {elapsed:.1f} ms')
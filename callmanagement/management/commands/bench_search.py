@@ -0,0 +1,80 @@
+"""
+Benchmark: ?search= before and after the search indexes (search.py)
+
+Loads synthetic calls into a throwaway test database and, for number and
+name fragments in every ?match= mode, prints the query plan of the indexed
+search and the time of what a list page costs (COUNT plus the first 20
+calls, newest first) next to the former icontains over caller_number,
+caller_name and customer_name. For ?match=contains both must find the same
+calls.
+
+Usage:
+    python manage.py bench_search --rows 1000000
+    python manage.py bench_search --rows 200000 --repeat 5
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from callmanagement.benchmarks import benchmark_database, best_of, generate_calls
+from callmanagement.models import IncomingCall
+from callmanagement.search import search_calls
+
+# (label, ?search=, ?match=) - synthetic numbers are 9000000000-9000099999
+CASES = [
+    ('number prefix', '900004', 'prefix'),
+    ('number suffix', '4321', 'suffix'),
+    ('number contains', '04321', 'contains'),
+    ('name contains', 'sharma', 'contains'),
+    ('name contains, two words', 'rahul sha', 'contains'),
+    ('name prefix', 'vik', 'prefix'),
+    ('name suffix', 'verma', 'suffix'),
+    ('name fuzzy', 'sarma', 'fuzzy'),
+]
+
+
+def legacy_search(queryset, text):
+    """?search= before search.py"""
+    return queryset.filter(
+        Q(caller_number__icontains=text) |
+        Q(caller_name__icontains=text) |
+        Q(customer_name__icontains=text)
+    )
+
+
+def list_page(queryset):
+    """What a paginated list request reads"""
+    return queryset.count(), tuple(queryset.order_by('-call_start_time', '-id').values_list('id', flat=True)[:20])
+
+
+class Command(BaseCommand):
+    help = 'Compare ?search= query plans and timings before/after the search indexes on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Synthetic calls to load')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per query (best is reported)')
+
+    def handle(self, *args, **options):
+        mismatches = []
+
+        with benchmark_database() as connection:
+            self.stdout.write(f'Loading {options["rows"]} calls into {connection.vendor} test database...')
+            generate_calls(options['rows'], stdout=self.stdout)
+            calls = IncomingCall.objects.all()
+
+            for label, text, match in CASES:
+                self.stdout.write(f'\n=== {label}: ?search={text}&match={match} ===')
+                indexed = search_calls(calls, text, match)
+                self.stdout.write(indexed.order_by('-call_start_time', '-id')[:20].explain())
+
+                results = {}
+                for name, queryset in (('before (icontains)', legacy_search(calls, text)), ('after', indexed)):
+                    elapsed = best_of(lambda: list_page(queryset), options['repeat'])
+                    results[name] = list_page(queryset)
+                    self.stdout.write(f'{name:<20} {results[name][0]:>8} calls  {elapsed:8.1f} ms')
+
+                if match == 'contains' and len(set(results.values())) > 1:
+                    mismatches.append(label)
+
+        if mismatches:
+            raise CommandError(f'Indexed contains search found other calls - {", ".join(mismatches)}')
@@ -0,0 +1,109 @@
+"""
+Compare deployments (e.g. gunicorn sync workers vs uvicorn + ASYNC_VIEWS)
+under many concurrent clients
+
+Each target gets the same seeded mix of webhooks and dashboard list reads
+(missed, pending, recent) from --concurrency keep-alive clients, one target
+after the other. Start the servers first, on the same database, e.g.:
+    gunicorn incomingcall.wsgi:application --workers 4 --bind 127.0.0.1:8000
+    ASYNC_VIEWS=True gunicorn incomingcall.asgi:application -k uvicorn.workers.UvicornWorker \\
+        --workers 4 --bind 127.0.0.1:8001
+
+Usage:
+    python manage.py bench_server_concurrency --target wsgi=http://127.0.0.1:8000 \\
+        --target asgi=http://127.0.0.1:8001 --concurrency 500 --duration 30
+    python manage.py bench_server_concurrency --target asgi=http://127.0.0.1:8001 --reads 0.8 --json
+"""
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from callmanagement.loadgen import LoadRunner, WebhookEventGenerator, is_webhook_payload
+from callmanagement.management.commands.bench_webhook_parser import load_payloads
+
+
+class Command(BaseCommand):
+    help = 'Run the same concurrent webhook/read load against several servers and compare them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*',
+            help='Template payload files (JSON object, JSON array or NDJSON). Defaults to test_tata_format.json'
+        )
+        parser.add_argument(
+            '--target', action='append', required=True, metavar='NAME=URL',
+            help='Server to test, e.g. wsgi=http://127.0.0.1:8000 (repeat to compare)'
+        )
+        parser.add_argument('--concurrency', type=int, default=500, help='Concurrent clients')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds per target')
+        parser.add_argument('--rate', type=float, default=0, help='Requests per second (0 = as fast as possible)')
+        parser.add_argument('--reads', type=float, default=0.5, help='Share of requests that are list reads (0-1)')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds before a request counts as failed')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed (the same for every target)')
+        parser.add_argument('--json', action='store_true', help='Print the reports as JSON')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, _, url = target.partition('=')
+            if not url:
+                raise CommandError(f"--target must be NAME=URL, got '{target}'")
+            targets.append((name, url.rstrip('/')))
+
+        if not 0 <= options['reads'] <= 1:
+            raise CommandError('--reads must be between 0 and 1')
+
+        files = options['files'] or [settings.BASE_DIR / 'test_tata_format.json']
+        templates = []
+        for path in files:
+            try:
+                templates.extend(payload for payload in load_payloads(path) if is_webhook_payload(payload))
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read payloads from {path}: {e}')
+        if not templates:
+            raise CommandError('No call webhook payloads found in the template files')
+
+        reports = {}
+        for name, url in targets:
+            if not options['json']:
+                self.stdout.write(f"{name}: {options['concurrency']} clients for {options['duration']:g}s -> {url}")
+            try:
+                runner = LoadRunner(
+                    f'{url}/api/webhook/',
+                    WebhookEventGenerator(templates, seed=options['seed']),
+                    rate=options['rate'], concurrency=options['concurrency'], timeout=options['timeout'],
+                    read_share=options['reads'], seed=options['seed'],
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+            reports[name] = runner.run(duration=options['duration'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+
+        self.stdout.write(
+            f"\n{'target':<10} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+            f"{'in flight':>9} {'conns':>7} {'5xx/err':>8}"
+        )
+        for name, report in reports.items():
+            latency = report['latency']
+            failed = sum(report['errors'].values())
+            self.stdout.write(
+                f"{name:<10} {report['throughput_rps']:>8} {latency.get('p50_ms', '-'):>9} "
+                f"{latency.get('p95_ms', '-'):>9} {latency.get('p99_ms', '-'):>9} "
+                f"{report['peak_in_flight']:>9} {report['connections_opened']:>7} {failed:>8}"
+            )
+
+        for name, report in reports.items():
+            self.stdout.write(f'\n{name} per scenario:')
+            for scenario, stats in report['scenarios'].items():
+                self.stdout.write(
+                    f"  {scenario:>12}: {stats['count']:>6}  p50 {stats['p50_ms']:>8} ms  "
+                    f"p99 {stats['p99_ms']:>8} ms"
+                )
+            self.stdout.write(f"  HTTP status: {report['http_status']}")
+            if report['errors']:
+                self.stdout.write(self.style.ERROR(f"  errors: {report['errors']}"))
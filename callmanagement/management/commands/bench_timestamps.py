@@ -0,0 +1,164 @@
+"""
+Check and benchmark the Tata timestamp normalizer (callmanagement/timestamps.py)
+
+Runs a randomized round-trip check first: random instants written in every
+Tata variant (offset with '+', with a space, without a colon, UTC 'Z',
+fractions, no offset, 'kk' hour 24, "Invalid date" with start_date +
+start_time) must all normalize back to the same instant (the same check
+runs in callmanagement.tests.TimestampTests). Then compares the
+normalizer with the string repair WebhookCallSerializer.validate used to do
+(plus the parse_datetime the model field ran on its result) over a corpus of
+real-world variants and any recorded payloads.
+
+Usage:
+    python manage.py bench_timestamps
+    python manage.py bench_timestamps recorded.ndjson --samples 100000 --number 20000
+"""
+
+import random
+import timeit
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from callmanagement.management.commands.bench_webhook_parser import load_payloads
+from callmanagement.timestamps import IST, parse_date_time, parse_stamp
+
+# (start_stamp, start_date, start_time) as seen in Tata webhooks
+CORPUS = [
+    ('2025-11-07T12:42:23+05:30', '2025-11-07', '12:42:23'),
+    ('2025-11-07T12:42:23 05:30', '2025-11-07', '12:42:23'),
+    ('2025-11-07T22:30:00+05:30', '2025-11-07', '22:30:00'),
+    ('2025-11-07T12:42:23+0530', '2025-11-07', '12:42:23'),
+    ('2025-11-07T07:12:23Z', '2025-11-07', '12:42:23'),
+    ('2025-11-07T07:12:23.000Z', '2025-11-07', '12:42:23'),
+    ('2025-11-07T12:42:23.518+05:30', '2025-11-07', '12:42:23'),
+    ('2025-11-07 12:42:23', '2025-11-07', '12:42:23'),
+    ('2025-11-13T24:51:54 05:30', '2025-11-13', '24:51:54'),
+    ('Invalid date', '2025-11-13', '24:51:54'),
+    ('Invalid date', '2025-11-07', '12:42:23'),
+    ('invalid date', '2025-11-07', '09:05:00'),
+    ('', '2025-11-07', '12:42:23'),
+    ('None', '2025-11-07', '12:42:23'),
+    ('Invalid date', '', ''),
+    ('Invalid date', '2025-11-07', '12:42'),
+]
+
+
+def legacy_normalize(stamp, date_value, time_value):
+    """WebhookCallSerializer.validate's former repair, then parse_datetime as the model field did"""
+    if stamp and str(stamp).lower() not in ['invalid date', 'none', '']:
+        stamp = str(stamp)
+        if ' ' in stamp and stamp.count(':') >= 2:
+            parts = stamp.rsplit(' ', 1)
+            if len(parts) == 2 and ':' in parts[1]:
+                stamp = parts[0] + '+' + parts[1]
+        value = stamp
+    elif date_value and time_value:
+        time_parts = str(time_value).split(':')
+        if len(time_parts) != 3:
+            return None
+        hour = int(time_parts[0]) % 24
+        value = f"{date_value}T{hour:02d}:{time_parts[1]}:{time_parts[2]}+05:30"
+    else:
+        return None
+
+    parsed = parse_datetime(value)
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def normalize(stamp, date_value, time_value):
+    return parse_stamp(stamp) or parse_date_time(date_value, time_value)
+
+
+def _outcome(func, case):
+    try:
+        return func(*case)
+    except (ValueError, TypeError) as e:
+        # Raised inside the request: a 500 response
+        return f'error: {e}'
+
+
+def variants(instant, rng):
+    """(start_stamp, start_date, start_time) spellings of an aware instant"""
+    local = instant.astimezone(IST)
+    date_value = local.strftime('%Y-%m-%d')
+    # moment.js 'kk': hour 0 is written as 24
+    time_value = f"{local.hour or 24:02d}:{local:%M:%S}"
+    seconds = local.strftime('%Y-%m-%dT%H:%M:%S')
+    utc = instant.astimezone(dt_timezone.utc)
+
+    yield f'{seconds}+05:30', date_value, time_value
+    yield f'{seconds} 05:30', date_value, time_value
+    yield f'{seconds}+0530', date_value, time_value
+    yield utc.strftime('%Y-%m-%dT%H:%M:%SZ'), date_value, time_value
+    yield local.strftime('%Y-%m-%d %H:%M:%S'), date_value, time_value
+    yield f"{date_value}T{time_value} 05:30", date_value, time_value
+    yield rng.choice(['Invalid date', 'invalid date', '', 'None']), date_value, time_value
+
+
+class Command(BaseCommand):
+    help = 'Round-trip check and benchmark of the Tata timestamp normalizer against the previous string repair'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*',
+            help='Recorded payload files (JSON object, JSON array or NDJSON) whose '
+                 'start_/end_ stamps are added to the corpus'
+        )
+        parser.add_argument('--samples', type=int, default=20000, help='Random instants for the round-trip check')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for the round-trip check')
+        parser.add_argument('--number', type=int, default=10000, help='Normalizations per corpus entry per run')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per variant (best is reported)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+
+        checked = 0
+        for _ in range(options['samples']):
+            instant = start + timedelta(seconds=rng.randrange(10 * 365 * 86400))
+            for case in variants(instant, rng):
+                result = normalize(*case)
+                if result != instant:
+                    raise CommandError(f'{case!r} normalized to {result!r}, expected {instant!r}')
+                checked += 1
+        self.stdout.write(f'round trip: {checked} spellings of {options["samples"]} instants normalized exactly')
+
+        corpus = list(CORPUS)
+        for path in options['files']:
+            try:
+                payloads = load_payloads(path)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read payloads from {path}: {e}')
+            for payload in payloads:
+                for prefix in ('start', 'end'):
+                    if f'{prefix}_stamp' in payload:
+                        corpus.append(tuple(payload.get(f'{prefix}_{part}') for part in ('stamp', 'date', 'time')))
+
+        self.stdout.write(f'\n{"start_stamp":<32} {"legacy":<34} normalizer')
+        for case in corpus:
+            legacy = _outcome(legacy_normalize, case)
+            new = normalize(*case)
+            marker = '' if legacy == new else '  <- differs'
+            self.stdout.write(f'{case[0]!r:<32} {str(legacy)[:33]:<34} {new}{marker}')
+
+        number = options['number']
+        repeat = options['repeat']
+        self.stdout.write(f'\n{len(corpus)} corpus entries, {number} normalizations each, best of {repeat}')
+        results = {}
+        for name, func in (('legacy', legacy_normalize), ('normalizer', normalize)):
+            def run():
+                for case in corpus:
+                    _outcome(func, case)
+            best = min(timeit.Timer(run).repeat(repeat=repeat, number=number))
+            results[name] = best / (number * len(corpus)) * 1e6
+
+        self.stdout.write(
+            f'legacy {results["legacy"]:.2f} us/timestamp, normalizer {results["normalizer"]:.2f} us/timestamp '
+            f'({results["legacy"] / results["normalizer"]:.2f}x)'
+        )
@@ -0,0 +1,110 @@
+"""
+Load test a running server's /api/webhook/ with realistic Tata webhooks
+
+Start the server first (SQLite or a local Postgres), e.g.:
+    USE_SQLITE=True python manage.py runserver --noreload
+
+Usage:
+    python manage.py bench_webhook_load --rate 100 --duration 30 --concurrency 16
+    python manage.py bench_webhook_load --requests 5000 --rate 0 --mix inbound=60,missed=30,duplicate=10
+    python manage.py bench_webhook_load recorded.ndjson --url http://127.0.0.1:8000/api/webhook/ --json
+"""
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from callmanagement.loadgen import LoadRunner, WebhookEventGenerator, is_webhook_payload, parse_mix
+from callmanagement.management.commands.bench_webhook_parser import load_payloads
+
+
+class Command(BaseCommand):
+    help = 'Send generated Tata webhooks to a running server and report latency percentiles and errors'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*',
+            help='Template payload files (JSON object, JSON array or NDJSON); lines that are '
+                 'not call webhooks are skipped. Defaults to test_tata_format.json'
+        )
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/webhook/', help='Webhook endpoint')
+        parser.add_argument('--rate', type=float, default=50, help='Requests per second (0 = as fast as possible)')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+        parser.add_argument('--requests', type=int, default=None, help='Stop after this many requests')
+        parser.add_argument('--concurrency', type=int, default=8, help='Parallel connections')
+        parser.add_argument(
+            '--mix', default=None,
+            help='Scenario weights, e.g. inbound=45,missed=20,lifecycle=10,callback=10,outbound=10,duplicate=5'
+        )
+        parser.add_argument(
+            '--encoding', choices=['tata', 'json'], default='tata',
+            help="Body format: 'tata' (JSON as a form key, as Tata sends it) or 'json'"
+        )
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for a repeatable event sequence')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        files = options['files'] or [settings.BASE_DIR / 'test_tata_format.json']
+
+        templates = []
+        for path in files:
+            try:
+                templates.extend(payload for payload in load_payloads(path) if is_webhook_payload(payload))
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read payloads from {path}: {e}')
+        if not templates:
+            raise CommandError('No call webhook payloads found in the template files')
+
+        try:
+            mix = parse_mix(options['mix']) if options['mix'] else None
+            generator = WebhookEventGenerator(templates, mix=mix, seed=options['seed'])
+            runner = LoadRunner(
+                options['url'], generator,
+                rate=options['rate'], concurrency=options['concurrency'], encoding=options['encoding'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if not options['json']:
+            limit = f"{options['requests']} requests" if options['requests'] else f"{options['duration']:g}s"
+            rate = f"{options['rate']:g}/s" if options['rate'] else 'max rate'
+            self.stdout.write(
+                f"{len(templates)} template(s) -> {options['url']} at {rate}, "
+                f"{options['concurrency']} connections, {limit}"
+            )
+
+        duration = None if options['requests'] else options['duration']
+        report = runner.run(duration=duration, requests=options['requests'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        latency = report['latency']
+        self.stdout.write(
+            f"\n{report['completed']}/{report['sent']} completed in {report['elapsed_s']}s "
+            f"({report['throughput_rps']} req/s)"
+        )
+        if latency['count']:
+            self.stdout.write(
+                f"latency: p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, "
+                f"p99 {latency['p99_ms']} ms, max {latency['max_ms']} ms"
+            )
+        if 'send_lag' in report:
+            lag = report['send_lag']
+            self.stdout.write(f"send lag behind schedule: p50 {lag['p50_ms']} ms, p99 {lag['p99_ms']} ms")
+
+        self.stdout.write('\nper scenario:')
+        for name, stats in report['scenarios'].items():
+            self.stdout.write(
+                f"  {name:>10}: {stats['count']:>6}  p50 {stats['p50_ms']:>8} ms  "
+                f"p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms"
+            )
+
+        self.stdout.write(f"\nHTTP status: {report['http_status']}")
+        self.stdout.write(f"outcomes:    {report['outcomes']}  (replayed: {report['replayed']})")
+        if report['errors']:
+            self.stdout.write(self.style.ERROR(f"errors:      {report['errors']}"))
+        else:
+            self.stdout.write(self.style.SUCCESS('errors:      none'))
@@ -0,0 +1,118 @@
+"""
+Micro-benchmark: TataWebhookParser vs the old unquote_plus + rfind parsing
+
+Usage:
+    python manage.py bench_webhook_parser
+    python manage.py bench_webhook_parser test_tata_format.json requests.jsonl --number 20000
+"""
+
+import json
+import timeit
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import unquote_plus, urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from callmanagement.parsers import TataWebhookParser
+
+
+def load_payloads(path):
+    """Read payloads from a JSON object, a JSON array or an NDJSON file"""
+    text = Path(path).read_text(encoding='utf-8').strip()
+    if not text:
+        return []
+
+    try:
+        data = json.loads(text)
+    except ValueError:
+        # NDJSON - one payload per line
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    if isinstance(data, list):
+        return [item for item in data if isinstance(item, dict)]
+    return [data]
+
+
+def legacy_parse(body):
+    """The parsing WebhookViewSet.create did before TataWebhookParser"""
+    raw_body = body.decode('utf-8')
+    try:
+        decoded_body = unquote_plus(raw_body)
+        if decoded_body.startswith('{'):
+            if '}"=' in decoded_body:
+                json_end = decoded_body.rfind('}"=') + 2
+            elif '}=' in decoded_body:
+                json_end = decoded_body.rfind('}=') + 1
+            else:
+                json_end = len(decoded_body)
+            return json.loads(decoded_body[:json_end])
+    except Exception:
+        pass
+    # Fallback was request.data, i.e. DRF's FormParser parsing the body again
+    return QueryDict(body)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the Tata webhook body parser against the previous implementation'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*',
+            help='Recorded payload files (JSON object, JSON array or NDJSON). '
+                 'Defaults to test_tata_format.json'
+        )
+        parser.add_argument('--number', type=int, default=10000, help='Parses per payload per run')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per variant (best is reported)')
+
+    def handle(self, *args, **options):
+        files = options['files'] or [settings.BASE_DIR / 'test_tata_format.json']
+
+        payloads = []
+        for path in files:
+            try:
+                payloads.extend(load_payloads(path))
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read payloads from {path}: {e}')
+
+        if not payloads:
+            raise CommandError('No payloads found')
+
+        # Tata posts the JSON as the key of a form field; also cover unencoded senders
+        bodies = {
+            'form-encoded': [urlencode({json.dumps(p): ''}).encode('ascii') for p in payloads],
+            'raw json': [(json.dumps(p) + '=').encode('utf-8') for p in payloads],
+        }
+
+        parser = TataWebhookParser()
+        context = {'encoding': 'utf-8'}
+
+        def new_parse(body):
+            return parser.parse(BytesIO(body), parser.media_type, context)
+
+        number = options['number']
+        repeat = options['repeat']
+
+        self.stdout.write(f'{len(payloads)} payload(s), {number} parses each, best of {repeat}\n')
+
+        # Legacy unquote_plus turned '+' into ' ' in raw JSON bodies, so only
+        # the form-encoded bodies are expected to parse identically
+        for body in bodies['form-encoded']:
+            if legacy_parse(body) != new_parse(body):
+                raise CommandError(f'Parser output differs from the legacy parser for: {body[:80]!r}')
+
+        for label, variant in bodies.items():
+            results = {}
+            for name, func in (('legacy', legacy_parse), ('TataWebhookParser', new_parse)):
+                timer = timeit.Timer(lambda: [func(body) for body in variant])
+                best = min(timer.repeat(repeat=repeat, number=number))
+                results[name] = best / (number * len(variant)) * 1e6
+
+            speedup = results['legacy'] / results['TataWebhookParser']
+            self.stdout.write(
+                f'{label:>14}: legacy {results["legacy"]:.2f} us/body, '
+                f'TataWebhookParser {results["TataWebhookParser"]:.2f} us/body '
+                f'({speedup:.2f}x)'
+            )
@@ -0,0 +1,111 @@
+"""
+Worker for WEBHOOK_INGEST_MODE=spool
+
+Reads queued webhook payloads from the local spool, validates them with
+WebhookCallSerializer and upserts them in batches. A callback marks its
+missed call contacted in the transaction that writes it, so entries of a
+batch that fails are matched again when they are retried.
+
+Usage:
+    python manage.py drain_webhook_spool            # run forever
+    python manage.py drain_webhook_spool --once     # drain what is queued and exit
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from callmanagement.serializers import WebhookCallSerializer
+from callmanagement.spool import get_spool
+from callmanagement.writer import CallBatchWriter
+
+
+class Command(BaseCommand):
+    help = 'Write spooled webhook payloads to the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Payloads per batch')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the spool is empty')
+        parser.add_argument('--stats-every', type=float, default=60.0, help='Seconds between spool metric lines')
+        parser.add_argument('--once', action='store_true', help='Exit once the spool is empty')
+
+    def handle(self, *args, **options):
+        spool = get_spool()
+        batch_size = options['batch_size']
+        last_stats = 0.0
+
+        self.stdout.write(f'Draining webhook spool {spool.path} (batch size {batch_size})')
+
+        while True:
+            close_old_connections()
+            entries = spool.fetch(batch_size)
+            failed = 0
+
+            if entries:
+                failed = self.process_batch(spool, entries, batch_size)
+
+            now = time.monotonic()
+            if now - last_stats >= options['stats_every']:
+                last_stats = now
+                stats = spool.stats()
+                self.stdout.write(
+                    f"[SPOOL] depth={stats['depth']} dead={stats['dead']} lag={stats['lag_seconds']}s"
+                )
+
+            if not entries:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+            elif failed:
+                # Back off before retrying (e.g. database unavailable)
+                time.sleep(options['interval'])
+
+    def process_batch(self, spool, entries, batch_size):
+        """Validate and write one batch of spool entries"""
+        written = []
+        writer = CallBatchWriter(batch_size=batch_size, on_flush=written.extend)
+        # Outbound calls are matched against missed incoming calls in the
+        # database, so queued rows from the same number are flushed first; the match
+        # is only written (contacted_at) by the flush of the callback itself
+        context = {'before_callback_match': writer.flush_for_callback}
+
+        done = []
+        failed = 0
+        oldest = entries[0][1]
+
+        for spool_id, received_at, payload in entries:
+            try:
+                serializer = WebhookCallSerializer(data=payload, context=context)
+
+                if serializer.is_valid():
+                    writer.add(serializer.get_call_fields(serializer.validated_data), key=spool_id)
+                else:
+                    # Invalid or ignored outbound calls would have been rejected
+                    # by the webhook in sync mode as well - drop them
+                    self.stdout.write(f'[SPOOL] Dropping entry {spool_id}: {serializer.errors}')
+                    done.append(spool_id)
+            except Exception as e:
+                failed += self.fail(spool, writer, [spool_id], e)
+
+        try:
+            writer.flush()
+        except Exception as e:
+            failed += self.fail(spool, writer, [], e)
+
+        spool.ack(written + done)
+
+        self.stdout.write(
+            f'[SPOOL] Wrote {len(written)}, dropped {len(done)}, failed {failed} '
+            f'(oldest entry waited {time.time() - oldest:.1f}s)'
+        )
+        return failed
+
+    def fail(self, spool, writer, ids, error):
+        """Give the entry and anything still queued in the writer back to the spool"""
+        # A failed flush leaves its rows queued, so they are retried as well
+        ids = list(dict.fromkeys(ids + writer.pending_keys))
+        writer.clear()
+        self.stderr.write(f'[SPOOL] {len(ids)} entries will be retried: {error}')
+        spool.fail(ids, error)
+        return len(ids)
@@ -0,0 +1,143 @@
+"""
+Import historical Tata call-detail records from CSV, JSON array or NDJSON files
+
+Records get the webhook's rules (see importer.py) and are upserted on
+call_id one chunk per transaction (--copy: through COPY, Postgres only and
+not yet run against a server). Outbound calls are kept only as callbacks
+of missed calls, matched in file order, so the records should be sorted by
+start time (as Tata exports are).
+
+After every chunk the position is saved to a checkpoint file
+(<file>.checkpoint.json, or in --checkpoint-dir); rerunning the same
+command resumes from it. The CallRollup buckets of the imported days are
+rebuilt once a file is done, then its checkpoint is removed.
+
+Usage:
+    python manage.py import_calls cdrs-2025-10.ndjson cdrs-2025-11.csv
+    python manage.py import_calls export.json --chunk-size 20000 --errors rejected.ndjson
+    python manage.py import_calls cdrs.ndjson --restart     # ignore an existing checkpoint
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils.dateparse import parse_datetime
+
+from callmanagement.importer import IMPORT_FORMATS, CallImporter, detect_format, iter_records
+
+
+class Command(BaseCommand):
+    help = 'Bulk import historical call-detail records with checkpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='CSV, JSON array or NDJSON files of webhook-shaped records')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Input format (default: from the file)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Records per transaction')
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Write through COPY and a staging table (Postgres only; untested against a server)'
+        )
+        parser.add_argument('--checkpoint-dir', help='Where to keep checkpoints (default: next to each file)')
+        parser.add_argument('--restart', action='store_true', help='Start from the first record, ignoring checkpoints')
+        parser.add_argument('--errors', help='Append rejected records (number, call_id, errors) to this NDJSON file')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy needs Postgres')
+
+        totals = {}
+        for name in options['files']:
+            path = Path(name)
+            if not path.is_file():
+                raise CommandError(f'No such file: {path}')
+            counts = self.import_file(path, options)
+            for result, count in counts.items():
+                totals[result] = totals.get(result, 0) + count
+
+        self.stdout.write(self.style.SUCCESS(
+            'Done - ' + ', '.join(f'{count} {result}' for result, count in totals.items())
+        ))
+
+    def checkpoint_path(self, path, options):
+        directory = Path(options['checkpoint_dir']) if options['checkpoint_dir'] else path.parent
+        return directory / f'{path.name}.checkpoint.json'
+
+    def load_checkpoint(self, path, checkpoint_path, options):
+        if options['restart'] or not checkpoint_path.exists():
+            return None
+        checkpoint = json.loads(checkpoint_path.read_text())
+        if checkpoint['size'] != path.stat().st_size:
+            raise CommandError(
+                f'{path} changed since checkpoint {checkpoint_path} was written - rerun with --restart'
+            )
+        return checkpoint
+
+    def save_checkpoint(self, checkpoint_path, checkpoint):
+        # Written aside and renamed, so an interrupted write leaves the old one
+        temporary = checkpoint_path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(checkpoint))
+        os.replace(temporary, checkpoint_path)
+
+    def import_file(self, path, options):
+        file_format = options['format'] or detect_format(path)
+        checkpoint_path = self.checkpoint_path(path, options)
+        checkpoint = self.load_checkpoint(path, checkpoint_path, options) or {
+            'size': path.stat().st_size, 'records': 0, 'counts': {}, 'first_start': None, 'last_start': None,
+        }
+
+        importer = CallImporter(
+            chunk_size=options['chunk_size'],
+            use_copy=options['copy'],
+            keep_errors=bool(options['errors']),
+            first_start=parse_datetime(checkpoint['first_start'] or ''),
+            last_start=parse_datetime(checkpoint['last_start'] or ''),
+        )
+        for result, count in checkpoint['counts'].items():
+            importer.counts[result] = count
+        if checkpoint['records']:
+            self.stdout.write(f"{path.name}: resuming after record {checkpoint['records']}")
+
+        skipped = position = checkpoint['records']
+        started = time.monotonic()
+
+        def written():
+            checkpoint['records'] = position
+            checkpoint['counts'] = importer.counts
+            checkpoint['first_start'] = importer.first_start and importer.first_start.isoformat()
+            checkpoint['last_start'] = importer.last_start and importer.last_start.isoformat()
+            self.save_checkpoint(checkpoint_path, checkpoint)
+            self.write_errors(importer, options)
+
+            elapsed = time.monotonic() - started
+            rate = (position - skipped) / elapsed if elapsed else 0
+            self.stdout.write(
+                f"{path.name}: {position} records ({rate:,.0f}/s) - "
+                + ', '.join(f'{count} {result}' for result, count in importer.counts.items())
+            )
+
+        try:
+            for position, record in enumerate(iter_records(path, file_format, start=skipped), start=skipped + 1):
+                if importer.add(position, record):
+                    written()
+            if importer.flush():
+                written()
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read {path} after record {position}: {e}')
+
+        importer.finish(stdout=self.stdout)
+        checkpoint_path.unlink(missing_ok=True)
+        return importer.counts
+
+    def write_errors(self, importer, options):
+        if not importer.errors:
+            return
+        with open(options['errors'], 'a', encoding='utf-8') as handle:
+            for error in importer.errors:
+                handle.write(json.dumps(error, default=str) + '\n')
+        importer.errors.clear()
@@ -0,0 +1,29 @@
+"""
+Move raw webhook payloads between IncomingCall.raw_webhook_data and CallPayload
+
+Migration 0008 moves them once; run this after changing
+CALL_PAYLOAD_STORAGE on a database that already has calls.
+
+Usage:
+    python manage.py move_call_payloads                # inline -> CallPayload
+    python manage.py move_call_payloads --to-inline    # CallPayload -> inline
+"""
+
+from django.core.management.base import BaseCommand
+
+from callmanagement.payloads import move_inline_payloads, restore_inline_payloads
+
+
+class Command(BaseCommand):
+    help = 'Move raw webhook payloads to (or back from) the compressed CallPayload table in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Calls per transaction')
+        parser.add_argument('--to-inline', action='store_true', help='Copy payloads back into raw_webhook_data')
+
+    def handle(self, *args, **options):
+        if options['to_inline']:
+            count = restore_inline_payloads(chunk_size=options['chunk_size'], stdout=self.stdout)
+        else:
+            count = move_inline_payloads(chunk_size=options['chunk_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Done - {count} payloads moved'))
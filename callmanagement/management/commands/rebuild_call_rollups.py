@@ -0,0 +1,52 @@
+"""
+Recompute CallRollup from the calls, hot and archived (AnyCall)
+
+Rebuilds in day-aligned chunks, one transaction each. Rollups are also
+built by migration 0006; run this after bulk changes that bypass the ORM
+signals (raw SQL, queryset.update() on rollup fields) or to verify them.
+
+Usage:
+    python manage.py rebuild_call_rollups               # all history
+    python manage.py rebuild_call_rollups --days 30     # last 30 days only
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from callmanagement.models import AnyCall
+from callmanagement.rollups import bucket_start, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly/daily call rollup table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Only rebuild the last N days')
+        parser.add_argument('--chunk-days', type=int, default=7, help='Days per transaction')
+
+    def handle(self, *args, **options):
+        bounds = AnyCall.objects.aggregate(first=Min('call_start_time'), last=Max('call_start_time'))
+        if bounds['first'] is None:
+            self.stdout.write('No calls - nothing to rebuild')
+            return
+
+        start = bounds['first']
+        if options['days']:
+            start = max(start, timezone.now() - timedelta(days=options['days']))
+        end = max(bounds['last'], timezone.now())
+
+        chunk = timedelta(days=options['chunk_days'])
+        current = bucket_start(start, 'day')
+        total = 0
+
+        while current <= end:
+            chunk_end = bucket_start(current + chunk, 'day')
+            buckets = rebuild_rollups(current, chunk_end)
+            total += buckets
+            self.stdout.write(f'{current:%Y-%m-%d} - {chunk_end:%Y-%m-%d}: {buckets} buckets')
+            current = chunk_end
+
+        self.stdout.write(self.style.SUCCESS(f'Done - {total} rollup buckets written'))
@@ -0,0 +1,33 @@
+"""
+Recompute CallSearchTerm from the calls, hot and archived
+
+The terms behind ?search= on backends without pg_trgm (see search.py);
+on Postgres there is nothing to rebuild. They are also built by migration
+0012; run this after bulk changes that bypass the ORM signals (raw SQL,
+queryset.update() on caller_number or the names).
+
+Usage:
+    python manage.py rebuild_search_terms
+    python manage.py rebuild_search_terms --chunk-size 20000
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from callmanagement.search import rebuild_search_terms, uses_trigram_indexes
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the call search terms (not used on Postgres)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Calls per transaction')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        if uses_trigram_indexes():
+            self.stdout.write('Postgres searches its pg_trgm indexes - nothing to rebuild')
+            return
+
+        count = rebuild_search_terms(chunk_size=options['chunk_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Done - {count} calls indexed'))
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callmanagement', '0003_add_call_direction_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incomingcall',
+            name='normalized_number',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Last 10 digits of caller_number (filled on save)', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='incomingcall',
+            name='call_status',
+            field=models.CharField(choices=[('ringing', 'Ringing'), ('answered', 'Answered'), ('busy', 'Busy'), ('no-answer', 'No Answer'), ('missed', 'Missed'), ('failed', 'Failed'), ('completed', 'Completed')], default='ringing', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='incomingcall',
+            index=models.Index(fields=['normalized_number', 'call_direction', 'call_start_time'], name='call_number_dir_start_idx'),
+        ),
+    ]
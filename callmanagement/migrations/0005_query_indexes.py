@@ -0,0 +1,49 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:33
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class AddIndexConcurrentlyOnPostgres(AddIndexConcurrently):
+    """CREATE INDEX CONCURRENTLY on Postgres, so calls keep being written while it builds; AddIndex elsewhere"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('callmanagement', '0004_normalized_number'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='incomingcall',
+            index=models.Index(fields=['call_start_time', 'id'], name='call_start_id_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='incomingcall',
+            index=models.Index(fields=['call_direction', 'call_start_time'], name='call_dir_start_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='incomingcall',
+            index=models.Index(condition=models.Q(('call_status__in', ('missed', 'no-answer', 'busy'))), fields=['-call_start_time', '-id'], name='call_missed_start_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='incomingcall',
+            index=models.Index(condition=models.Q(('disposition__isnull', True)), fields=['-call_start_time', '-id'], name='call_pending_start_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:35
+
+from django.db import migrations, models
+
+
+def build_rollups(apps, schema_editor):
+    from callmanagement.rollups import rebuild_rollups
+
+    rebuild_rollups(
+        call_model=apps.get_model('callmanagement', 'IncomingCall'),
+        rollup_model=apps.get_model('callmanagement', 'CallRollup'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callmanagement', '0005_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField(help_text='Start of the hour/day (local time) the calls started in')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('disposition_key', models.BigIntegerField(default=0, help_text='CallDisposition id, 0 = no disposition')),
+                ('call_status', models.CharField(max_length=50)),
+                ('call_direction', models.CharField(max_length=20)),
+                ('lead_quality', models.CharField(blank=True, default='', max_length=20)),
+                ('is_lead', models.BooleanField(default=False)),
+                ('call_count', models.IntegerField(default=0)),
+                ('duration_sum', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Call Rollup',
+                'verbose_name_plural': 'Call Rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='callrollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'bucket_start', 'disposition_key', 'call_status', 'call_direction', 'lead_quality', 'is_lead'), name='call_rollup_bucket_unique'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:46
+
+import json
+import zlib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models, transaction
+
+CHUNK_SIZE = 1000
+
+
+# CallPayload.pack / unpack as of this migration
+def pack(data):
+    text = json.dumps(data, separators=(',', ':'), ensure_ascii=False, cls=DjangoJSONEncoder)
+    return zlib.compress(text.encode('utf-8'))
+
+
+def unpack(data):
+    return json.loads(zlib.decompress(data))
+
+
+def move_payloads(apps, schema_editor):
+    """raw_webhook_data into CallPayload, one committed chunk of calls at a time"""
+    if settings.CALL_PAYLOAD_STORAGE == 'inline':
+        return
+    IncomingCall = apps.get_model('callmanagement', 'IncomingCall')
+    CallPayload = apps.get_model('callmanagement', 'CallPayload')
+
+    last_pk = 0
+    while True:
+        chunk = list(
+            IncomingCall.objects.filter(pk__gt=last_pk, raw_webhook_data__isnull=False)
+            .order_by('pk')
+            .values_list('pk', 'raw_webhook_data')[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        with transaction.atomic():
+            CallPayload.objects.bulk_create(
+                [CallPayload(call_id=pk, data=pack(data)) for pk, data in chunk],
+                update_conflicts=True,
+                unique_fields=['call'],
+                update_fields=['data'],
+            )
+            IncomingCall.objects.filter(pk__in=[pk for pk, _ in chunk]).update(raw_webhook_data=None)
+        last_pk = chunk[-1][0]
+
+
+def restore_payloads(apps, schema_editor):
+    IncomingCall = apps.get_model('callmanagement', 'IncomingCall')
+    CallPayload = apps.get_model('callmanagement', 'CallPayload')
+
+    last_pk = 0
+    while True:
+        chunk = list(
+            CallPayload.objects.filter(call_id__gt=last_pk)
+            .order_by('call_id')
+            .values_list('call_id', 'data')[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        with transaction.atomic():
+            IncomingCall.objects.bulk_update(
+                [IncomingCall(pk=pk, raw_webhook_data=unpack(bytes(data))) for pk, data in chunk],
+                ['raw_webhook_data'],
+            )
+            CallPayload.objects.filter(call_id__in=[pk for pk, _ in chunk]).delete()
+        last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    # Payloads are moved one committed chunk at a time
+    atomic = False
+
+    dependencies = [
+        ('callmanagement', '0006_call_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallPayload',
+            fields=[
+                ('call', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='callmanagement.incomingcall')),
+                ('data', models.BinaryField(help_text='zlib-compressed JSON')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Call Payload',
+                'verbose_name_plural': 'Call Payloads',
+            },
+        ),
+        migrations.RunPython(move_payloads, restore_payloads),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callmanagement', '0008_call_payload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookReceipt',
+            fields=[
+                ('fingerprint', models.CharField(help_text='SHA-256 of the normalized payload', max_length=64, primary_key=True, serialize=False)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('response', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Webhook Receipt',
+                'verbose_name_plural': 'Webhook Receipts',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:59
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# versions.TRACKED_TABLES as of this migration
+TRACKED_TABLES = ('incomingcall', 'callnote', 'calldisposition')
+
+
+def create_versions(apps, schema_editor):
+    ChangeVersion = apps.get_model('callmanagement', 'ChangeVersion')
+    ChangeVersion.objects.bulk_create(
+        [ChangeVersion(table=table, version=0, changed_at=timezone.now()) for table in TRACKED_TABLES],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callmanagement', '0009_webhook_receipt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeVersion',
+            fields=[
+                ('table', models.CharField(help_text='Model name, e.g. incomingcall', max_length=50, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('changed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Change Version',
+                'verbose_name_plural': 'Change Versions',
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,173 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+# CallRecord columns as of this migration; a new column needs a migration
+# that recreates the views
+CALL_COLUMNS = (
+    'id', 'call_id', 'call_sid', 'caller_number', 'caller_name', 'normalized_number',
+    'call_start_time', 'call_end_time', 'call_duration', 'call_status', 'call_direction',
+    'is_callback', 'contacted_at', 'staff_name', 'staff_id', 'recording_url',
+    'disposition_id', 'disposition_notes', 'customer_name', 'customer_email', 'customer_address',
+    'vehicle_model', 'vehicle_variant', 'is_lead', 'lead_quality', 'raw_webhook_data',
+    'created_at', 'updated_at',
+)
+
+NOTE_COLUMNS = 'id, call_id, note, created_by, created_at'
+
+
+def _columns(alias):
+    return ', '.join(f'{alias}.{column}' for column in CALL_COLUMNS)
+
+
+CREATE_VIEWS = [
+    f"""
+    CREATE VIEW callmanagement_anycall AS
+    SELECT {_columns('c')}, p.data AS payload
+    FROM callmanagement_incomingcall c
+    LEFT JOIN callmanagement_callpayload p ON p.call_id = c.id
+    UNION ALL
+    SELECT {_columns('a')}, a.payload
+    FROM callmanagement_archivedcall a
+    WHERE NOT EXISTS (SELECT 1 FROM callmanagement_incomingcall h WHERE h.call_id = a.call_id)
+    """,
+    f"""
+    CREATE VIEW callmanagement_anycallnote AS
+    SELECT {NOTE_COLUMNS} FROM callmanagement_callnote
+    UNION ALL
+    SELECT {NOTE_COLUMNS} FROM callmanagement_archivedcallnote
+    """,
+]
+
+DROP_VIEWS = [
+    'DROP VIEW IF EXISTS callmanagement_anycallnote',
+    'DROP VIEW IF EXISTS callmanagement_anycall',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callmanagement', '0010_change_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnyCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('call_id', models.CharField(help_text='Unique call identifier', max_length=100, unique=True)),
+                ('call_sid', models.CharField(blank=True, help_text='Call SID from provider', max_length=100, null=True)),
+                ('caller_number', models.CharField(help_text="Caller's phone number", max_length=20)),
+                ('caller_name', models.CharField(blank=True, help_text="Caller's name", max_length=200, null=True)),
+                ('normalized_number', models.CharField(blank=True, default='', editable=False, help_text='Last 10 digits of caller_number (filled on save)', max_length=10)),
+                ('call_start_time', models.DateTimeField(help_text='When call started')),
+                ('call_end_time', models.DateTimeField(blank=True, help_text='When call ended', null=True)),
+                ('call_duration', models.IntegerField(default=0, help_text='Call duration in seconds')),
+                ('call_status', models.CharField(choices=[('ringing', 'Ringing'), ('answered', 'Answered'), ('busy', 'Busy'), ('no-answer', 'No Answer'), ('missed', 'Missed'), ('failed', 'Failed'), ('completed', 'Completed')], default='ringing', max_length=50)),
+                ('call_direction', models.CharField(choices=[('inbound', 'Inbound'), ('outbound', 'Outbound')], default='inbound', help_text='Direction of call - inbound (customer to staff) or outbound (staff to customer)', max_length=20)),
+                ('is_callback', models.BooleanField(default=False, help_text='Is this a callback for a missed/pending incoming call?')),
+                ('contacted_at', models.DateTimeField(blank=True, help_text='When staff contacted back for this call', null=True)),
+                ('staff_name', models.CharField(blank=True, help_text='Staff member who handled call', max_length=200, null=True)),
+                ('staff_id', models.CharField(blank=True, help_text='Staff ID', max_length=50, null=True)),
+                ('recording_url', models.URLField(blank=True, help_text='Call recording URL', max_length=500, null=True)),
+                ('disposition_notes', models.TextField(blank=True, help_text='Additional notes about disposition', null=True)),
+                ('customer_name', models.CharField(blank=True, max_length=200, null=True)),
+                ('customer_email', models.EmailField(blank=True, max_length=254, null=True)),
+                ('customer_address', models.TextField(blank=True, null=True)),
+                ('vehicle_model', models.CharField(blank=True, help_text='Vehicle model of interest', max_length=100, null=True)),
+                ('vehicle_variant', models.CharField(blank=True, max_length=100, null=True)),
+                ('is_lead', models.BooleanField(default=False, help_text='Is this a potential lead?')),
+                ('lead_quality', models.CharField(blank=True, choices=[('hot', 'Hot Lead'), ('warm', 'Warm Lead'), ('cold', 'Cold Lead')], max_length=20, null=True)),
+                ('raw_webhook_data', models.JSONField(blank=True, help_text='Raw webhook data received', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('payload', models.BinaryField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'callmanagement_anycall',
+                'ordering': ['-call_start_time'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='AnyCallNote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note', models.TextField()),
+                ('created_by', models.CharField(blank=True, max_length=200, null=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'callmanagement_anycallnote',
+                'ordering': ['-created_at'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('call_id', models.CharField(help_text='Unique call identifier', max_length=100, unique=True)),
+                ('call_sid', models.CharField(blank=True, help_text='Call SID from provider', max_length=100, null=True)),
+                ('caller_number', models.CharField(help_text="Caller's phone number", max_length=20)),
+                ('caller_name', models.CharField(blank=True, help_text="Caller's name", max_length=200, null=True)),
+                ('normalized_number', models.CharField(blank=True, default='', editable=False, help_text='Last 10 digits of caller_number (filled on save)', max_length=10)),
+                ('call_start_time', models.DateTimeField(help_text='When call started')),
+                ('call_end_time', models.DateTimeField(blank=True, help_text='When call ended', null=True)),
+                ('call_duration', models.IntegerField(default=0, help_text='Call duration in seconds')),
+                ('call_status', models.CharField(choices=[('ringing', 'Ringing'), ('answered', 'Answered'), ('busy', 'Busy'), ('no-answer', 'No Answer'), ('missed', 'Missed'), ('failed', 'Failed'), ('completed', 'Completed')], default='ringing', max_length=50)),
+                ('call_direction', models.CharField(choices=[('inbound', 'Inbound'), ('outbound', 'Outbound')], default='inbound', help_text='Direction of call - inbound (customer to staff) or outbound (staff to customer)', max_length=20)),
+                ('is_callback', models.BooleanField(default=False, help_text='Is this a callback for a missed/pending incoming call?')),
+                ('contacted_at', models.DateTimeField(blank=True, help_text='When staff contacted back for this call', null=True)),
+                ('staff_name', models.CharField(blank=True, help_text='Staff member who handled call', max_length=200, null=True)),
+                ('staff_id', models.CharField(blank=True, help_text='Staff ID', max_length=50, null=True)),
+                ('recording_url', models.URLField(blank=True, help_text='Call recording URL', max_length=500, null=True)),
+                ('disposition_notes', models.TextField(blank=True, help_text='Additional notes about disposition', null=True)),
+                ('customer_name', models.CharField(blank=True, max_length=200, null=True)),
+                ('customer_email', models.EmailField(blank=True, max_length=254, null=True)),
+                ('customer_address', models.TextField(blank=True, null=True)),
+                ('vehicle_model', models.CharField(blank=True, help_text='Vehicle model of interest', max_length=100, null=True)),
+                ('vehicle_variant', models.CharField(blank=True, max_length=100, null=True)),
+                ('is_lead', models.BooleanField(default=False, help_text='Is this a potential lead?')),
+                ('lead_quality', models.CharField(blank=True, choices=[('hot', 'Hot Lead'), ('warm', 'Warm Lead'), ('cold', 'Cold Lead')], max_length=20, null=True)),
+                ('raw_webhook_data', models.JSONField(blank=True, help_text='Raw webhook data received', null=True)),
+                ('payload', models.BinaryField(blank=True, help_text='zlib-compressed JSON (from CallPayload)', null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('disposition', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_calls', to='callmanagement.calldisposition')),
+            ],
+            options={
+                'verbose_name': 'Archived Call',
+                'verbose_name_plural': 'Archived Calls',
+                'ordering': ['-call_start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedCallNote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note', models.TextField()),
+                ('created_by', models.CharField(blank=True, max_length=200, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('call', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notes', to='callmanagement.archivedcall')),
+            ],
+            options={
+                'verbose_name': 'Archived Call Note',
+                'verbose_name_plural': 'Archived Call Notes',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedcall',
+            index=models.Index(fields=['call_start_time', 'id'], name='archived_call_start_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcall',
+            index=models.Index(fields=['normalized_number', 'call_start_time'], name='archived_call_number_idx'),
+        ),
+        migrations.RunSQL(CREATE_VIEWS, DROP_VIEWS),
+    ]
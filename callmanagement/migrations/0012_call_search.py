@@ -0,0 +1,86 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:41
+
+from django.db import migrations, models
+
+# Postgres: GIN trigram indexes the ?search= lookups use (see search.py)
+TRIGRAM_INDEXES = [
+    (f'{prefix}_{column}_trgm_idx', table, expression)
+    for prefix, table in (('call', 'callmanagement_incomingcall'), ('archived_call', 'callmanagement_archivedcall'))
+    for column, expression in (
+        ('number', 'normalized_number'),
+        ('caller_name', 'UPPER(caller_name)'),
+        ('customer_name', 'UPPER(customer_name)'),
+    )
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, table, expression in TRIGRAM_INDEXES:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({expression} gin_trgm_ops)'
+            )
+        return
+
+    # Other backends search CallSearchTerm - fill it for the existing calls
+    from callmanagement.search import search_terms
+
+    CallSearchTerm = apps.get_model('callmanagement', 'CallSearchTerm')
+    # Archive first, so the hot row's terms replace those of a call in both
+    for model_name in ('ArchivedCall', 'IncomingCall'):
+        calls = apps.get_model('callmanagement', model_name).objects.order_by('pk').values_list(
+            'call_id', 'normalized_number', 'caller_name', 'customer_name'
+        )
+        chunk = []
+        for call in calls.iterator(chunk_size=5000):
+            chunk.append(call)
+            if len(chunk) == 5000:
+                _index_calls(CallSearchTerm, chunk, search_terms)
+                chunk = []
+        _index_calls(CallSearchTerm, chunk, search_terms)
+
+
+def _index_calls(CallSearchTerm, calls, search_terms):
+    CallSearchTerm.objects.filter(call_id__in=[call_id for call_id, *_ in calls]).delete()
+    CallSearchTerm.objects.bulk_create(
+        [
+            CallSearchTerm(term=term, call_id=call_id)
+            for call_id, number, *names in calls
+            for term in search_terms(number, *names)
+        ],
+        batch_size=5000,
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name, table, expression in TRIGRAM_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callmanagement', '0011_call_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=16)),
+                ('call_id', models.CharField(db_index=True, help_text='IncomingCall / ArchivedCall call_id', max_length=100)),
+            ],
+            options={
+                'verbose_name': 'Call Search Term',
+                'verbose_name_plural': 'Call Search Terms',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='callsearchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'call_id'), name='call_search_term_unique'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
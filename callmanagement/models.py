@@ -1,9 +1,39 @@
+import json
+import zlib
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 
 
-class IncomingCall(models.Model):
-    """Model to store incoming call data from Tata Dealer"""
+# call_status values that count as a missed call
+MISSED_CALL_STATUSES = ('missed', 'no-answer', 'busy')
+
+# IncomingCall fields that CallRollup counts are keyed on / sum up
+ROLLUP_FIELDS = (
+    'call_start_time', 'call_status', 'call_direction', 'disposition_id',
+    'lead_quality', 'is_lead', 'call_duration',
+)
+
+
+def normalize_phone_number(number):
+    """National part of a phone number (last 10 digits) used for callback matching"""
+    if not number:
+        return ''
+    digits = ''.join(ch for ch in str(number) if ch.isdigit())
+    return digits[-10:]
+
+
+class IncomingCallQuerySet(models.QuerySet):
+
+    def with_details(self):
+        """Load disposition and notes up front - what IncomingCallSerializer and the formatted views read per call"""
+        return self.select_related('disposition').prefetch_related('notes')
+
+
+class CallRecord(models.Model):
+    """Columns of a call, shared by the hot (IncomingCall) and archive (ArchivedCall) tables"""
 
     # Call identification
     call_id = models.CharField(max_length=100, unique=True, help_text="Unique call identifier")
@@ -12,6 +42,13 @@ class IncomingCall(models.Model):
     # Caller information
     caller_number = models.CharField(max_length=20, help_text="Caller's phone number")
     caller_name = models.CharField(max_length=200, blank=True, null=True, help_text="Caller's name")
+    normalized_number = models.CharField(
+        max_length=10,
+        blank=True,
+        default='',
+        editable=False,
+        help_text="Last 10 digits of caller_number (filled on save)"
+    )
 
     # Call timing
     call_start_time = models.DateTimeField(help_text="When call started")
@@ -62,14 +99,7 @@ class IncomingCall(models.Model):
     # Recording
     recording_url = models.URLField(max_length=500, blank=True, null=True, help_text="Call recording URL")
 
-    # Disposition
-    disposition = models.ForeignKey(
-        'CallDisposition',
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='calls'
-    )
+    # Disposition (the disposition foreign key is declared per table)
     disposition_notes = models.TextField(blank=True, null=True, help_text="Additional notes about disposition")
 
     # Customer information
@@ -95,18 +125,27 @@ class IncomingCall(models.Model):
     )
 
     # Metadata
+    # Only filled with CALL_PAYLOAD_STORAGE = 'inline'; see CallPayload
     raw_webhook_data = models.JSONField(blank=True, null=True, help_text="Raw webhook data received")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-call_start_time']
-        verbose_name = 'Incoming Call'
-        verbose_name_plural = 'Incoming Calls'
+        abstract = True
 
     def __str__(self):
         return f"{self.caller_number} - {self.call_start_time.strftime('%Y-%m-%d %H:%M')}"
 
+    def save(self, *args, **kwargs):
+        self.normalized_number = normalize_phone_number(self.caller_number)
+
+        # update_or_create() saves with update_fields - keep the two columns in sync
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'caller_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_number'}
+
+        super().save(*args, **kwargs)
+
     def get_call_duration_formatted(self):
         """Return formatted call duration"""
         minutes = self.call_duration // 60
@@ -114,6 +153,66 @@ class IncomingCall(models.Model):
         return f"{minutes}m {seconds}s"
 
 
+class IncomingCall(CallRecord):
+    """Model to store incoming call data from Tata Dealer"""
+
+    disposition = models.ForeignKey(
+        'CallDisposition',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='calls'
+    )
+
+    objects = IncomingCallQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-call_start_time']
+        verbose_name = 'Incoming Call'
+        verbose_name_plural = 'Incoming Calls'
+        indexes = [
+            # Callback matching: latest inbound call from a number in the last 24h
+            models.Index(
+                fields=['normalized_number', 'call_direction', 'call_start_time'],
+                name='call_number_dir_start_idx'
+            ),
+            # Default ordering, date-range filters, recent; id for cursor pagination
+            models.Index(fields=['call_start_time', 'id'], name='call_start_id_idx'),
+            # Callback registry rebuild: inbound calls of the last 24h
+            models.Index(fields=['call_direction', 'call_start_time'], name='call_dir_start_idx'),
+            # missed: only the missed rows, newest first
+            models.Index(
+                fields=['-call_start_time', '-id'],
+                condition=models.Q(call_status__in=MISSED_CALL_STATUSES),
+                name='call_missed_start_idx'
+            ),
+            # pending: calls still waiting for a disposition, newest first
+            models.Index(
+                fields=['-call_start_time', '-id'],
+                condition=models.Q(disposition__isnull=True),
+                name='call_pending_start_idx'
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the call was counted as, so a later save can move it
+        # to its new CallRollup buckets
+        if all(name in instance.__dict__ for name in ROLLUP_FIELDS):
+            instance._rollup_snapshot = {name: instance.__dict__[name] for name in ROLLUP_FIELDS}
+        return instance
+
+    def get_raw_webhook_data(self):
+        """Raw webhook payload - from CallPayload, or this row when stored inline"""
+        if self.raw_webhook_data is not None:
+            return self.raw_webhook_data
+        try:
+            return self.payload.get_data()
+        except ObjectDoesNotExist:
+            return None
+
+
 class CallDisposition(models.Model):
     """Model to store call disposition types"""
 
@@ -170,3 +269,250 @@ class CallNote(models.Model):
 
     def __str__(self):
         return f"Note for {self.call.call_id} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class CallPayload(models.Model):
+    """
+    Raw webhook payload of a call, zlib-compressed
+
+    Kept out of IncomingCall so the payload (the bulk of a row) is not read
+    by every query on the calls table, only by the detail view and admin.
+    """
+
+    call = models.OneToOneField(IncomingCall, on_delete=models.CASCADE, primary_key=True, related_name='payload')
+    data = models.BinaryField(help_text="zlib-compressed JSON")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Call Payload'
+        verbose_name_plural = 'Call Payloads'
+
+    def __str__(self):
+        return f"Payload of call {self.call_id}"
+
+    @staticmethod
+    def pack(data):
+        """Compressed bytes for a payload"""
+        text = json.dumps(data, separators=(',', ':'), ensure_ascii=False, cls=DjangoJSONEncoder)
+        return zlib.compress(text.encode('utf-8'))
+
+    @staticmethod
+    def unpack(data):
+        """Payload of compressed bytes"""
+        return json.loads(zlib.decompress(data))
+
+    def get_data(self):
+        return self.unpack(self.data)
+
+
+class ArchivedCall(CallRecord):
+    """
+    A call moved out of IncomingCall by archive_calls (see archive.py)
+
+    Same columns and ids as in the hot table, with the compressed payload
+    kept on the row. Read-only: archived calls stay counted in CallRollup
+    and are listed with ?include_archive=true through AnyCall.
+    """
+
+    disposition = models.ForeignKey(
+        'CallDisposition',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='archived_calls'
+    )
+    payload = models.BinaryField(blank=True, null=True, help_text="zlib-compressed JSON (from CallPayload)")
+
+    # Copied from the hot row, not set on insert
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-call_start_time']
+        verbose_name = 'Archived Call'
+        verbose_name_plural = 'Archived Calls'
+        indexes = [
+            models.Index(fields=['call_start_time', 'id'], name='archived_call_start_id_idx'),
+            models.Index(fields=['normalized_number', 'call_start_time'], name='archived_call_number_idx'),
+        ]
+
+    def get_raw_webhook_data(self):
+        """Raw webhook payload - from this row, compressed or inline"""
+        if self.raw_webhook_data is not None:
+            return self.raw_webhook_data
+        if self.payload is None:
+            return None
+        return CallPayload.unpack(self.payload)
+
+
+class ArchivedCallNote(models.Model):
+    """A CallNote moved to the archive with its call"""
+
+    call = models.ForeignKey(ArchivedCall, on_delete=models.CASCADE, related_name='notes')
+    note = models.TextField()
+    created_by = models.CharField(max_length=200, blank=True, null=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Archived Call Note'
+        verbose_name_plural = 'Archived Call Notes'
+
+    def __str__(self):
+        return f"Note for {self.call.call_id} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class AnyCall(CallRecord):
+    """
+    Hot and archived calls together - the read-only view callmanagement_anycall
+
+    A UNION ALL of IncomingCall (with its CallPayload) and ArchivedCall,
+    created in migration 0011; what ?include_archive=true lists, so the
+    filters, ordering and cursors of the hot table apply to both. Archive
+    rows of a call that is back in the hot table are left out. A new
+    CallRecord column needs a migration that recreates the view.
+    """
+
+    disposition = models.ForeignKey(
+        'CallDisposition',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        related_name='+'
+    )
+    payload = models.BinaryField(blank=True, null=True)
+
+    objects = IncomingCallQuerySet.as_manager()
+
+    class Meta:
+        managed = False
+        db_table = 'callmanagement_anycall'
+        ordering = ['-call_start_time']
+
+    get_raw_webhook_data = ArchivedCall.get_raw_webhook_data
+
+
+class AnyCallNote(models.Model):
+    """Notes of hot and archived calls - the read-only view callmanagement_anycallnote"""
+
+    call = models.ForeignKey(
+        AnyCall, on_delete=models.DO_NOTHING, db_constraint=False, related_name='notes'
+    )
+    note = models.TextField()
+    created_by = models.CharField(max_length=200, blank=True, null=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'callmanagement_anycallnote'
+        ordering = ['-created_at']
+
+
+class CallSearchTerm(models.Model):
+    """
+    A search term of a call - a trigram of its names or its reversed number
+
+    Kept up to date on every call write except on Postgres, which searches
+    its pg_trgm indexes instead (see search.py). Keyed on the Tata call_id,
+    so an archived call keeps its terms. Rebuild with:
+    python manage.py rebuild_search_terms
+    """
+
+    term = models.CharField(max_length=16)
+    call_id = models.CharField(max_length=100, db_index=True, help_text="IncomingCall / ArchivedCall call_id")
+
+    class Meta:
+        verbose_name = 'Call Search Term'
+        verbose_name_plural = 'Call Search Terms'
+        constraints = [
+            # Also the index a search reads: term ranges with their calls
+            models.UniqueConstraint(fields=['term', 'call_id'], name='call_search_term_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.term!r} -> {self.call_id}"
+
+
+class CallRollup(models.Model):
+    """
+    Pre-aggregated call counts per hour and per day
+
+    Kept up to date on every IncomingCall save/delete (see rollups.py) so
+    the stats endpoints read a few buckets instead of every call.
+    Rebuild with: python manage.py rebuild_call_rollups
+    """
+
+    bucket_start = models.DateTimeField(help_text="Start of the hour/day (local time) the calls started in")
+    granularity = models.CharField(max_length=10, choices=[('hour', 'Hour'), ('day', 'Day')])
+
+    # Dimensions - no NULLs so the unique constraint covers every bucket
+    disposition_key = models.BigIntegerField(default=0, help_text="CallDisposition id, 0 = no disposition")
+    call_status = models.CharField(max_length=50)
+    call_direction = models.CharField(max_length=20)
+    lead_quality = models.CharField(max_length=20, blank=True, default='')
+    is_lead = models.BooleanField(default=False)
+
+    # Measures
+    call_count = models.IntegerField(default=0)
+    duration_sum = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Call Rollup'
+        verbose_name_plural = 'Call Rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    'granularity', 'bucket_start', 'disposition_key',
+                    'call_status', 'call_direction', 'lead_quality', 'is_lead'
+                ],
+                name='call_rollup_bucket_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket_start:%Y-%m-%d %H:%M} - {self.call_count} calls"
+
+
+class WebhookReceipt(models.Model):
+    """
+    Response sent for a webhook payload, keyed by the payload's fingerprint
+
+    Lets every worker answer a retried webhook with the original response
+    (WEBHOOK_REPLAY_STORE=db, see replays.py). Rows older than
+    WEBHOOK_REPLAY_TTL are ignored and purged as new ones are written. A
+    row with status_code 0 claims a payload that is still being processed.
+    """
+
+    fingerprint = models.CharField(max_length=64, primary_key=True, help_text="SHA-256 of the normalized payload")
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Webhook Receipt'
+        verbose_name_plural = 'Webhook Receipts'
+
+    def __str__(self):
+        return f"{self.fingerprint[:12]} -> {self.status_code}"
+
+
+class ChangeVersion(models.Model):
+    """
+    Write counter of one table, bumped after every committed change
+
+    Feeds the ETag / Last-Modified of the dashboard endpoints (see
+    versions.py) so an unchanged poll is answered with 304.
+    """
+
+    table = models.CharField(max_length=50, primary_key=True, help_text="Model name, e.g. incomingcall")
+    version = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Change Version'
+        verbose_name_plural = 'Change Versions'
+
+    def __str__(self):
+        return f"{self.table} v{self.version}"
@@ -0,0 +1,184 @@
+"""
+Pagination for IncomingCallViewSet
+
+Page numbers by default (?page=N). Passing ?cursor= (empty for the first
+page) switches to keyset pagination on (call_start_time, id): each page is
+one index range scan from the previous page's last row, with no COUNT(*)
+and no OFFSET, so page 10,000 costs the same as page 1.
+
+Cursor pages have no exact total. ?approx_total=1 adds 'approx_count',
+the planner's row estimate (Postgres only, null elsewhere).
+"""
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from urllib import parse
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def approximate_count(queryset):
+    """
+    Planner estimate of queryset.count() without counting rows
+
+    pg_class.reltuples for the whole table, the EXPLAIN row estimate for a
+    filtered queryset. None on databases other than Postgres.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+
+    queryset = queryset.order_by()
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                # Tables only - a view (AnyCall) has no row count of its own
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass AND relkind = 'r'",
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        # -1 until the table has been analyzed
+        if row and row[0] >= 0:
+            return row[0]
+
+    plan = json.loads(queryset.explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CallPagination(PageNumberPagination):
+    cursor_query_param = 'cursor'
+    approx_total_query_param = 'approx_total'
+    invalid_cursor_message = 'Invalid cursor'
+
+    # Newest first; id breaks ties between calls that started together
+    ordering = ('-call_start_time', '-id')
+
+    @classmethod
+    def is_cursor_request(cls, request):
+        return cls.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.is_cursor_request(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        position, reverse = self.start_cursor_page(request)
+        if request.query_params.get(self.approx_total_query_param) in ('1', 'true'):
+            self.approx_count = approximate_count(queryset)
+
+        rows = list(self.cursor_queryset(queryset, position, reverse)[:page_size + 1])
+        return self.finish_cursor_page(rows, page_size, position, reverse)
+
+    def start_cursor_page(self, request):
+        """(position, reverse) of the requested cursor page"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.approx_count = None
+        return self.decode_cursor(request)
+
+    def cursor_queryset(self, queryset, position, reverse):
+        if reverse:
+            queryset = queryset.order_by('call_start_time', 'id')
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(position, reverse))
+        return queryset
+
+    def finish_cursor_page(self, rows, page_size, position, reverse):
+        """The page from up to page_size + 1 fetched rows; sets the links"""
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # Going backwards, the page we came from is the next one
+        if reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        if rows:
+            self.next_position = self.position_of(rows[-1])
+            self.previous_position = self.position_of(rows[0])
+        else:
+            # Empty page: both links lead back across the same boundary
+            self.next_position = self.previous_position = position
+        return rows
+
+    def keyset_filter(self, position, reverse):
+        """Rows after (before, when reverse) `position` in self.ordering"""
+        started, pk = position
+        if reverse:
+            return Q(call_start_time__gte=started) & (
+                Q(call_start_time__gt=started) | Q(call_start_time=started, id__gt=pk)
+            )
+        # The plain range condition lets the database use the call_start_time index
+        return Q(call_start_time__lte=started) & (
+            Q(call_start_time__lt=started) | Q(call_start_time=started, id__lt=pk)
+        )
+
+    def position_of(self, call):
+        return call.call_start_time, call.pk
+
+    def encode_cursor(self, position, reverse):
+        started, pk = position
+        tokens = {'t': started.isoformat(), 'i': pk}
+        if reverse:
+            tokens['r'] = '1'
+        encoded = urlsafe_b64encode(parse.urlencode(tokens).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        """(position, reverse) of ?cursor=; position is None for the first page"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            tokens = parse.parse_qs(urlsafe_b64decode(encoded.encode('ascii')).decode('ascii'))
+            started = parse_datetime(tokens['t'][0])
+            pk = int(tokens['i'][0])
+            reverse = tokens.get('r', ['0'])[0] == '1'
+        except (KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if started is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (started, pk), reverse
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next or self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous or self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+
+        body = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        if self.request.query_params.get(self.approx_total_query_param) in ('1', 'true'):
+            body['approx_count'] = self.approx_count
+        body['results'] = data
+        return Response(body)
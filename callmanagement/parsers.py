@@ -0,0 +1,110 @@
+import codecs
+import json
+from urllib.parse import unquote_plus
+
+from django.conf import settings
+from django.http import QueryDict
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+# Shared decoder - raw_decode() stops at the end of the JSON object, so the
+# trailing "=" (or '"=') Tata appends never has to be located or sliced off
+_json_decoder = json.JSONDecoder()
+
+
+def unquote_plus_bytes(body, encoding='utf-8'):
+    """
+    Percent-decode a form-encoded body in C instead of urllib's Python loop
+
+    Rewrites %XX as \\xXX and lets codecs.escape_decode do the work. Falls
+    back to unquote_plus for malformed escapes (e.g. a stray "%").
+    """
+    escaped = body.replace(b'\\', b'\\\\').replace(b'+', b' ').replace(b'%', b'\\x')
+    try:
+        decoded, _ = codecs.escape_decode(escaped)
+    except ValueError:
+        return unquote_plus(body.decode('latin-1'), encoding=encoding)
+    return decoded.decode(encoding)
+
+
+def parse_tata_body(body, encoding='utf-8'):
+    """
+    Parse a raw Tata Dealer webhook body into a dict
+
+    Tata sends the whole JSON payload as the key of a form-encoded field:
+        %7B%22call_id%22%3A%22...%22%7D=
+    Some senders post the JSON unencoded:
+        {"call_id":"..."}=
+
+    The first byte decides the path so the body is decoded and parsed once:
+    - '{'  -> plain JSON, parsed straight from the body
+    - '%'  -> URL-encoded JSON, percent-decoded once and parsed
+    - else -> regular form data (key=value&...) as a QueryDict
+
+    Returns None if the body is empty.
+    """
+    if not body:
+        return None
+
+    first = body[0]
+
+    try:
+        if first == 0x7B:  # '{'
+            data, _ = _json_decoder.raw_decode(body.decode(encoding))
+            return data
+
+        if first == 0x25:  # '%'
+            data, _ = _json_decoder.raw_decode(unquote_plus_bytes(body, encoding=encoding))
+            return data
+    except (ValueError, UnicodeDecodeError):
+        # Not JSON after all - treat it as a normal form body below
+        pass
+
+    return QueryDict(body, encoding=encoding)
+
+
+class TataWebhookParser(BaseParser):
+    """
+    Parser for Tata Dealer's "JSON as form key" webhook bodies
+
+    Replaces FormParser on the webhook endpoint. Plain form posts still
+    come back as a QueryDict, so existing integrations keep working.
+    """
+
+    media_type = 'application/x-www-form-urlencoded'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            body = stream.read() if stream is not None else b''
+        except OSError as e:
+            raise ParseError(f'Failed to read webhook body: {e}')
+
+        data = parse_tata_body(body, encoding=encoding)
+        if data is None:
+            return QueryDict(encoding=encoding)
+        return data
+
+
+class NDJSONParser(BaseParser):
+    """Newline-delimited JSON (one event per line) as a list - for /webhook/batch/"""
+
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        events = []
+        for number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line.decode(encoding)))
+            except (ValueError, UnicodeDecodeError) as e:
+                raise ParseError(f'NDJSON parse error on line {number}: {e}')
+        return events
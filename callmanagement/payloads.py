@@ -0,0 +1,109 @@
+"""
+Storage of raw webhook payloads (settings.CALL_PAYLOAD_STORAGE)
+
+With 'table' (the default) payloads go to CallPayload, compressed, and
+IncomingCall.raw_webhook_data stays NULL. With 'inline' they stay in
+raw_webhook_data as before.
+"""
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import IncomingCall, CallPayload
+
+
+def payloads_inline():
+    return settings.CALL_PAYLOAD_STORAGE == 'inline'
+
+
+def pop_payload(fields):
+    """
+    Take the payload out of IncomingCall field values
+
+    Returns the payload to pass to store_payloads(), or None when payloads
+    are stored inline (fields are then left as they are).
+    """
+    if payloads_inline() or 'raw_webhook_data' not in fields:
+        return None
+    payload = fields['raw_webhook_data']
+    # Clears a payload the call may still have inline from before
+    fields['raw_webhook_data'] = None
+    return payload
+
+
+def store_payloads(payloads):
+    """Insert or replace the CallPayload rows of {call pk: payload}"""
+    if not payloads:
+        return
+    CallPayload.objects.bulk_create(
+        [CallPayload(call_id=pk, data=CallPayload.pack(data)) for pk, data in payloads.items()],
+        update_conflicts=True,
+        unique_fields=['call'],
+        update_fields=['data', 'updated_at'],
+    )
+
+
+def move_inline_payloads(chunk_size=1000, stdout=None):
+    """
+    Move raw_webhook_data of existing calls into CallPayload
+
+    Walks the calls in primary-key order, one transaction per chunk, so it
+    can be interrupted and rerun. Returns the number of calls moved.
+    """
+    moved = 0
+    last_pk = 0
+
+    while True:
+        chunk = list(
+            IncomingCall.objects.filter(pk__gt=last_pk, raw_webhook_data__isnull=False)
+            .order_by('pk')
+            .values_list('pk', 'raw_webhook_data')[:chunk_size]
+        )
+        if not chunk:
+            break
+
+        with transaction.atomic():
+            CallPayload.objects.bulk_create(
+                [CallPayload(call_id=pk, data=CallPayload.pack(data)) for pk, data in chunk],
+                update_conflicts=True,
+                unique_fields=['call'],
+                update_fields=['data'],
+            )
+            IncomingCall.objects.filter(pk__in=[pk for pk, _ in chunk]).update(raw_webhook_data=None)
+
+        last_pk = chunk[-1][0]
+        moved += len(chunk)
+        if stdout is not None:
+            stdout.write(f'Moved {moved} payloads (last id {last_pk})')
+
+    return moved
+
+
+def restore_inline_payloads(chunk_size=1000, stdout=None):
+    """Copy CallPayload rows back into raw_webhook_data (for switching to 'inline')"""
+    restored = 0
+    last_pk = 0
+
+    while True:
+        chunk = list(
+            CallPayload.objects.filter(call_id__gt=last_pk)
+            .order_by('call_id')
+            .values_list('call_id', 'data')[:chunk_size]
+        )
+        if not chunk:
+            break
+
+        calls = [
+            IncomingCall(pk=pk, raw_webhook_data=CallPayload(data=bytes(data)).get_data())
+            for pk, data in chunk
+        ]
+        with transaction.atomic():
+            IncomingCall.objects.bulk_update(calls, ['raw_webhook_data'])
+            CallPayload.objects.filter(call_id__in=[pk for pk, _ in chunk]).delete()
+
+        last_pk = chunk[-1][0]
+        restored += len(chunk)
+        if stdout is not None:
+            stdout.write(f'Restored {restored} payloads (last id {last_pk})')
+
+    return restored
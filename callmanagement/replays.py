@@ -0,0 +1,315 @@
+"""
+Duplicate suppression for retried webhooks
+
+Tata retries a webhook when we answer slowly. A retry carries the same
+payload, so the response to a payload is remembered under a fingerprint of
+it (SHA-256 of the normalized JSON) and an exact replay gets that response
+back before any parsing into a call, validation or database work - in
+particular an outbound callback is not re-matched and reported as
+"ignored - already contacted".
+
+Only successful responses (2xx) are remembered; invalid payloads and
+failures are processed again on retry.
+
+A retry often arrives while the first request is still running, so a
+payload is claimed (marked in flight) before it is processed. A duplicate of
+a claimed payload gets a 409 so the sender retries later - at once from the
+sync view, whose worker would otherwise sit idle, while the async view
+first waits up to IN_FLIGHT_WAIT_SECONDS for the first response. A claim is
+released when processing fails, and one older than IN_FLIGHT_SECONDS is
+taken over (its worker presumably died).
+
+Claims and responses are only shared between workers by the db store
+(DatabaseReplayCache, the default).
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+
+from .dbthreads import in_db_thread
+from .models import WebhookReceipt
+
+# Purge expired WebhookReceipt rows once every this many writes
+PURGE_EVERY = 1000
+
+# WebhookReceipt.status_code of a payload that is still being processed
+IN_FLIGHT = 0
+
+# A claim this old is abandoned and may be taken over
+IN_FLIGHT_SECONDS = 60
+
+# How long a duplicate waits (async view) for the response of the request processing it
+IN_FLIGHT_WAIT_SECONDS = 5
+
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return {str(key).strip(): _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def fingerprint(payload):
+    """SHA-256 hex digest of a webhook payload, independent of key order and surrounding whitespace"""
+    if hasattr(payload, 'dict'):
+        # QueryDict from a plain form post
+        payload = payload.dict()
+    text = json.dumps(_normalize(payload), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ReplayCache:
+    """
+    Responses by payload fingerprint: per-process, LRU-bounded, expiring after ttl seconds
+
+    suppressed counts the replays answered from the cache, stored the
+    responses remembered (both since the process started).
+    """
+
+    store = 'memory'
+
+    def __init__(self, ttl=600, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # fingerprint -> time.monotonic() it was claimed in this process
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+        self.stored = 0
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, status_code, data = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return status_code, data
+
+    def _put_local(self, key, status_code, data):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, status_code, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._in_flight.pop(key, None)
+
+    def _claim_local(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= now:
+                # Answered since the caller looked
+                return False
+            claimed = self._in_flight.get(key)
+            if claimed is not None and claimed > now - IN_FLIGHT_SECONDS:
+                return False
+            self._in_flight[key] = now
+            return True
+
+    def _release_local(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _lookup(self, key):
+        return self._get_local(key)
+
+    def get(self, key):
+        """(status_code, response data) sent for this fingerprint, or None"""
+        hit = self._lookup(key)
+        if hit is not None:
+            with self._lock:
+                self.suppressed += 1
+        return hit
+
+    def put(self, key, status_code, data):
+        """Remember the response sent for this fingerprint (ends its claim)"""
+        self._put_local(key, status_code, data)
+        with self._lock:
+            self.stored += 1
+
+    def claim(self, key):
+        """Mark this fingerprint in flight; False if it is answered or another request holds it"""
+        return self._claim_local(key)
+
+    def release(self, key):
+        """Drop the claim of a payload whose processing failed, so a retry processes it again"""
+        self._release_local(key)
+
+    async def _alookup(self, key):
+        return self._get_local(key)
+
+    async def aget(self, key):
+        """get() for async views"""
+        hit = await self._alookup(key)
+        if hit is not None:
+            with self._lock:
+                self.suppressed += 1
+        return hit
+
+    async def aput(self, key, status_code, data):
+        """put() for async views"""
+        self.put(key, status_code, data)
+
+    async def aclaim(self, key):
+        """claim() for async views"""
+        return self._claim_local(key)
+
+    async def arelease(self, key):
+        """release() for async views"""
+        self._release_local(key)
+
+    async def await_for(self, key, timeout=IN_FLIGHT_WAIT_SECONDS):
+        """Response stored for a claimed fingerprint within timeout seconds, or None"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            hit = await self.aget(key)
+            if hit is not None:
+                return hit
+        return None
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+            in_flight = len(self._in_flight)
+        return {
+            'store': self.store,
+            'ttl_seconds': self.ttl,
+            'max_entries': self.max_entries,
+            'entries': entries,
+            'in_flight': in_flight,
+            'suppressed': self.suppressed,
+            'stored': self.stored,
+        }
+
+
+class DatabaseReplayCache(ReplayCache):
+    """
+    ReplayCache backed by the WebhookReceipt table, so a retry that lands on
+    another worker is recognised too; the per-process LRU stays in front of it
+    """
+
+    store = 'db'
+
+    def _lookup(self, key):
+        hit = self._get_local(key)
+        if hit is not None:
+            return hit
+
+        receipt = self._receipts(key).values_list('status_code', 'response').first()
+        if receipt is not None:
+            self._put_local(key, *receipt)
+        return receipt
+
+    def _receipts(self, key):
+        """Unexpired responses stored for key (claims excluded)"""
+        return WebhookReceipt.objects.filter(
+            fingerprint=key,
+            created_at__gte=timezone.now() - timedelta(seconds=self.ttl),
+        ).exclude(status_code=IN_FLIGHT)
+
+    def _claimable(self, key, now):
+        """The row of key if an expired receipt or abandoned claim - those can be taken over"""
+        return WebhookReceipt.objects.filter(
+            Q(status_code=IN_FLIGHT, created_at__lt=now - timedelta(seconds=IN_FLIGHT_SECONDS))
+            | Q(created_at__lt=now - timedelta(seconds=self.ttl)),
+            fingerprint=key,
+        )
+
+    def claim(self, key):
+        if not self._claim_local(key):
+            return False
+        now = timezone.now()
+        # The primary key makes the claim atomic across workers
+        _, claimed = WebhookReceipt.objects.get_or_create(
+            fingerprint=key, defaults={'status_code': IN_FLIGHT, 'response': {}}
+        )
+        if not claimed:
+            claimed = self._claimable(key, now).update(status_code=IN_FLIGHT, response={}, created_at=now) == 1
+        if not claimed:
+            self._release_local(key)
+        return claimed
+
+    def release(self, key):
+        self._release_local(key)
+        WebhookReceipt.objects.filter(fingerprint=key, status_code=IN_FLIGHT).delete()
+
+    def put(self, key, status_code, data):
+        super().put(key, status_code, data)
+        try:
+            WebhookReceipt.objects.update_or_create(
+                fingerprint=key,
+                # An expired receipt for the same payload starts a new ttl
+                defaults={'status_code': status_code, 'response': data, 'created_at': timezone.now()},
+            )
+        except IntegrityError:
+            # Another worker stored the same payload at the same moment
+            pass
+
+        if self.stored % PURGE_EVERY == 0:
+            self.purge()
+
+    # The database work of the async methods runs in the database threads
+    # (see dbthreads.py); the per-process LRU is read in the event loop
+
+    async def _alookup(self, key):
+        hit = self._get_local(key)
+        if hit is not None:
+            return hit
+        return await in_db_thread(self._lookup, key)
+
+    async def aput(self, key, status_code, data):
+        await in_db_thread(self.put, key, status_code, data)
+
+    async def aclaim(self, key):
+        return await in_db_thread(self.claim, key)
+
+    async def arelease(self, key):
+        await in_db_thread(self.release, key)
+
+    def purge(self):
+        """Delete expired receipts; returns how many"""
+        deleted, _ = WebhookReceipt.objects.filter(
+            created_at__lt=timezone.now() - timedelta(seconds=self.ttl)
+        ).delete()
+        return deleted
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_replay_cache():
+    """Cache configured by settings.WEBHOOK_REPLAY_STORE, or None when it is 'off'"""
+    global _cache
+    mode = settings.WEBHOOK_REPLAY_STORE
+    if mode == 'off':
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache_class = DatabaseReplayCache if mode == 'db' else ReplayCache
+                _cache = cache_class(
+                    ttl=settings.WEBHOOK_REPLAY_TTL,
+                    max_entries=settings.WEBHOOK_REPLAY_MAX_ENTRIES,
+                )
+    return _cache
@@ -0,0 +1,169 @@
+"""
+Maintenance of the CallRollup table
+
+Every IncomingCall write moves the call out of the rollup buckets it was
+counted in (if any) and into the buckets it belongs to now - one 'hour'
+and one 'day' bucket. Saves that do not change a rollup field cost no
+queries.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AnyCall, CallRollup, ROLLUP_FIELDS
+
+
+GRANULARITIES = ('hour', 'day')
+
+# Rollup values of a call that has not set the field (model defaults)
+DEFAULT_ROLLUP_VALUES = {
+    'call_status': 'ringing',
+    'call_direction': 'inbound',
+    'disposition_id': None,
+    'lead_quality': None,
+    'is_lead': False,
+    'call_duration': 0,
+}
+
+
+def bucket_start(value, granularity):
+    """Start of the local-time hour/day `value` falls in"""
+    local = timezone.localtime(value, timezone.get_default_timezone())
+    if granularity == 'hour':
+        return local.replace(minute=0, second=0, microsecond=0)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_values(call):
+    """ROLLUP_FIELDS of an IncomingCall (or a dict of field values)"""
+    if isinstance(call, dict):
+        values = {**DEFAULT_ROLLUP_VALUES, **{k: call[k] for k in ROLLUP_FIELDS if k in call}}
+        if 'disposition' in call:
+            values['disposition_id'] = call['disposition'].pk if call['disposition'] else None
+    else:
+        values = {name: getattr(call, name) for name in ROLLUP_FIELDS}
+
+    # Webhook data may still carry call_start_time as a string
+    start = values['call_start_time']
+    if isinstance(start, str):
+        start = parse_datetime(start)
+    if isinstance(start, datetime) and timezone.is_naive(start):
+        start = timezone.make_aware(start)
+    values['call_start_time'] = start
+    return values
+
+
+def _bucket_keys(values):
+    if not isinstance(values.get('call_start_time'), datetime):
+        return []
+    return [
+        (
+            granularity,
+            bucket_start(values['call_start_time'], granularity),
+            values['disposition_id'] or 0,
+            values['call_status'] or '',
+            values['call_direction'] or '',
+            values['lead_quality'] or '',
+            bool(values['is_lead']),
+        )
+        for granularity in GRANULARITIES
+    ]
+
+
+KEY_FIELDS = (
+    'granularity', 'bucket_start', 'disposition_key',
+    'call_status', 'call_direction', 'lead_quality', 'is_lead',
+)
+
+
+def apply_rollup_changes(changes):
+    """
+    Apply (old_values, new_values) pairs to CallRollup
+
+    Either side may be None for created/deleted calls. Must run inside the
+    transaction that writes the calls.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for old, new in changes:
+        if old:
+            for key in _bucket_keys(old):
+                deltas[key][0] -= 1
+                deltas[key][1] -= old['call_duration'] or 0
+        if new:
+            for key in _bucket_keys(new):
+                deltas[key][0] += 1
+                deltas[key][1] += new['call_duration'] or 0
+
+    for key, (count, duration) in deltas.items():
+        if count or duration:
+            _bump(dict(zip(KEY_FIELDS, key)), count, duration)
+
+
+def _bump(key, count, duration):
+    bucket = CallRollup.objects.filter(**key)
+    if bucket.update(call_count=F('call_count') + count, duration_sum=F('duration_sum') + duration):
+        return
+    try:
+        with transaction.atomic():
+            CallRollup.objects.create(**key, call_count=count, duration_sum=duration)
+    except IntegrityError:
+        # Created concurrently by another writer
+        bucket.update(call_count=F('call_count') + count, duration_sum=F('duration_sum') + duration)
+
+
+def rebuild_rollups(start=None, end=None, call_model=AnyCall, rollup_model=CallRollup):
+    """
+    Recompute the rollup buckets for calls in [start, end) from scratch
+
+    Counts hot and archived calls alike (AnyCall) - archived calls stay in
+    the stats.
+
+    start/end should be on local day boundaries so no bucket is only
+    partly recomputed. Returns the number of buckets written.
+    """
+    tz = timezone.get_default_timezone()
+    calls = call_model.objects.all()
+    buckets = rollup_model.objects.all()
+    if start is not None:
+        calls = calls.filter(call_start_time__gte=start)
+        buckets = buckets.filter(bucket_start__gte=start)
+    if end is not None:
+        calls = calls.filter(call_start_time__lt=end)
+        buckets = buckets.filter(bucket_start__lt=end)
+
+    rows = {}
+    for granularity in GRANULARITIES:
+        grouped = calls.order_by().annotate(
+            bucket=Trunc('call_start_time', granularity, tzinfo=tz)
+        ).values(
+            'bucket', 'disposition_id', 'call_status', 'call_direction', 'lead_quality', 'is_lead'
+        ).annotate(
+            count=Count('id'),
+            duration=Sum('call_duration'),
+        )
+        for row in grouped:
+            # NULL and '' lead_quality share a bucket
+            key = (
+                granularity, row['bucket'], row['disposition_id'] or 0, row['call_status'],
+                row['call_direction'], row['lead_quality'] or '', row['is_lead'],
+            )
+            bucket = rows.setdefault(key, [0, 0])
+            bucket[0] += row['count']
+            bucket[1] += row['duration'] or 0
+
+    with transaction.atomic():
+        buckets.delete()
+        rollup_model.objects.bulk_create(
+            [
+                rollup_model(**dict(zip(KEY_FIELDS, key)), call_count=count, duration_sum=duration)
+                for key, (count, duration) in rows.items()
+            ],
+            batch_size=1000,
+        )
+    return len(rows)
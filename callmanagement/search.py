@@ -0,0 +1,302 @@
+"""
+Indexed search of calls by phone-number fragment and name (?search=)
+
+?match= picks how the text has to match:
+
+    contains  anywhere in the number or a name (the default)
+    prefix    start of the number, or of a word of a name
+    suffix    end of the number, or of a word of a name
+    fuzzy     names with a word similar to the text (pg_trgm word similarity)
+
+Text made of digits (and + - ( ) spaces) searches normalized_number, the
+national 10 digits; anything else caller_name and customer_name. Number
+prefixes are a range scan of the normalized_number indexes on any backend.
+caller_number may store a 91 / 0 before the national number, so digits
+starting with (the end of) one also match numbers starting with the rest:
+contains finds every call caller_number__icontains did.
+
+On Postgres the other matches use GIN trigram indexes (pg_trgm, created in
+migration 0012) on normalized_number, UPPER(caller_name) and
+UPPER(customer_name) of the hot and archive tables, which LIKE and the
+word-similarity operator use directly.
+
+Elsewhere (SQLite) CallSearchTerm keeps the terms of every call, keyed on
+call_id so archived calls keep theirs: pg_trgm-style trigrams of the names
+and the reversed national number. A name search narrows the calls to those
+having the rarest of the text's trigrams, then checks the names
+themselves; a fuzzy one takes the calls sharing most of its trigrams. A
+number suffix is a range scan of the reversed numbers; number contains
+has no index there and scans normalized_number.
+"""
+
+import math
+import re
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import Upper
+
+from .models import IncomingCall, ArchivedCall, CallSearchTerm, normalize_phone_number
+
+SEARCH_MATCHES = ('contains', 'prefix', 'suffix', 'fuzzy')
+
+# Share of the text's trigrams a fuzzy match needs - pg_trgm's default
+# word_similarity_threshold, which the %> operator uses on Postgres
+FUZZY_THRESHOLD = 0.6
+
+NAME_FIELDS = ('caller_name', 'customer_name')
+
+# Columns a search term is built from
+SEARCH_FIELDS = ('caller_number', *NAME_FIELDS)
+
+NUMBER_RE = re.compile(r'[\d\s()+-]+')
+WORD_RE = re.compile(r'[^\W_]+')
+
+# Marks the reversed number among the terms (never part of a trigram)
+NUMBER_TERM = '#'
+
+# What caller_number may hold before the national number (+91 98765 43210, 098765 43210)
+NUMBER_PREFIXES = ('91', '0')
+
+
+def uses_trigram_indexes():
+    """Postgres searches its pg_trgm indexes; other backends keep CallSearchTerm"""
+    return connection.vendor == 'postgresql'
+
+
+def _word_trigrams(text, front=True, back=True):
+    """pg_trgm-style trigrams of each word of text; front/back pad the first/last word as whole-word edges"""
+    words = WORD_RE.findall(text.lower())
+    found = []
+    for i, word in enumerate(words):
+        if front or i > 0:
+            word = '  ' + word
+        if back or i < len(words) - 1:
+            word = word + ' '
+        found.append({word[j:j + 3] for j in range(len(word) - 2)})
+    return found
+
+
+def _trigrams(text, front=True, back=True):
+    return set().union(*_word_trigrams(text, front, back))
+
+
+def search_terms(normalized_number, *names):
+    """CallSearchTerm terms of one call"""
+    terms = set()
+    for name in names:
+        if name:
+            terms |= _trigrams(name)
+    if normalized_number:
+        terms.add(NUMBER_TERM + normalized_number[::-1])
+    return terms
+
+
+def _starting_with(field, prefix):
+    """Q for values of field starting with prefix, as a range an ordinary index can scan"""
+    following = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': following})
+
+
+def _across_prefix(digits, match):
+    """Q for the numbers digits matches only together with a stored 91 / 0 prefix"""
+    condition = Q()
+    for prefix in NUMBER_PREFIXES:
+        if match == 'contains' and digits in prefix:
+            # Inside the prefix: any call with a number
+            condition |= Q(normalized_number__gt='')
+        # contains may start anywhere in the prefix, prefix only at its start
+        for start in range(len(prefix) if match == 'contains' else 1):
+            head = prefix[start:]
+            if digits.startswith(head) and len(digits) > len(head):
+                condition |= _starting_with('normalized_number', digits[len(head):])
+    return condition
+
+
+def _number_filter(digits, match):
+    if match == 'suffix':
+        digits = normalize_phone_number(digits)
+        if uses_trigram_indexes():
+            return Q(normalized_number__endswith=digits)
+        terms = CallSearchTerm.objects.filter(_starting_with('term', NUMBER_TERM + digits[::-1]))
+        return Q(call_id__in=terms.values('call_id'))
+    if match == 'prefix':
+        return _starting_with('normalized_number', digits) | _across_prefix(digits, match)
+    # contains (a fuzzy number is any number containing it)
+    return Q(normalized_number__contains=digits) | _across_prefix(digits, 'contains')
+
+
+def _name_filter(text, match):
+    if match == 'fuzzy':
+        if uses_trigram_indexes():
+            from django.contrib.postgres.lookups import TrigramWordSimilar
+
+            return Q(*(TrigramWordSimilar(Upper(name), text) for name in NAME_FIELDS), _connector=Q.OR)
+        trigrams = _trigrams(text)
+        return _having_terms(trigrams, math.ceil(len(trigrams) * FUZZY_THRESHOLD))
+
+    # What the names must contain - the same LIKE on every backend
+    lookups = {
+        'contains': [('icontains', text)],
+        'prefix': [('istartswith', text), ('icontains', ' ' + text)],
+        'suffix': [('iendswith', text), ('icontains', text + ' ')],
+    }[match]
+    names = Q(
+        *(Q(**{f'{name}__{lookup}': value}) for name in NAME_FIELDS for lookup, value in lookups),
+        _connector=Q.OR
+    )
+    if uses_trigram_indexes():
+        return names
+
+    word_trigrams = [
+        trigrams for trigrams in _word_trigrams(text, front=match == 'prefix', back=match == 'suffix') if trigrams
+    ]
+    if not word_trigrams:
+        # Words under three letters: no trigram to narrow on
+        return names
+    return _rarest_terms(word_trigrams) & names
+
+
+def _rarest_terms(word_trigrams):
+    """
+    Q for the calls having the rarest trigram of each of the two most selective words
+
+    A match has every trigram the text implies, but narrowing on a few is
+    cheaper than intersecting all of them - the names are checked
+    afterwards anyway. Trigrams of one word mostly come together, so the
+    ones taken are from different words. Counting the calls per trigram
+    reads only the term index.
+    """
+    terms = set().union(*word_trigrams)
+    found = dict(CallSearchTerm.objects.filter(term__in=terms).values_list('term').annotate(calls=Count('id')))
+    if len(found) < len(terms):
+        # No call has one of them
+        return Q(pk__in=[])
+
+    rarest = sorted({min(trigrams, key=found.get) for trigrams in word_trigrams}, key=found.get)[:2]
+    # Intersected inside the subquery, so only calls having both are read
+    calls = None
+    for term in reversed(rarest):
+        having = CallSearchTerm.objects.filter(term=term)
+        if calls is not None:
+            having = having.filter(call_id__in=calls)
+        calls = having.values('call_id')
+    return Q(call_id__in=calls)
+
+
+def _having_terms(terms, count):
+    calls = (
+        CallSearchTerm.objects.filter(term__in=terms)
+        .values('call_id')
+        .annotate(found=Count('id'))
+        .filter(found__gte=count)
+        .values('call_id')
+    )
+    return Q(call_id__in=calls)
+
+
+def search_filter(text, match='contains'):
+    """Q selecting the calls matching text; None for blank text"""
+    if match not in SEARCH_MATCHES:
+        raise ValueError(f"match must be one of: {', '.join(SEARCH_MATCHES)}")
+    text = text.strip()
+    if not text:
+        return None
+
+    if NUMBER_RE.fullmatch(text):
+        digits = ''.join(ch for ch in text if ch.isdigit())
+        # +91 98765 43210 is searched as 9876543210
+        if text.startswith('+91'):
+            digits = digits[2:]
+        if digits:
+            return _number_filter(digits, match)
+        if text.startswith('+'):
+            # '+' or '+91' alone: the start of every number
+            return Q(normalized_number__gt='')
+    return _name_filter(text, match)
+
+
+def search_calls(queryset, text, match='contains'):
+    """Filter a queryset of calls (IncomingCall, ArchivedCall or AnyCall) by search text"""
+    condition = search_filter(text, match)
+    return queryset if condition is None else queryset.filter(condition)
+
+
+def index_calls(calls):
+    """
+    Replace the CallSearchTerm rows of calls - (call_id, normalized_number, caller_name, customer_name) tuples
+
+    No-op on Postgres. Runs in the caller's transaction, so the terms
+    change with the calls.
+    """
+    if uses_trigram_indexes():
+        return
+    calls = list(calls)
+    if not calls:
+        return
+    CallSearchTerm.objects.filter(call_id__in=[call[0] for call in calls])._raw_delete(connection.alias)
+    _insert_terms(calls)
+
+
+def _insert_terms(calls):
+    # executemany() rather than bulk_create(): a call has a dozen terms or so
+    sql = 'INSERT INTO {} ({}, {}) VALUES (%s, %s)'.format(
+        connection.ops.quote_name(CallSearchTerm._meta.db_table),
+        connection.ops.quote_name('term'),
+        connection.ops.quote_name('call_id'),
+    )
+    rows = [(term, call_id) for call_id, number, *names in calls for term in search_terms(number, *names)]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def reindex_calls(call_ids):
+    """Rebuild the terms of hot calls from their stored values (after a bulk upsert)"""
+    if uses_trigram_indexes() or not call_ids:
+        return
+    index_calls(
+        IncomingCall.objects.filter(call_id__in=list(call_ids))
+        .values_list('call_id', 'normalized_number', *NAME_FIELDS)
+    )
+
+
+def unindex_call(call_id):
+    """Drop the terms of a deleted hot call - an archived row of the call gets its own back"""
+    if uses_trigram_indexes():
+        return
+    archived = ArchivedCall.objects.filter(call_id=call_id).values_list('call_id', 'normalized_number', *NAME_FIELDS)
+    index_calls(list(archived) or [(call_id, '', None, None)])
+
+
+def rebuild_search_terms(chunk_size=5000, call_models=(IncomingCall, ArchivedCall), stdout=None):
+    """
+    Rebuild CallSearchTerm from every hot and archived call; returns the number of calls
+
+    Walks each table in primary-key order, one transaction per chunk. A call
+    that is both hot and archived gets the terms of the hot row.
+    """
+    if uses_trigram_indexes():
+        return 0
+    CallSearchTerm.objects.all()._raw_delete(connection.alias)
+
+    total = 0
+    # Archive first, so the hot row's terms replace those of a call in both
+    for call_model in reversed(call_models):
+        last_pk = 0
+        indexed = 0
+        while True:
+            chunk = list(
+                call_model.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'call_id', 'normalized_number', *NAME_FIELDS)[:chunk_size]
+            )
+            if not chunk:
+                break
+            with transaction.atomic():
+                index_calls(row[1:] for row in chunk)
+            last_pk = chunk[-1][0]
+            indexed += len(chunk)
+            if stdout is not None:
+                stdout.write(f'Indexed {indexed} {call_model._meta.verbose_name_plural.lower()}')
+        total += indexed
+    return total
@@ -1,6 +1,15 @@
+import logging
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
 from rest_framework import serializers
-from django.db.models import Q
-from .models import IncomingCall, CallDisposition, CallNote
+from .models import IncomingCall, CallDisposition, CallNote, MISSED_CALL_STATUSES, normalize_phone_number
+from .callbacks import CALLBACK_MATCH, get_callback_registry, mark_contacted, pop_callback_match
+from .dispositions import get_disposition_registry
+from .payloads import pop_payload, store_payloads
+from .timestamps import parse_date_time, parse_stamp
+
+logger = logging.getLogger(__name__)
 
 
 class CallDispositionSerializer(serializers.ModelSerializer):
@@ -24,12 +33,85 @@ class CallNoteSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class IncomingCallSerializer(serializers.ModelSerializer):
+class FieldProjectionMixin:
+    """
+    Model serializer that can be cut down to some of its fields
+
+    Pass fields=[...] to keep only those fields and/or omit=[...] to drop
+    some (the ?fields= / ?omit= query parameters). project_queryset() then
+    loads just the columns and relations the remaining fields read.
+    """
+
+    # Columns every projection loads (cursor pagination reads both)
+    projection_always = ('id', 'call_start_time')
+
+    # Model methods used as a source -> columns they read
+    source_dependencies = {}
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        requested = set(fields or ()) | set(omit or ())
+        unknown = requested - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({
+                'fields': [f"Unknown field(s): {', '.join(sorted(unknown))}"]
+            })
+
+        for name in list(self.fields):
+            if (fields is not None and name not in fields) or (omit and name in omit):
+                self.fields.pop(name)
+
+    def project_queryset(self, queryset):
+        """queryset limited with only()/select_related()/prefetch_related() to what the fields read"""
+        opts = queryset.model._meta
+        columns = set(self.projection_always)
+        joins = set()
+        prefetches = set()
+
+        for field in self.fields.values():
+            if field.source == '*':
+                continue
+            name = field.source_attrs[0]
+            # Nested serializer or dotted source into a related object
+            nested = len(field.source_attrs) > 1 or isinstance(field, serializers.BaseSerializer)
+
+            for lookup in (name, *self.source_dependencies.get(name, ())):
+                try:
+                    model_field = opts.get_field(lookup)
+                except FieldDoesNotExist:
+                    continue
+
+                if model_field.concrete:
+                    columns.add(lookup)
+                    if model_field.is_relation and nested:
+                        joins.add(lookup)
+                elif model_field.one_to_one:
+                    # Reverse one-to-one (CallPayload) - one join, no extra query
+                    joins.add(lookup)
+                elif model_field.is_relation:
+                    prefetches.add(lookup)
+
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if joins:
+            queryset = queryset.select_related(*joins)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset.only(*columns)
+
+
+class IncomingCallSerializer(FieldProjectionMixin, serializers.ModelSerializer):
     """Serializer for IncomingCall model"""
 
     disposition_details = CallDispositionSerializer(source='disposition', read_only=True)
     notes = CallNoteSerializer(many=True, read_only=True)
     call_duration_formatted = serializers.CharField(source='get_call_duration_formatted', read_only=True)
+    raw_webhook_data = serializers.JSONField(source='get_raw_webhook_data', read_only=True)
+
+    source_dependencies = {
+        'get_call_duration_formatted': ('call_duration',),
+        'get_raw_webhook_data': ('raw_webhook_data', 'payload'),
+    }
 
     class Meta:
         model = IncomingCall
@@ -48,6 +130,49 @@ class IncomingCallSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class IncomingCallListSerializer(IncomingCallSerializer):
+    """
+    Full IncomingCall for list views (?view=full)
+
+    Everything but raw_webhook_data, which would join the CallPayload of
+    every call listed - the payload is in the detail view and the admin.
+    """
+
+    class Meta(IncomingCallSerializer.Meta):
+        fields = [name for name in IncomingCallSerializer.Meta.fields if name != 'raw_webhook_data']
+        read_only_fields = IncomingCallSerializer.Meta.read_only_fields
+
+
+class IncomingCallSummarySerializer(FieldProjectionMixin, serializers.ModelSerializer):
+    """
+    Compact IncomingCall for list views
+
+    Leaves out raw_webhook_data, notes and the nested disposition - the
+    bulk of a full record. ?view=full on a list returns full records.
+    """
+
+    disposition_name = serializers.CharField(source='disposition.name', read_only=True, default=None)
+    call_duration_formatted = serializers.CharField(source='get_call_duration_formatted', read_only=True)
+
+    source_dependencies = {'get_call_duration_formatted': ('call_duration',)}
+
+    class Meta:
+        model = IncomingCall
+        fields = [
+            'id', 'call_id', 'caller_number', 'caller_name',
+            'call_start_time', 'call_duration', 'call_duration_formatted',
+            'call_status', 'call_direction', 'is_callback', 'contacted_at',
+            'staff_name', 'disposition', 'disposition_name',
+            'is_lead', 'lead_quality',
+        ]
+        read_only_fields = fields
+
+
+def is_ignored_outbound(errors):
+    """True if WebhookCallSerializer rejected an outbound call that is not a callback (not an error)"""
+    return 'call_direction' in errors and 'Outbound call ignored' in str(errors['call_direction'])
+
+
 class WebhookCallSerializer(serializers.Serializer):
     """Serializer for incoming webhook data from Tata Dealer"""
 
@@ -100,7 +225,21 @@ class WebhookCallSerializer(serializers.Serializer):
         1. Standard format (call_id, caller_number, call_start_time)
         2. Tata Dealer format (call_id, caller_id_number, start_stamp, agent, disposition dict)
         """
-        from datetime import timedelta
+        data = self.normalize(data)
+
+        # FILTER OUTBOUND CALLS: Check if it's a valid callback before even processing
+        if data.get('call_direction', 'inbound') == 'outbound':
+            self.match_callback(data)
+
+        return data
+
+    def normalize(self, data):
+        """
+        Field values of a webhook (self.initial_data) in the standard format
+
+        The rules of validate() without the database: import_calls applies
+        them to historical records and matches callbacks itself.
+        """
 
         # Normalize Tata Dealer format to standard format
         # For caller_number field:
@@ -120,66 +259,21 @@ class WebhookCallSerializer(serializers.Serializer):
             # Fallback
             data['caller_number'] = self.initial_data.get('caller_id_number') or self.initial_data.get('call_to_number')
 
+        # Tata timestamps -> aware datetimes; an invalid stamp ("Invalid date")
+        # falls back to start_date + start_time (see timestamps.py)
         if 'start_stamp' in self.initial_data:
-            # Fix Tata's datetime format: "2025-11-07T12:42:23 05:30" -> "2025-11-07T12:42:23+05:30"
-            start_stamp = self.initial_data.get('start_stamp')
-            if start_stamp and str(start_stamp).lower() not in ['invalid date', 'none', '']:
-                start_stamp = str(start_stamp)
-                # Fix timezone format if space exists
-                if ' ' in start_stamp and start_stamp.count(':') >= 2:
-                    parts = start_stamp.rsplit(' ', 1)
-                    if len(parts) == 2 and ':' in parts[1]:
-                        start_stamp = parts[0] + '+' + parts[1]
-                data['call_start_time'] = start_stamp
-            else:
-                # Invalid start_stamp - try to build from start_date + start_time
-                if 'start_date' in self.initial_data and 'start_time' in self.initial_data:
-                    start_date = self.initial_data.get('start_date')
-                    start_time = self.initial_data.get('start_time')
-                    if start_date and start_time:
-                        # Combine date and time: "2025-11-13" + "24:51:54" -> "2025-11-13T00:51:54+05:30"
-                        # Handle invalid time like "24:51:54" (should be "00:51:54")
-                        time_parts = str(start_time).split(':')
-                        if len(time_parts) == 3:
-                            hour = int(time_parts[0]) % 24  # Fix hour >= 24
-                            fixed_time = f"{hour:02d}:{time_parts[1]}:{time_parts[2]}"
-                            data['call_start_time'] = f"{start_date}T{fixed_time}+05:30"
-                            print(f"[INFO] Fixed invalid start_stamp using start_date+start_time: {data['call_start_time']}")
-                        else:
-                            data['call_start_time'] = None
-                    else:
-                        data['call_start_time'] = None
-                else:
-                    data['call_start_time'] = None
+            start = parse_stamp(self.initial_data.get('start_stamp'))
+            if start is None:
+                start = parse_date_time(self.initial_data.get('start_date'), self.initial_data.get('start_time'))
+                if start is not None:
+                    logger.info('Fixed invalid start_stamp using start_date+start_time: %s', start)
+            data['call_start_time'] = start
 
         if 'end_stamp' in self.initial_data:
-            # Fix Tata's datetime format
-            end_stamp = self.initial_data.get('end_stamp')
-            if end_stamp and str(end_stamp).lower() not in ['invalid date', 'none', '']:
-                end_stamp = str(end_stamp)
-                # Fix timezone format if space exists
-                if ' ' in end_stamp and end_stamp.count(':') >= 2:
-                    parts = end_stamp.rsplit(' ', 1)
-                    if len(parts) == 2 and ':' in parts[1]:
-                        end_stamp = parts[0] + '+' + parts[1]
-                data['call_end_time'] = end_stamp
-            else:
-                # Invalid end_stamp - try to build from end_date + end_time
-                if 'end_date' in self.initial_data and 'end_time' in self.initial_data:
-                    end_date = self.initial_data.get('end_date')
-                    end_time = self.initial_data.get('end_time')
-                    if end_date and end_time:
-                        time_parts = str(end_time).split(':')
-                        if len(time_parts) == 3:
-                            hour = int(time_parts[0]) % 24  # Fix hour >= 24
-                            fixed_time = f"{hour:02d}:{time_parts[1]}:{time_parts[2]}"
-                            data['call_end_time'] = f"{end_date}T{fixed_time}+05:30"
-                        else:
-                            data['call_end_time'] = None
-                    else:
-                        data['call_end_time'] = None
-                else:
-                    data['call_end_time'] = None
+            end = parse_stamp(self.initial_data.get('end_stamp'))
+            if end is None:
+                end = parse_date_time(self.initial_data.get('end_date'), self.initial_data.get('end_time'))
+            data['call_end_time'] = end
 
         if 'duration' in self.initial_data:
             try:
@@ -249,23 +343,23 @@ class WebhookCallSerializer(serializers.Serializer):
         # If no agent, it's an inbound call (customer calling)
         if has_agent:
             data['call_direction'] = 'outbound'
-            print(f"[INFO] Detected OUTBOUND call (staff present: {data.get('staff_name', 'Yes')})")
+            logger.debug('Detected OUTBOUND call (staff present: %s)', data.get('staff_name', 'Yes'))
         else:
             # No agent/staff info = customer called us = inbound
             data['call_direction'] = 'inbound'
-            print(f"[INFO] Detected INBOUND call (no staff info, customer: {data.get('caller_number')})")
+            logger.debug('Detected INBOUND call (no staff info, customer: %s)', data.get('caller_number'))
 
         # Override with explicit direction field if present (for manual specification)
         if 'direction' in self.initial_data:
             direction = str(self.initial_data['direction']).lower().strip()
             if direction in ['inbound', 'outbound']:
                 data['call_direction'] = direction
-                print(f"[INFO] Direction overridden by webhook field: {direction}")
+                logger.debug('Direction overridden by webhook field: %s', direction)
         elif 'call_direction' in self.initial_data:
             direction = str(self.initial_data['call_direction']).lower().strip()
             if direction in ['inbound', 'outbound']:
                 data['call_direction'] = direction
-                print(f"[INFO] Direction overridden by webhook field: {direction}")
+                logger.debug('Direction overridden by webhook field: %s', direction)
 
         # Validation: Ensure required fields are present
         if not data.get('call_id'):
@@ -278,112 +372,110 @@ class WebhookCallSerializer(serializers.Serializer):
         if not data.get('call_start_time'):
             from django.utils import timezone
             data['call_start_time'] = timezone.now()
-            print("[INFO] call_start_time was missing, using current time for missed call")
+            logger.info('call_start_time was missing, using current time for missed call %s', data['call_id'])
+
+        return data
+
+    def match_callback(self, data):
+        """
+        Accept an outbound call only as the callback of a pending missed call
+
+        Raises ValidationError (see is_ignored_outbound) otherwise; the missed
+        call is returned in data[CALLBACK_MATCH] for the save to mark contacted.
+        """
+        from datetime import timedelta
+        from django.utils import timezone
 
-        # FILTER OUTBOUND CALLS: Check if it's a valid callback before even processing
-        call_direction = data.get('call_direction', 'inbound')
         caller_number = data.get('caller_number')
 
-        if call_direction == 'outbound':
-            from django.utils import timezone
-            # For outbound calls:
-            # - caller_number/caller_id_number = Staff's number (who is calling)
-            # - call_to_number = Customer's number (who is being called)
-            # We need to check if this customer had a recent missed incoming call
-
-            # Get the customer number from call_to_number field
-            customer_number = self.initial_data.get('call_to_number')
-
-            if not customer_number:
-                # Fallback: use caller_number if call_to_number not found
-                customer_number = caller_number
-
-            # Normalize phone number (remove spaces, add prefix if needed)
-            customer_number = str(customer_number).strip()
-
-            print(f"[DEBUG] Outbound call: Staff {caller_number} calling customer {customer_number}")
-
-            # Check if there's a recent missed incoming call from this customer number
-            # Look for missed calls in the last 1 day (24 hours)
-            cutoff_date = timezone.now() - timedelta(days=1)
-
-            # Debug: Show what we're searching for
-            print(f"[DEBUG] Searching for incoming missed calls since {cutoff_date}")
-            print(f"[DEBUG] Customer number to match: '{customer_number}' (length: {len(customer_number)})")
-            if len(customer_number) >= 10:
-                print(f"[DEBUG] Last 10 digits: '{customer_number[-10:]}'")
-
-            # Get all recent missed incoming calls for debugging
-            all_missed = IncomingCall.objects.filter(
-                call_direction='inbound',
-                call_status__in=['missed', 'no-answer', 'busy'],
-                call_start_time__gte=cutoff_date
-            )
-            print(f"[DEBUG] Found {all_missed.count()} missed incoming calls in last 24h")
-            for mc in all_missed[:5]:
-                print(f"[DEBUG]   - Caller: '{mc.caller_number}' (length: {len(mc.caller_number)})")
-
-            # Try to find a matching incoming call - match with or without country code
-            # Get the LATEST call from this number to check its status
-            latest_call = IncomingCall.objects.filter(
-                call_direction='inbound',
-                call_start_time__gte=cutoff_date
-            ).filter(
-                Q(caller_number=customer_number) |
-                Q(caller_number__endswith=customer_number[-10:] if len(customer_number) >= 10 else customer_number) |
-                Q(caller_number__contains=customer_number)
-            ).order_by('-call_start_time').first()
-
-            # Check if latest call is still missed/pending
-            # If latest call is completed/answered, no need for callback
-            if latest_call:
-                print(f"[DEBUG] Latest call status: {latest_call.call_status}, contacted_at: {latest_call.contacted_at}")
-                if latest_call.call_status not in ['missed', 'no-answer', 'busy']:
-                    # Latest call was answered/completed - no callback needed
-                    print(f"[INFO] Ignoring outbound - latest call status is '{latest_call.call_status}' (not missed)")
-                    raise serializers.ValidationError({
-                        'call_direction': 'Outbound call ignored - latest call is not missed'
-                    })
-                if latest_call.contacted_at is not None:
-                    # Already contacted
-                    print(f"[INFO] Ignoring outbound - already contacted at {latest_call.contacted_at}")
-                    raise serializers.ValidationError({
-                        'call_direction': 'Outbound call ignored - already contacted'
-                    })
-                # Use this as the related incoming call
-                related_incoming_call = latest_call
-            else:
-                related_incoming_call = None
-
-            if not related_incoming_call:
-                # No related missed incoming call found (or already contacted)
-                print(f"[INFO] Ignoring outbound call to {customer_number} - no pending missed incoming call (either no missed call or already contacted)")
+        # For outbound calls:
+        # - caller_number/caller_id_number = Staff's number (who is calling)
+        # - call_to_number = Customer's number (who is being called)
+        # We need to check if this customer had a recent missed incoming call
+
+        # Get the customer number from call_to_number field
+        customer_number = self.initial_data.get('call_to_number')
+
+        if not customer_number:
+            # Fallback: use caller_number if call_to_number not found
+            customer_number = caller_number
+
+        # Normalize phone number (remove spaces, add prefix if needed)
+        customer_number = str(customer_number).strip()
+
+        logger.debug('Outbound call: Staff %s calling customer %s', caller_number, customer_number)
+
+        # Most outbound calls are not callbacks - if no missed call from this
+        # number is pending, reject without touching the database
+        registry = get_callback_registry()
+        if registry is not None and not registry.is_pending(customer_number):
+            logger.debug('Ignoring outbound call to %s - no pending missed incoming call', customer_number)
+            raise serializers.ValidationError({
+                'call_direction': 'Outbound call ignored - no pending missed incoming call found'
+            })
+
+        # Batched writers (batch endpoint, spool worker) flush queued calls
+        # from this number first so the missed call it answers is visible
+        before_callback_match = self.context.get('before_callback_match')
+        if before_callback_match:
+            before_callback_match(customer_number)
+
+        # Check if there's a recent missed incoming call from this customer number
+        # Look for missed calls in the last 1 day (24 hours)
+        cutoff_date = timezone.now() - timedelta(days=1)
+
+        # Try to find a matching incoming call - match with or without country code
+        # Get the LATEST call from this number to check its status
+        # (single range scan on the normalized_number/direction/start index)
+        latest_call = IncomingCall.objects.filter(
+            normalized_number=normalize_phone_number(customer_number),
+            call_direction='inbound',
+            call_start_time__gte=cutoff_date
+        ).order_by('-call_start_time').first()
+
+        # Check if latest call is still missed/pending
+        # If latest call is completed/answered, no need for callback
+        if latest_call:
+            logger.debug('Latest call status: %s, contacted_at: %s', latest_call.call_status, latest_call.contacted_at)
+            if latest_call.call_status not in MISSED_CALL_STATUSES:
+                # Latest call was answered/completed - no callback needed
+                logger.debug("Ignoring outbound - latest call status is '%s' (not missed)", latest_call.call_status)
+                raise serializers.ValidationError({
+                    'call_direction': 'Outbound call ignored - latest call is not missed'
+                })
+            if latest_call.contacted_at is not None:
+                # Already contacted
+                logger.debug('Ignoring outbound - already contacted at %s', latest_call.contacted_at)
                 raise serializers.ValidationError({
-                    'call_direction': 'Outbound call ignored - no pending missed incoming call found'
+                    'call_direction': 'Outbound call ignored - already contacted'
                 })
+            # Use this as the related incoming call
+            related_incoming_call = latest_call
+        else:
+            related_incoming_call = None
 
-            # Mark as callback
-            data['is_callback'] = True
-            # Set contacted_at to current time (when callback is being made)
-            # Don't use call_start_time as it might be a string
-            data['contacted_at'] = timezone.now()
+        if not related_incoming_call:
+            # No related missed incoming call found (or already contacted)
+            logger.debug('Ignoring outbound call to %s - no pending missed incoming call (either no missed call or already contacted)', customer_number)
+            raise serializers.ValidationError({
+                'call_direction': 'Outbound call ignored - no pending missed incoming call found'
+            })
 
-            # IMPORTANT: Update the related incoming call's contacted_at right here
-            # This ensures it gets updated before the response is sent
-            try:
-                related_incoming_call.contacted_at = timezone.now()
-                related_incoming_call.save(update_fields=['contacted_at'])
-                print(f"[SUCCESS] Updated incoming call {related_incoming_call.call_id} contacted_at = {related_incoming_call.contacted_at}")
-            except Exception as e:
-                print(f"[ERROR] Failed to update incoming call contacted_at: {e}")
+        # Mark as callback
+        data['is_callback'] = True
+        # Set contacted_at to current time (when callback is being made)
+        # Don't use call_start_time as it might be a string
+        data['contacted_at'] = timezone.now()
 
-            print(f"[INFO] Saving outbound callback to {customer_number} for missed call {related_incoming_call.call_id}")
+        # The missed call is marked contacted by whatever saves this call
+        # (create() or CallBatchWriter.flush()), in the same transaction
+        data[CALLBACK_MATCH] = related_incoming_call
 
-        return data
+        logger.info('Saving outbound callback to %s for missed call %s', customer_number, related_incoming_call.call_id)
 
-    def create(self, validated_data):
-        """Create or update IncomingCall from webhook data"""
-        from django.utils import timezone
+    def get_call_fields(self, validated_data):
+        """IncomingCall field values for validated webhook data (resolves the disposition)"""
+        validated_data = dict(validated_data)
 
         # Extract disposition code and get disposition object
         disposition_code = validated_data.pop('disposition_code', None)
@@ -392,7 +484,7 @@ class WebhookCallSerializer(serializers.Serializer):
         if disposition_code:
             # Auto-create CallDisposition if it doesn't exist
             disposition_name = validated_data.get('disposition_notes', disposition_code)
-            disposition, created = CallDisposition.objects.get_or_create(
+            disposition, created = get_disposition_registry().get_or_create(
                 code=disposition_code,
                 defaults={
                     'name': disposition_name,
@@ -403,19 +495,32 @@ class WebhookCallSerializer(serializers.Serializer):
             )
 
         # Store raw data
-        raw_data = self.initial_data
+        return {
+            **validated_data,
+            'disposition': disposition,
+            'raw_webhook_data': self.initial_data
+        }
+
+    def create(self, validated_data):
+        """Create or update IncomingCall from webhook data"""
 
         # SAVE INBOUND CALLS and VALID OUTBOUND CALLBACKS
         # (Outbound filtering and incoming call update already done in validate())
         # Get or create the call
-        call, created = IncomingCall.objects.update_or_create(
-            call_id=validated_data['call_id'],
-            defaults={
-                **validated_data,
-                'disposition': disposition,
-                'raw_webhook_data': raw_data
-            }
-        )
+        fields = self.get_call_fields(validated_data)
+        payload = pop_payload(fields)
+        answered = pop_callback_match(fields)
+
+        with transaction.atomic():
+            call, created = IncomingCall.objects.update_or_create(
+                call_id=validated_data['call_id'],
+                defaults=fields
+            )
+            if payload is not None:
+                store_payloads({call.pk: payload})
+            if answered is not None:
+                mark_contacted(answered, call.contacted_at)
+                logger.info('Updated incoming call %s contacted_at = %s', answered.call_id, answered.contacted_at)
 
         return call
 
@@ -432,3 +537,9 @@ class CallStatsSerializer(serializers.Serializer):
     hot_leads = serializers.IntegerField()
     warm_leads = serializers.IntegerField()
     cold_leads = serializers.IntegerField()
+
+
+class CallStatsGroupSerializer(CallStatsSerializer):
+    """Call statistics for one group of /incoming-calls/stats/?group_by="""
+
+    group = serializers.CharField(allow_null=True)
@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .analytics_cache import calls_changed, everything_changed
+from .callbacks import get_callback_registry
+from .dispositions import get_disposition_registry
+from .events import call_event, publish
+from .models import IncomingCall, CallDisposition, CallNote, ROLLUP_FIELDS
+from .rollups import apply_rollup_changes, rollup_values
+from .search import SEARCH_FIELDS, index_calls, unindex_call
+from .versions import mark_changed
+
+
+@receiver(post_save, sender=IncomingCall)
+def update_callback_registry(sender, instance, **kwargs):
+    """Keep the pending-callback registry in step with saved calls"""
+    registry = get_callback_registry()
+    if registry is not None:
+        registry.record(instance)
+
+
+@receiver(pre_save, sender=IncomingCall)
+def snapshot_rollup_values(sender, instance, update_fields=None, **kwargs):
+    """Load the current rollup values of calls that were not read from the database"""
+    if instance._state.adding or hasattr(instance, '_rollup_snapshot'):
+        return
+    if update_fields is not None and not set(update_fields) & set(ROLLUP_FIELDS):
+        return
+    instance._rollup_snapshot = (
+        IncomingCall.objects.filter(pk=instance.pk).values(*ROLLUP_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=IncomingCall)
+def update_call_rollups(sender, instance, created, update_fields=None, **kwargs):
+    """Move the call to its new CallRollup buckets (same transaction as the save)"""
+    if update_fields is not None and not set(update_fields) & set(ROLLUP_FIELDS):
+        return
+    if not created and not hasattr(instance, '_rollup_snapshot'):
+        # save(update_fields=...) without any rollup field - nothing moved
+        return
+    old = None if created else instance._rollup_snapshot
+    new = rollup_values(instance)
+    apply_rollup_changes([(old, new)])
+    instance._rollup_snapshot = new
+
+
+@receiver(post_delete, sender=IncomingCall)
+def remove_call_from_rollups(sender, instance, **kwargs):
+    old = getattr(instance, '_rollup_snapshot', None) or rollup_values(instance)
+    apply_rollup_changes([(old, None)])
+
+
+@receiver(post_save, sender=IncomingCall)
+def update_search_terms(sender, instance, update_fields=None, **kwargs):
+    """Re-index a call whose number or names may have changed (see search.py)"""
+    if update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS):
+        return
+    index_calls([(instance.call_id, instance.normalized_number, instance.caller_name, instance.customer_name)])
+
+
+@receiver(post_delete, sender=IncomingCall)
+def remove_search_terms(sender, instance, **kwargs):
+    unindex_call(instance.call_id)
+
+
+@receiver(post_save, sender=IncomingCall)
+def publish_call_saved(sender, instance, created, **kwargs):
+    """Tell open /incoming-calls/stream/ clients once the save is committed"""
+    if settings.CALL_EVENTS != 'off':
+        publish([call_event('new' if created else 'updated', instance)])
+
+
+@receiver(post_delete, sender=IncomingCall)
+def publish_call_deleted(sender, instance, **kwargs):
+    if settings.CALL_EVENTS != 'off':
+        publish([('deleted', {'id': instance.pk, 'call_id': instance.call_id})])
+
+
+@receiver(post_save, sender=IncomingCall)
+@receiver(post_delete, sender=IncomingCall)
+@receiver(post_save, sender=CallNote)
+@receiver(post_delete, sender=CallNote)
+@receiver(post_save, sender=CallDisposition)
+@receiver(post_delete, sender=CallDisposition)
+def bump_change_version(sender, **kwargs):
+    """New ETags for the endpoints reading this table (see versions.py)"""
+    mark_changed(sender)
+
+
+@receiver(pre_save, sender=IncomingCall)
+def invalidate_analytics_before_move(sender, instance, **kwargs):
+    """A call moved to another start time also leaves its old day"""
+    snapshot = getattr(instance, '_rollup_snapshot', None)
+    if snapshot:
+        calls_changed([snapshot['call_start_time']])
+
+
+@receiver(post_save, sender=IncomingCall)
+@receiver(post_delete, sender=IncomingCall)
+def invalidate_analytics(sender, instance, **kwargs):
+    """Drop cached analytics whose window covers this call (see analytics_cache.py)"""
+    calls_changed([instance.call_start_time])
+
+
+@receiver(post_save, sender=CallNote)
+@receiver(post_delete, sender=CallNote)
+@receiver(post_save, sender=CallDisposition)
+@receiver(post_delete, sender=CallDisposition)
+def invalidate_all_analytics(sender, **kwargs):
+    everything_changed()
+
+
+@receiver(post_save, sender=CallDisposition)
+@receiver(post_delete, sender=CallDisposition)
+def invalidate_disposition_registry(sender, **kwargs):
+    """Reload dispositions everywhere once the change is committed"""
+    transaction.on_commit(get_disposition_registry().invalidate)
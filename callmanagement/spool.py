@@ -0,0 +1,138 @@
+import json
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+
+class WebhookSpool:
+    """
+    Durable on-disk queue of raw webhook payloads (SQLite, WAL mode)
+
+    In 'spool' ingest mode the webhook view only appends here and returns
+    202; the drain_webhook_spool worker reads entries in arrival order,
+    writes them to the database and acknowledges them.
+
+    Entries that keep failing are retried up to max_attempts times and then
+    left in the spool as dead entries for inspection.
+    """
+
+    def __init__(self, path, max_attempts=5):
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+    def _connection(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS spool ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' received_at REAL NOT NULL,'
+                ' payload TEXT NOT NULL,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' last_error TEXT'
+                ')'
+            )
+            self._local.conn = conn
+        return conn
+
+    def append(self, payload):
+        """Persist one payload; returns its spool id once it is on disk"""
+        cursor = self._connection().execute(
+            'INSERT INTO spool (received_at, payload) VALUES (?, ?)',
+            (time.time(), json.dumps(payload, separators=(',', ':')))
+        )
+        return cursor.lastrowid
+
+    def append_many(self, payloads):
+        """Persist several payloads in one transaction; returns how many"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO spool (received_at, payload) VALUES (?, ?)',
+                [(now, json.dumps(payload, separators=(',', ':'))) for payload in payloads]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return len(payloads)
+
+    def fetch(self, limit=500):
+        """Oldest pending entries as (id, received_at, payload) tuples"""
+        rows = self._connection().execute(
+            'SELECT id, received_at, payload FROM spool WHERE attempts < ? ORDER BY id LIMIT ?',
+            (self.max_attempts, limit)
+        ).fetchall()
+        return [(row[0], row[1], json.loads(row[2])) for row in rows]
+
+    def ack(self, ids):
+        """Remove processed entries"""
+        if not ids:
+            return
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('DELETE FROM spool WHERE id = ?', [(i,) for i in ids])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def fail(self, ids, error):
+        """Record a failed attempt so the entries are retried (or given up on)"""
+        if not ids:
+            return
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'UPDATE spool SET attempts = attempts + 1, last_error = ? WHERE id = ?',
+                [(str(error)[:1000], i) for i in ids]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def stats(self):
+        """Spool depth and lag (age of the oldest pending entry)"""
+        depth, oldest = self._connection().execute(
+            'SELECT COUNT(*), MIN(received_at) FROM spool WHERE attempts < ?',
+            (self.max_attempts,)
+        ).fetchone()
+        dead = self._connection().execute(
+            'SELECT COUNT(*) FROM spool WHERE attempts >= ?',
+            (self.max_attempts,)
+        ).fetchone()[0]
+
+        return {
+            'depth': depth,
+            'dead': dead,
+            'lag_seconds': round(time.time() - oldest, 3) if oldest else 0.0,
+        }
+
+
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def get_spool():
+    """Process-wide WebhookSpool for settings.WEBHOOK_SPOOL_PATH"""
+    global _spool
+    if _spool is None:
+        with _spool_lock:
+            if _spool is None:
+                _spool = WebhookSpool(
+                    settings.WEBHOOK_SPOOL_PATH,
+                    max_attempts=settings.WEBHOOK_SPOOL_MAX_ATTEMPTS
+                )
+    return _spool
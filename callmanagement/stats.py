@@ -0,0 +1,176 @@
+"""
+Queries behind /incoming-calls/stats/ and /incoming-calls/by_disposition/
+
+With settings.CALL_STATS_FROM_ROLLUPS the window is answered from
+CallRollup buckets: daily buckets for whole days, hourly buckets for the
+partial days at either end and raw calls only for the partial first hour.
+Cost then depends on the number of buckets, not the number of calls.
+
+Calls are read from AnyCall, so archived calls are counted as they are in
+the rollups.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AnyCall, CallDisposition, CallRollup
+from .rollups import bucket_start
+
+
+STATS_FIELDS = (
+    'total_calls', 'answered_calls', 'missed_calls', 'total_duration',
+    'total_leads', 'hot_leads', 'warm_leads', 'cold_leads',
+)
+
+
+def _stats_aggregates(count, duration):
+    """Aggregates for STATS_FIELDS given how to count calls and sum durations"""
+    return {
+        'total_calls': count(),
+        'answered_calls': count(Q(call_status='answered')),
+        'missed_calls': count(Q(call_status__in=['no-answer', 'busy'])),
+        'total_duration': duration,
+        'total_leads': count(Q(is_lead=True)),
+        'hot_leads': count(Q(lead_quality='hot')),
+        'warm_leads': count(Q(lead_quality='warm')),
+        'cold_leads': count(Q(lead_quality='cold')),
+    }
+
+
+CALL_AGGREGATES = _stats_aggregates(lambda q=None: Count('id', filter=q), Sum('call_duration'))
+ROLLUP_AGGREGATES = _stats_aggregates(lambda q=None: Sum('call_count', filter=q), Sum('duration_sum'))
+
+
+def _group_by_expressions():
+    """?group_by= value -> (expression on the calls, expression on CallRollup or None)"""
+    tz = timezone.get_default_timezone()
+    return {
+        'day': (TruncDate('call_start_time', tzinfo=tz), TruncDate('bucket_start', tzinfo=tz)),
+        'staff': (F('staff_name'), None),
+        'direction': (F('call_direction'), F('call_direction')),
+    }
+
+
+STATS_GROUP_BY = ('day', 'staff', 'direction')
+
+
+def rollup_window(start):
+    """
+    Split [start, now] for rollup reads
+
+    Returns (first_full_hour, Q on CallRollup). Calls in [start,
+    first_full_hour) have to be counted call by call.
+    """
+    first_hour = bucket_start(start, 'hour')
+    if first_hour < start:
+        first_hour += timedelta(hours=1)
+
+    first_day = bucket_start(first_hour, 'day')
+    if first_day < first_hour:
+        first_day += timedelta(days=1)
+
+    today = bucket_start(timezone.now(), 'day')
+
+    if first_day > today:
+        return first_hour, Q(granularity='hour', bucket_start__gte=first_hour)
+
+    return first_hour, (
+        Q(granularity='hour', bucket_start__gte=first_hour, bucket_start__lt=first_day) |
+        Q(granularity='day', bucket_start__gte=first_day, bucket_start__lt=today) |
+        Q(granularity='hour', bucket_start__gte=today)
+    )
+
+
+def _grouped(queryset, aggregates, expression):
+    if expression is None:
+        return [{'group': None, **queryset.aggregate(**aggregates)}]
+    return list(queryset.values(group=expression).annotate(**aggregates).order_by())
+
+
+def call_stats(start, group_by=None):
+    """
+    Call statistics since `start` as (overall, groups)
+
+    groups is a list of per-group stats (with a 'group' key) when group_by
+    is one of STATS_GROUP_BY, otherwise empty.
+    """
+    call_expression, rollup_expression = _group_by_expressions().get(group_by, (None, None))
+
+    if settings.CALL_STATS_FROM_ROLLUPS and (group_by is None or rollup_expression is not None):
+        first_hour, rollup_q = rollup_window(start)
+        parts = _grouped(CallRollup.objects.filter(rollup_q), ROLLUP_AGGREGATES, rollup_expression)
+        parts += _grouped(
+            AnyCall.objects.filter(call_start_time__gte=start, call_start_time__lt=first_hour),
+            CALL_AGGREGATES,
+            call_expression
+        )
+    else:
+        parts = _grouped(AnyCall.objects.filter(call_start_time__gte=start), CALL_AGGREGATES, call_expression)
+
+    merged = defaultdict(lambda: dict.fromkeys(STATS_FIELDS, 0))
+    for part in parts:
+        group = merged[part['group']]
+        for name in STATS_FIELDS:
+            group[name] += part[name] or 0
+
+    overall = dict.fromkeys(STATS_FIELDS, 0)
+    groups = []
+    for key, group in merged.items():
+        if not group['total_calls']:
+            continue
+        for name in STATS_FIELDS:
+            overall[name] += group[name]
+        group['average_duration'] = group['total_duration'] / group['total_calls']
+        groups.append({'group': key, **group})
+
+    overall['average_duration'] = overall['total_duration'] / overall['total_calls'] if overall['total_calls'] else 0
+    groups.sort(key=lambda g: (g['group'] is None, g['group']))
+
+    return overall, groups if group_by else []
+
+
+def disposition_counts(start):
+    """Call counts per disposition since `start`, largest first (by_disposition format)"""
+    if not settings.CALL_STATS_FROM_ROLLUPS:
+        return list(
+            AnyCall.objects.filter(call_start_time__gte=start)
+            .values('disposition__code', 'disposition__name', 'disposition__category')
+            .annotate(count=Count('id'))
+            .order_by('-count')
+        )
+
+    first_hour, rollup_q = rollup_window(start)
+    counts = defaultdict(int)
+
+    for key, count in (
+        CallRollup.objects.filter(rollup_q)
+        .values_list('disposition_key').annotate(count=Sum('call_count')).order_by()
+    ):
+        counts[key or None] += count
+
+    for key, count in (
+        AnyCall.objects.filter(call_start_time__gte=start, call_start_time__lt=first_hour)
+        .values_list('disposition_id').annotate(count=Count('id')).order_by()
+    ):
+        counts[key] += count
+
+    dispositions = CallDisposition.objects.in_bulk([key for key in counts if key])
+
+    rows = []
+    for key, count in counts.items():
+        if count <= 0:
+            continue
+        disposition = dispositions.get(key)
+        rows.append({
+            'disposition__code': disposition.code if disposition else None,
+            'disposition__name': disposition.name if disposition else None,
+            'disposition__category': disposition.category if disposition else None,
+            'count': count,
+        })
+    rows.sort(key=lambda row: -row['count'])
+    return rows
@@ -0,0 +1,640 @@
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .analytics_cache import AnalyticsCache, get_analytics_cache
+from .callbacks import CachePendingCallbackRegistry
+from .importer import CallImporter, RowNormalizer, iter_records
+from .management.commands.bench_timestamps import normalize, variants
+from .models import IncomingCall, CallDisposition, CallNote, WebhookReceipt
+from .replays import IN_FLIGHT, DatabaseReplayCache, fingerprint
+from .search import search_calls
+from .serializers import WebhookCallSerializer
+from .timestamps import IST, parse_date_time, parse_stamp
+from .writer import CallBatchWriter
+
+
+def create_calls(count, now=None, first=0):
+    """Calls spread over the last few days, every status, direction, lead quality and a disposition"""
+    now = now or timezone.now()
+    disposition, _ = CallDisposition.objects.get_or_create(
+        code='D01', defaults={'name': 'Order Status', 'category': 'other'}
+    )
+    statuses = ['answered', 'no-answer', 'busy', 'completed']
+    qualities = ['hot', 'warm', 'cold', '']
+    for i in range(first, first + count):
+        IncomingCall.objects.create(
+            call_id=f'T{i}',
+            caller_number=f'+9198000{i:05d}',
+            call_start_time=now - timedelta(hours=7 * i + 1),
+            call_status=statuses[i % 4],
+            call_direction='outbound' if i % 5 == 0 else 'inbound',
+            call_duration=10 * i,
+            staff_name=f'Staff {i % 3}',
+            is_lead=i % 2 == 0,
+            lead_quality=qualities[i % 4],
+            disposition=disposition if i % 3 == 0 else None,
+        )
+
+
+# Responses are computed, not served from the analytics cache
+@override_settings(ANALYTICS_CACHE_TTL=0)
+class StatsQueryTests(TestCase):
+    """/incoming-calls/stats/ - one aggregate query, plus the ETag's ChangeVersion lookup"""
+
+    url = '/api/incoming-calls/stats/'
+
+    def setUp(self):
+        create_calls(20)
+
+    @override_settings(CALL_STATS_FROM_ROLLUPS=False)
+    def test_one_aggregate_query(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        calls = IncomingCall.objects.filter(call_start_time__gte=timezone.now() - timedelta(days=30))
+        self.assertEqual(response.json()['total_calls'], calls.count())
+        self.assertEqual(response.json()['answered_calls'], calls.filter(call_status='answered').count())
+        self.assertEqual(response.json()['missed_calls'], calls.filter(call_status__in=['no-answer', 'busy']).count())
+        self.assertEqual(response.json()['hot_leads'], calls.filter(lead_quality='hot').count())
+
+    @override_settings(CALL_STATS_FROM_ROLLUPS=False)
+    def test_group_by_is_still_one_query(self):
+        for group_by in ('day', 'staff', 'direction'):
+            with self.subTest(group_by=group_by), self.assertNumQueries(2):
+                response = self.client.get(self.url, {'group_by': group_by})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual(sum(group['total_calls'] for group in data['groups']), data['total_calls'])
+
+    def test_rollups_same_figures(self):
+        # Rollup buckets plus the raw calls of the partial first hour
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        with override_settings(CALL_STATS_FROM_ROLLUPS=False):
+            expected = self.client.get(self.url).json()
+        self.assertEqual(response.json(), expected)
+
+    def test_query_count_does_not_grow_with_calls(self):
+        IncomingCall.objects.all().delete()
+        CallDisposition.objects.all().delete()
+        create_calls(60)
+        with self.assertNumQueries(3):
+            self.client.get(self.url, {'group_by': 'direction'})
+
+
+@override_settings(ANALYTICS_CACHE_TTL=0)
+class EndpointQueryBudgetTests(TestCase):
+    """
+    Queries per request of the incoming-calls endpoints, whatever the page size
+
+    Dispositions and notes are loaded up front (IncomingCallQuerySet.with_details),
+    so another page of calls never costs another query. The @conditional
+    endpoints (missed, pending, stats, by_disposition, recent) include the
+    ChangeVersion lookup behind their ETag.
+    """
+
+    # path under /api/incoming-calls/ -> queries per request
+    BUDGETS = {
+        '': 2,  # COUNT + page
+        '?view=full': 3,  # + notes
+        '?cursor=': 1,
+        'missed/': 3,
+        'missed/?view=full': 4,
+        'pending/': 3,
+        'formatted/': 3,
+        'stats/': 3,
+        'by_disposition/': 4,
+        'recent/': 2,
+        'recent/?view=full': 3,
+        '{pk}/': 2,
+        '{pk}/formatted_detail/': 2,
+    }
+
+    def setUp(self):
+        self.add_calls(10)
+
+    def add_calls(self, count):
+        first = IncomingCall.objects.count()
+        create_calls(count, first=first)
+        for call in IncomingCall.objects.filter(notes__isnull=True):
+            CallNote.objects.create(call=call, note='Customer asked for a callback', created_by='Staff 1')
+            CallNote.objects.create(call=call, note='Called back', created_by='Staff 2')
+
+    def assert_budgets(self):
+        pk = IncomingCall.objects.earliest('pk').pk
+        for path, budget in self.BUDGETS.items():
+            url = '/api/incoming-calls/' + path.format(pk=pk)
+            with self.subTest(url=url), self.assertNumQueries(budget):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_budgets(self):
+        self.assert_budgets()
+
+    def test_budgets_do_not_grow_with_page_size(self):
+        self.add_calls(40)
+        self.assert_budgets()
+
+    def test_only_the_detail_view_reads_payloads(self):
+        call = IncomingCall.objects.earliest('pk')
+        for path in ('?view=full', 'missed/?view=full', 'recent/?view=full'):
+            with self.subTest(path=path), CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/incoming-calls/' + path)
+                self.assertEqual(response.status_code, 200)
+            self.assertNotIn('raw_webhook_data', response.content.decode())
+            self.assertFalse([query for query in queries if 'callpayload' in query['sql']])
+
+        response = self.client.get(f'/api/incoming-calls/{call.pk}/')
+        self.assertIn('raw_webhook_data', response.json())
+
+
+class AnalyticsCacheTests(TestCase):
+    """Entries of stats/ are dropped by the writes that change them, and only by those"""
+
+    url = '/api/incoming-calls/stats/'
+
+    def setUp(self):
+        caches[settings.ANALYTICS_CACHE].clear()
+        self.analytics_cache = get_analytics_cache()
+        create_calls(10)
+
+    def counters(self):
+        stats = self.analytics_cache.stats()
+        return {name: stats[name] for name in ('hits', 'misses')}
+
+    def assert_counted(self, before, **expected):
+        after = self.counters()
+        self.assertEqual({name: after[name] - before[name] for name in after}, {'hits': 0, 'misses': 0, **expected})
+
+    def get_total(self, **params):
+        response = self.client.get(self.url, {'days': 7, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['total_calls']
+
+    def save_call(self, start_time):
+        # Invalidation runs on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            IncomingCall.objects.create(call_id=f'W{start_time.timestamp()}', caller_number='+919800099999', call_start_time=start_time)
+
+    def test_write_outside_the_window_keeps_the_entry(self):
+        total = self.get_total()
+        self.save_call(timezone.now() - timedelta(days=200))
+        before = self.counters()
+        self.assertEqual(self.get_total(), total)
+        self.assert_counted(before, hits=1)
+
+    def test_write_inside_the_window_drops_the_entry(self):
+        total = self.get_total()
+        self.save_call(timezone.now() - timedelta(hours=1))
+        before = self.counters()
+        self.assertEqual(self.get_total(), total + 1)
+        self.assert_counted(before, misses=1)
+
+    def test_note_drops_the_entry(self):
+        self.get_total()
+        with self.captureOnCommitCallbacks(execute=True):
+            CallNote.objects.create(call=IncomingCall.objects.first(), note='Called back', created_by='Staff 1')
+        before = self.counters()
+        self.get_total()
+        self.assert_counted(before, misses=1)
+
+    def test_unread_params_share_the_entry(self):
+        before = self.counters()
+        for buster in range(3):
+            self.get_total(_=buster)
+        self.assert_counted(before, misses=1, hits=2)
+        self.get_total(days=8)
+        self.assert_counted(before, misses=2, hits=2)
+        # No per-key lock outlives its computation
+        self.assertEqual(self.analytics_cache._locks, {})
+
+    def test_lock_of_another_process_is_left_alone(self):
+        analytics_cache = AnalyticsCache(settings.ANALYTICS_CACHE, ttl=60, lock_timeout=0.1)
+        key = 'analytics:stats:test'
+        analytics_cache.cache.add(f'{key}:lock', 1, timeout=60)
+        # Waited out: computed anyway, without taking or releasing the lock
+        result = analytics_cache.get_or_compute(key, time.time(), lambda: ({'total': 1}, 200, True))
+        self.assertEqual(result, ({'total': 1}, 200))
+        self.assertIsNotNone(analytics_cache.cache.get(f'{key}:lock'))
+
+
+class TimestampTests(SimpleTestCase):
+    """timestamps.parse_stamp / parse_date_time over the Tata variants"""
+
+    def assert_stamp(self, value, expected):
+        parsed = parse_stamp(value)
+        self.assertEqual(parsed, expected)
+        self.assertIsNotNone(parsed.tzinfo)
+
+    def test_offsets(self):
+        expected = datetime(2025, 11, 7, 12, 42, 23, tzinfo=IST)
+        self.assert_stamp('2025-11-07T12:42:23+05:30', expected)
+        # '+' lost to form decoding
+        self.assert_stamp('2025-11-07T12:42:23 05:30', expected)
+        self.assert_stamp('2025-11-07T12:42:23+0530', expected)
+        self.assert_stamp('2025-11-07T07:12:23Z', expected)
+        self.assert_stamp('2025-11-07T07:12:23.000Z', expected)
+        self.assert_stamp('2025-11-07T02:12:23-0500', expected)
+        # No offset: IST
+        self.assert_stamp('2025-11-07 12:42:23', expected)
+
+    def test_ist_tzinfo_is_shared(self):
+        self.assertIs(parse_stamp('2025-11-07T12:42:23 05:30').tzinfo, IST)
+        self.assertIs(parse_stamp('2025-11-07T12:42:23').tzinfo, IST)
+
+    def test_fraction(self):
+        self.assert_stamp('2025-11-07T12:42:23.518 05:30', datetime(2025, 11, 7, 12, 42, 23, 518000, tzinfo=IST))
+
+    def test_hour_24_is_hour_0_of_the_same_date(self):
+        expected = datetime(2025, 11, 13, 0, 51, 54, tzinfo=IST)
+        self.assert_stamp('2025-11-13T24:51:54 05:30', expected)
+        self.assertEqual(parse_date_time('2025-11-13', '24:51:54'), expected)
+
+    def test_unreadable_stamps(self):
+        for value in ('Invalid date', 'invalid date', '', 'None', 'garbage', '2025-13-07T12:42:23+05:30', None, 1762531956):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_stamp(value))
+
+    def test_datetimes_pass_through(self):
+        aware = datetime(2025, 11, 7, 7, 12, 23, tzinfo=dt_timezone.utc)
+        self.assertIs(parse_stamp(aware), aware)
+        self.assertEqual(parse_stamp(datetime(2025, 11, 7, 12, 42, 23)), aware)
+
+    def test_date_time(self):
+        self.assertEqual(parse_date_time('2025-11-07', '12:42:23'), datetime(2025, 11, 7, 12, 42, 23, tzinfo=IST))
+        # Without seconds
+        self.assertEqual(parse_date_time('2025-11-07', '12:42'), datetime(2025, 11, 7, 12, 42, tzinfo=IST))
+        for date_value, time_value in (('', ''), ('2025-11-07', ''), ('2025-11-07', 'xx:10:10'), ('2025-11-07', '12:61:00'), (None, '12:42:23')):
+            with self.subTest(date=date_value, time=time_value):
+                self.assertIsNone(parse_date_time(date_value, time_value))
+
+    def test_round_trip(self):
+        """Random instants written in every Tata spelling normalize back exactly"""
+        rng = random.Random(22)
+        start = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+        for _ in range(2000):
+            instant = start + timedelta(seconds=rng.randrange(10 * 365 * 86400))
+            for case in variants(instant, rng):
+                self.assertEqual(normalize(*case), instant, case)
+
+
+class WebhookTimestampTests(TestCase):
+    """WebhookCallSerializer reads the call times through timestamps.py"""
+
+    payload = {
+        'call_id': '1762531956.14871',
+        'caller_id_number': '+916370997812',
+        'direction': 'inbound',
+        'call_status': 'Answered',
+        'start_stamp': '2025-11-07T21:42:36 05:30',
+        'start_date': '2025-11-07',
+        'start_time': '21:42:36',
+        'end_stamp': '2025-11-07T21:42:46 05:30',
+        'end_date': '2025-11-07',
+        'end_time': '21:42:46',
+    }
+
+    def validated(self, **changes):
+        serializer = WebhookCallSerializer(data={**self.payload, **changes})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer.validated_data
+
+    def test_space_for_plus(self):
+        data = self.validated()
+        self.assertEqual(data['call_start_time'], datetime(2025, 11, 7, 21, 42, 36, tzinfo=IST))
+        self.assertEqual(data['call_end_time'], datetime(2025, 11, 7, 21, 42, 46, tzinfo=IST))
+
+    def test_invalid_date_falls_back_to_date_and_time(self):
+        data = self.validated(start_stamp='Invalid date', start_time='24:05:00', end_stamp='Invalid date', end_time='24:06:00')
+        self.assertEqual(data['call_start_time'], datetime(2025, 11, 7, 0, 5, tzinfo=IST))
+        self.assertEqual(data['call_end_time'], datetime(2025, 11, 7, 0, 6, tzinfo=IST))
+
+    def test_unreadable_stamp_falls_back_to_date_and_time(self):
+        data = self.validated(start_stamp='07/11/2025 21:42')
+        self.assertEqual(data['call_start_time'], datetime(2025, 11, 7, 21, 42, 36, tzinfo=IST))
+
+    def test_hour_24_stamp(self):
+        data = self.validated(start_stamp='2025-11-13T24:51:54 05:30')
+        self.assertEqual(data['call_start_time'], datetime(2025, 11, 13, 0, 51, 54, tzinfo=IST))
+
+
+def tata_event(call_id, number, direction='inbound', call_status='Answered', started=None):
+    """Tata webhook payload; an outbound call dials number on call_to_number"""
+    started = (started or timezone.now()).astimezone(IST)
+    event = {
+        'call_id': call_id,
+        'direction': direction,
+        'call_status': call_status,
+        'start_stamp': started.isoformat(timespec='seconds'),
+        'start_date': started.strftime('%Y-%m-%d'),
+        'start_time': started.strftime('%H:%M:%S'),
+    }
+    if direction == 'inbound':
+        event['caller_id_number'] = number
+    else:
+        event.update(caller_id_number='+910000000000', call_to_number=number)
+    return event
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        create_calls(5)
+
+    def test_formats(self):
+        for export_format, content_type in (('csv', 'text/csv'), ('ndjson', 'application/x-ndjson')):
+            with self.subTest(format=export_format):
+                response = self.client.get('/api/incoming-calls/export/', {'format': export_format})
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['Content-Type'].startswith(content_type))
+                body = b''.join(response.streaming_content).decode()
+                self.assertIn('T4', body)
+
+    def test_unknown_format_is_a_bad_request(self):
+        for export_format in ('xml', 'json'):
+            with self.subTest(format=export_format):
+                response = self.client.get('/api/incoming-calls/export/', {'format': export_format})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['message'], 'format must be one of: csv, ndjson')
+
+
+class CallbackRegistryCacheTests(SimpleTestCase):
+    """CALLBACK_REGISTRY=shared only accepts a cache the workers share"""
+
+    def caches(self, backend, **extra):
+        return override_settings(CACHES={'default': {'BACKEND': backend, **extra}})
+
+    def test_process_local_caches_are_refused(self):
+        for backend in ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache'):
+            with self.subTest(backend=backend), self.caches(backend):
+                with self.assertRaises(ImproperlyConfigured):
+                    CachePendingCallbackRegistry('default')
+
+    def test_alias_is_required(self):
+        with self.assertRaises(ImproperlyConfigured):
+            CachePendingCallbackRegistry('')
+
+    def test_shared_cache_is_accepted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.caches('django.core.cache.backends.filebased.FileBasedCache', LOCATION=directory):
+                registry = CachePendingCallbackRegistry('default')
+                registry._set('919800000001', time.time())
+                self.assertIsNotNone(registry._get('919800000001'))
+
+
+class WebhookBatchTests(TestCase):
+    """/api/webhook/batch/ - one result per event, callbacks matched within the batch"""
+
+    url = '/api/webhook/batch/'
+
+    def post(self, events):
+        response = self.client.post(self.url, events, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_result_per_event(self):
+        IncomingCall.objects.create(call_id='B0', caller_number='+919800000000', call_start_time=timezone.now())
+        data = self.post([
+            tata_event('B1', '+919800000001'),
+            tata_event('B0', '+919800000000', call_status='Missed'),
+            tata_event('B2', '+919800000002', direction='outbound'),
+            'not an event',
+            tata_event('B1', '+919800000001', call_status='Missed'),
+        ])
+        self.assertEqual(
+            [(result['index'], result['call_id'], result['result']) for result in data['results']],
+            [(0, 'B1', 'created'), (1, 'B0', 'updated'), (2, 'B2', 'ignored'), (3, None, 'error'), (4, 'B1', 'updated')],
+        )
+        self.assertEqual(data['counts'], {'created': 1, 'updated': 2, 'ignored': 1, 'error': 1})
+        # The later event of B1 wins
+        self.assertEqual(IncomingCall.objects.get(call_id='B1').call_status, 'missed')
+        self.assertFalse(IncomingCall.objects.filter(call_id='B2').exists())
+
+    def test_callback_to_a_missed_call_in_the_same_batch(self):
+        started = timezone.now() - timedelta(hours=1)
+        data = self.post([
+            tata_event('M1', '+919800000001', call_status='Missed', started=started),
+            tata_event('C1', '+919800000001', direction='outbound'),
+            # Already called back by C1
+            tata_event('C2', '+919800000001', direction='outbound'),
+        ])
+        self.assertEqual([result['result'] for result in data['results']], ['created', 'created', 'ignored'])
+        self.assertTrue(IncomingCall.objects.get(call_id='C1').is_callback)
+        self.assertIsNotNone(IncomingCall.objects.get(call_id='M1').contacted_at)
+
+    def test_other_outbound_calls_do_not_flush(self):
+        events = [tata_event(f'I{i}', f'+91980000{i:04d}') for i in range(20)]
+        events += [tata_event(f'O{i}', f'+91970000{i:04d}', direction='outbound') for i in range(20)]
+        with mock.patch.object(CallBatchWriter, 'flush', autospec=True, side_effect=CallBatchWriter.flush) as flush:
+            data = self.post(events)
+        self.assertEqual(data['counts']['created'], 20)
+        self.assertEqual(data['counts']['ignored'], 20)
+        # Only the final flush of the batch
+        self.assertEqual(flush.call_count, 1)
+
+
+class WebhookReplayTests(TestCase):
+    """Retried webhooks get the stored response; claims are shared through WebhookReceipt"""
+
+    url = '/api/webhook/'
+
+    def setUp(self):
+        self.event = tata_event('R1', '+919800000001')
+        self.key = fingerprint(self.event)
+        # A fresh process-local LRU per test - a worker of its own
+        patcher = mock.patch('callmanagement.views.get_replay_cache', return_value=DatabaseReplayCache())
+        self.replays = patcher.start()()
+        self.addCleanup(patcher.stop)
+
+    def post(self):
+        return self.client.post(self.url, self.event, content_type='application/json')
+
+    def test_retry_gets_the_stored_response(self):
+        first = self.post()
+        self.assertEqual(first.status_code, 201)
+        retry = self.post()
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['X-Webhook-Replay'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(IncomingCall.objects.filter(call_id='R1').count(), 1)
+
+    def test_retry_on_another_worker(self):
+        first = self.post()
+        # The response is read back from WebhookReceipt
+        self.replays._entries.clear()
+        with self.assertNumQueries(1):
+            retry = self.post()
+        self.assertEqual(retry['X-Webhook-Replay'], 'true')
+        self.assertEqual(retry.json(), first.json())
+
+    def test_concurrent_claims(self):
+        other = DatabaseReplayCache()
+        self.assertTrue(self.replays.claim(self.key))
+        self.assertFalse(other.claim(self.key))
+        self.assertFalse(self.replays.claim(self.key))
+        self.replays.put(self.key, 201, {'status': 'success'})
+        self.assertEqual(other.get(self.key), (201, {'status': 'success'}))
+        self.assertFalse(other.claim(self.key))
+
+    def test_released_and_abandoned_claims_are_taken_over(self):
+        other = DatabaseReplayCache()
+        self.assertTrue(self.replays.claim(self.key))
+        self.replays.release(self.key)
+        self.assertTrue(other.claim(self.key))
+        # Its worker died
+        WebhookReceipt.objects.filter(fingerprint=self.key).update(created_at=timezone.now() - timedelta(minutes=2))
+        self.assertTrue(self.replays.claim(self.key))
+
+    def test_duplicate_in_flight_gets_409_at_once(self):
+        DatabaseReplayCache().claim(self.key)
+        started = time.monotonic()
+        response = self.post()
+        self.assertEqual(response.status_code, 409)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertFalse(IncomingCall.objects.filter(call_id='R1').exists())
+        self.assertEqual(WebhookReceipt.objects.get(fingerprint=self.key).status_code, IN_FLIGHT)
+
+
+class ImporterTests(TestCase):
+    """import_calls gives the webhook's results: same fields, same callbacks"""
+
+    def events(self):
+        """Missed, answered and outbound calls among a few numbers over the last 20 hours, in time order"""
+        rng = random.Random(24)
+        start = timezone.now() - timedelta(hours=20)
+        numbers = [f'+9198000000{i:02d}' for i in range(6)]
+        for i in range(150):
+            kind = rng.choice(['missed', 'missed', 'answered', 'outbound', 'outbound'])
+            yield tata_event(
+                f'H{i}', rng.choice(numbers),
+                direction='outbound' if kind == 'outbound' else 'inbound',
+                call_status='Missed' if kind == 'missed' else 'Answered',
+                started=start + timedelta(minutes=7 * i),
+            )
+
+    def outcome(self):
+        """(callback call_ids, contacted missed call_ids) in the database"""
+        return (
+            set(IncomingCall.objects.filter(is_callback=True).values_list('call_id', flat=True)),
+            set(IncomingCall.objects.filter(contacted_at__isnull=False, call_direction='inbound').values_list('call_id', flat=True)),
+        )
+
+    def test_row_normalizer_matches_the_serializer(self):
+        with open(settings.BASE_DIR / 'test_tata_format.json') as handle:
+            template = json.load(handle)
+        records = [template] + [event for event in self.events() if event['direction'] == 'inbound'][:20]
+        normalize = RowNormalizer()
+        for record in records:
+            with self.subTest(call_id=record['call_id']):
+                serializer = WebhookCallSerializer(data=record)
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+                self.assertEqual(normalize(record), (serializer.get_call_fields(serializer.validated_data), None))
+
+    def test_row_normalizer_rejects(self):
+        normalize = RowNormalizer()
+        self.assertIsNotNone(normalize('not a record')[1])
+        self.assertIsNotNone(normalize(ValueError('Expecting value'))[1])
+        record = tata_event('X1', '+919800000001')
+        del record['call_id']
+        self.assertEqual(normalize(record), (None, {'call_id': ['This field is required.']}))
+        serializer = WebhookCallSerializer(data=record)
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors, {'call_id': ['This field is required.']})
+
+    def test_callback_matcher_agrees_with_match_callback(self):
+        events = list(self.events())
+        for event in events:
+            serializer = WebhookCallSerializer(data=event)
+            if serializer.is_valid():
+                serializer.save()
+        webhook_outcome = self.outcome()
+        self.assertTrue(webhook_outcome[0])
+
+        IncomingCall.objects.all().delete()
+        # Chunks smaller than the run: matches against stored calls too
+        importer = CallImporter(chunk_size=40)
+        for index, event in enumerate(events):
+            importer.add(index, event)
+        importer.flush()
+        importer.finish()
+        self.assertEqual(self.outcome(), webhook_outcome)
+
+    def test_checkpoint_resume(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = f'{directory.name}/calls.ndjson'
+        with open(path, 'w') as handle:
+            for i in range(10):
+                handle.write(json.dumps(tata_event(f'K{i}', f'+91980000{i:04d}')) + '\n')
+
+        def interrupted(*args, **kwargs):
+            for number, record in enumerate(iter_records(*args, **kwargs)):
+                if number == 5:
+                    raise OSError('Disk went away')
+                yield record
+
+        with mock.patch('callmanagement.management.commands.import_calls.iter_records', interrupted):
+            with self.assertRaises(CommandError):
+                call_command('import_calls', path, chunk_size=2, stdout=io.StringIO())
+        with open(f'{path}.checkpoint.json') as handle:
+            self.assertEqual(json.load(handle)['records'], 4)
+        self.assertEqual(IncomingCall.objects.count(), 4)
+
+        stdout = io.StringIO()
+        call_command('import_calls', path, chunk_size=2, stdout=stdout)
+        self.assertIn('resuming after record 4', stdout.getvalue())
+        self.assertIn('Done - 10 created, 0 updated, 0 ignored, 0 error', stdout.getvalue())
+        self.assertEqual(IncomingCall.objects.count(), 10)
+        self.assertFalse(os.path.exists(f'{path}.checkpoint.json'))
+
+
+class SearchTests(TestCase):
+    """?search= digit fragments find what caller_number__icontains did"""
+
+    numbers = ['+917590649181', '918728898079', '09876543210', '9123456780', '+91 98111 22333']
+
+    def setUp(self):
+        for i, number in enumerate(self.numbers):
+            IncomingCall.objects.create(call_id=f'S{i}', caller_number=number, call_start_time=timezone.now())
+
+    def search(self, text, match='contains'):
+        return set(search_calls(IncomingCall.objects.all(), text, match).values_list('caller_number', flat=True))
+
+    def test_fragments_across_the_stored_prefix(self):
+        self.assertIn('+917590649181', self.search('9175'))
+        self.assertIn('918728898079', self.search('18'))
+        self.assertIn('09876543210', self.search('0987'))
+        self.assertIn('+917590649181', self.search('917590649181'))
+
+    def test_contains_finds_every_icontains_match(self):
+        rng = random.Random(25)
+        for _ in range(200):
+            number = rng.choice(self.numbers)
+            start = rng.randrange(len(number))
+            fragment = number[start:rng.randrange(start + 1, len(number) + 1)].strip()
+            if not fragment:
+                continue
+            with self.subTest(fragment=fragment):
+                old = set(IncomingCall.objects.filter(caller_number__icontains=fragment).values_list('caller_number', flat=True))
+                self.assertLessEqual(old, self.search(fragment))
+
+    def test_prefix_with_country_code(self):
+        for text in ('7590', '917590', '+91 7590', '07590'):
+            with self.subTest(text=text):
+                self.assertEqual(self.search(text, 'prefix'), {'+917590649181'})
@@ -0,0 +1,121 @@
+"""
+Tata webhook timestamps -> aware datetimes
+
+Tata sends start_stamp / end_stamp as ISO 8601 in IST, but the form
+encoding turns the '+' of the offset into a space
+("2025-11-07T12:42:23 05:30"), some calls carry "Invalid date", and
+start_time / end_time use moment.js 'kk' hours (01-24, where 24 means
+hour 0 of the same date). Stamps datetime.fromisoformat() reads are
+taken as they are; one precompiled pattern accepts all of these:
+
+    2025-11-07T12:42:23+05:30    2025-11-07T12:42:23 05:30
+    2025-11-07T12:42:23+0530     2025-11-07T12:42:23.123Z
+    2025-11-07 12:42:23          (no offset: IST)
+    2025-11-13T24:51:54+05:30    (hour 24: 00:51:54 on 2025-11-13)
+
+parse_stamp() reads a stamp, parse_date_time() a date + time pair; both
+return None for anything they cannot read.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+
+IST = timezone(timedelta(hours=5, minutes=30), 'IST')
+
+# tzinfo per offset, created once
+_offsets = {'+05:30': IST, '+00:00': timezone.utc}
+
+STAMP_RE = re.compile(
+    r"""
+    \s*
+    (?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})
+    (?:
+        [T\s]\s*
+        (?P<hour>\d{1,2}):(?P<minute>\d{1,2})
+        (?::(?P<second>\d{1,2})(?:[.,](?P<fraction>\d{1,6})\d*)?)?
+    )?
+    \s*
+    (?:
+        (?P<utc>Z)
+        # A missing sign is a '+' lost to form decoding
+        | (?P<sign>[+-])?\s*(?P<offset_hours>\d{2}):?(?P<offset_minutes>\d{2})
+    )?
+    \s*
+    """,
+    re.VERBOSE | re.IGNORECASE,
+)
+
+TIME_RE = re.compile(
+    r'\s*(?P<hour>\d{1,2}):(?P<minute>\d{1,2})(?::(?P<second>\d{1,2})(?:[.,](?P<fraction>\d{1,6})\d*)?)?\s*'
+)
+
+DATE_RE = re.compile(r'\s*(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})\s*')
+
+
+def _tzinfo(match):
+    if match['utc']:
+        return timezone.utc
+    if match['offset_hours'] is None:
+        return IST
+
+    key = f"{match['sign'] or '+'}{match['offset_hours']}:{match['offset_minutes']}"
+    tzinfo = _offsets.get(key)
+    if tzinfo is None:
+        offset = timedelta(hours=int(match['offset_hours']), minutes=int(match['offset_minutes']))
+        tzinfo = _offsets[key] = timezone(-offset if match['sign'] == '-' else offset)
+    return tzinfo
+
+
+def _build(date_match, time_match, tzinfo):
+    """Aware datetime from matched parts, or None if they are out of range"""
+    if time_match is None or time_match['hour'] is None:
+        hour = minute = second = microsecond = 0
+    else:
+        # 'kk' hours: 24 is hour 0 of the same date
+        hour = int(time_match['hour']) % 24
+        minute = int(time_match['minute'])
+        second = int(time_match['second'] or 0)
+        fraction = time_match['fraction']
+        microsecond = int(fraction.ljust(6, '0')) if fraction else 0
+
+    try:
+        return datetime(
+            int(date_match['year']), int(date_match['month']), int(date_match['day']),
+            hour, minute, second, microsecond, tzinfo=tzinfo,
+        )
+    except ValueError:
+        return None
+
+
+def parse_stamp(value):
+    """Aware datetime of a start_stamp / end_stamp value, or None ("Invalid date", '', garbage)"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo is not None else value.replace(tzinfo=IST)
+    if not isinstance(value, str):
+        return None
+
+    try:
+        # Well-formed stamps - most of them - parse in C
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    else:
+        return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=IST)
+
+    match = STAMP_RE.fullmatch(value)
+    if match is None or match['hour'] is None:
+        return None
+    return _build(match, match, _tzinfo(match))
+
+
+def parse_date_time(date_value, time_value):
+    """Aware datetime (IST) of a start_date + start_time pair, or None"""
+    if not isinstance(date_value, str) or not isinstance(time_value, str):
+        return None
+
+    date_match = DATE_RE.fullmatch(date_value)
+    time_match = TIME_RE.fullmatch(time_value)
+    if date_match is None or time_match is None:
+        return None
+    return _build(date_match, time_match, IST)
+
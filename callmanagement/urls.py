@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     WebhookViewSet,
     IncomingCallViewSet,
@@ -16,7 +18,19 @@ router.register(r'notes', CallNoteViewSet, basename='note')
 urlpatterns = [
     # Webhook endpoint for Tata Dealer
     path('webhook/', WebhookViewSet.as_view({'post': 'create'}), name='webhook'),
+    path('webhook/batch/', WebhookViewSet.as_view({'post': 'batch'}), name='webhook-batch'),
+    path('webhook/replays/', WebhookViewSet.as_view({'get': 'replay_stats'}), name='webhook-replays'),
+    path('webhook/spool/', WebhookViewSet.as_view({'get': 'spool_stats'}), name='webhook-spool'),
 
     # Include router URLs (this will handle GET requests to /incoming-calls/)
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_VIEWS:
+    # Async receiver and call lists (async_views.py), matched before the sync routes
+    urlpatterns = [
+        path('webhook/', async_views.webhook, name='webhook'),
+        path('incoming-calls/missed/', async_views.missed, name='call-missed'),
+        path('incoming-calls/pending/', async_views.pending, name='call-pending'),
+        path('incoming-calls/recent/', async_views.recent, name='call-recent'),
+    ] + urlpatterns
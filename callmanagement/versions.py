@@ -0,0 +1,157 @@
+"""
+Change versions for conditional GETs on the dashboard endpoints
+
+Every committed write to a tracked table bumps its ChangeVersion row.
+Views decorated with @conditional(...) (viewset methods) or
+@conditional_view(...) (view functions, sync or async) build a weak ETag
+and Last-Modified from the versions of the tables they read - one small
+query - and Django
+answers a matching If-None-Match / If-Modified-Since with 304 before the
+view's queryset or serializer run.
+
+Writes that bypass post_save (queryset.update(), bulk_create()) must call
+mark_changed() themselves.
+"""
+
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .dbthreads import in_db_thread
+from .models import ChangeVersion
+
+TRACKED_TABLES = ('incomingcall', 'callnote', 'calldisposition')
+
+# Views filtered relative to now (last 24 hours, last N days) change as
+# calls age out of the window without any write; their ETags also roll
+# over every this many seconds
+WINDOW_BUCKET_SECONDS = 60
+
+
+def _table(model):
+    return model if isinstance(model, str) else model._meta.model_name
+
+
+def bump(*tables):
+    """Increment the versions of these tables now"""
+    now = timezone.now()
+    updated = ChangeVersion.objects.filter(table__in=tables).update(version=F('version') + 1, changed_at=now)
+    if updated < len(tables):
+        # Row missing (e.g. a table added to TRACKED_TABLES later)
+        for table in tables:
+            ChangeVersion.objects.get_or_create(table=table, defaults={'version': 1, 'changed_at': now})
+
+
+def mark_changed(*models):
+    """Bump the versions of these models' tables once the current transaction commits"""
+    tables = tuple(_table(model) for model in models)
+    # After the commit, so a poll never caches a new version with old data
+    transaction.on_commit(lambda: bump(*tables))
+
+
+def current_versions(tables):
+    """table -> (version, changed_at)"""
+    return {
+        table: (version, changed_at)
+        for table, version, changed_at in ChangeVersion.objects.filter(table__in=tables).values_list(
+            'table', 'version', 'changed_at'
+        )
+    }
+
+
+async def acurrent_versions(tables):
+    """current_versions() for async views"""
+    return await in_db_thread(current_versions, tables)
+
+
+def _validators(request, tables, versions, windowed):
+    """(weak ETag, Last-Modified) for a request from the table versions"""
+    now = timezone.now()
+    bucket = int(now.timestamp()) // WINDOW_BUCKET_SECONDS if windowed else 0
+    last_modified = max((changed_at for _, changed_at in versions.values()), default=None)
+    if windowed:
+        bucket_start = now.replace(second=0, microsecond=0)
+        last_modified = max(filter(None, [last_modified, bucket_start]))
+
+    key = '|'.join([
+        ','.join(f'{table}:{versions.get(table, (0,))[0]}' for table in tables),
+        str(bucket),
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+    ])
+    etag = 'W/"%s"' % hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return etag, last_modified
+
+
+def request_versions(request):
+    """
+    {table: version} that @conditional / @conditional_view loaded for this request
+
+    Empty outside those decorators. The analytics cache compares them with
+    the versions an entry was computed at, which works across processes.
+    """
+    state = getattr(request, '_change_state', None)
+    if state is None:
+        return {}
+    return {table: version for table, (version, _) in state[2].items()}
+
+
+def conditional_view(*models, windowed=False):
+    """
+    ETag / Last-Modified for a GET view function (sync or async) reading these models
+
+    The ETag covers the table versions, the full URL and the Accept header.
+    Responses carry Cache-Control: no-cache so browsers revalidate every poll.
+    """
+    tables = tuple(_table(model) for model in models)
+
+    def state(request):
+        # Computed once per request for both validators (and request_versions())
+        cached = getattr(request, '_change_state', None)
+        if cached is None:
+            versions = current_versions(tables)
+            cached = request._change_state = (*_validators(request, tables, versions, windowed), versions)
+        return cached
+
+    def decorator(view):
+        checked_view = condition(
+            etag_func=lambda request, *args, **kwargs: state(request)[0],
+            last_modified_func=lambda request, *args, **kwargs: state(request)[1],
+        )(view)
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # condition() calls the validators synchronously - load the
+                # versions first so they only read request._change_state
+                if getattr(request, '_change_state', None) is None:
+                    versions = await acurrent_versions(tables)
+                    request._change_state = (*_validators(request, tables, versions, windowed), versions)
+                response = await checked_view(request, *args, **kwargs)
+                patch_cache_control(response, no_cache=True)
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = checked_view(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def conditional(*models, windowed=False):
+    """conditional_view() for a viewset method (which gets self, request, ...)"""
+    return method_decorator(conditional_view(*models, windowed=windowed))
@@ -1,94 +1,157 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, SAFE_METHODS
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.renderers import JSONRenderer
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.db.models import Count, Sum, Avg, Q
-from datetime import datetime, timedelta
-
-from .models import IncomingCall, CallDisposition, CallNote
+from django.utils import timezone
+from datetime import timedelta
+import logging
+
+from .analytics_cache import cached_analytics, get_analytics_cache
+from .batch import RESULTS, ingest_events
+from .dispositions import get_disposition_registry
+from .events import EventStreamRenderer, event_stream
+from .export import EXPORTERS, EXPORT_FORMATS, CSVExportRenderer, NDJSONExportRenderer
+from .log import PhaseTimer
+from .models import AnyCall, IncomingCall, CallDisposition, CallNote, MISSED_CALL_STATUSES
+from .pagination import CallPagination
+from .parsers import NDJSONParser, TataWebhookParser
+from .replays import fingerprint, get_replay_cache
+from .search import search_calls
+from .spool import get_spool
+from .stats import STATS_GROUP_BY, call_stats, disposition_counts
+from .versions import conditional
 from .serializers import (
     IncomingCallSerializer,
+    IncomingCallListSerializer,
+    IncomingCallSummarySerializer,
     CallDispositionSerializer,
     CallNoteSerializer,
     WebhookCallSerializer,
-    CallStatsSerializer
+    is_ignored_outbound,
+    CallStatsSerializer,
+    CallStatsGroupSerializer
 )
 
+logger = logging.getLogger(__name__)
+# One summary line per webhook request
+webhook_logger = logging.getLogger('callmanagement.webhook')
+
+
+def days_window(request):
+    """Window of the ?days= analytics actions (default 30 days)"""
+    return timedelta(days=int(request.query_params.get('days', 30)))
+
 
 @method_decorator(csrf_exempt, name='dispatch')
 class WebhookViewSet(viewsets.ViewSet):
     """ViewSet to receive webhook data from Tata Dealer"""
 
     permission_classes = [AllowAny]
+    parser_classes = [TataWebhookParser, JSONParser, MultiPartParser, NDJSONParser]
 
     def create(self, request):
         """
         Receive webhook POST request from Tata Dealer
 
         Expected webhook URL: https://4cb974d4a823.ngrok-free.app/api/webhook/
+
+        Logs one summary line per webhook on the callmanagement.webhook
+        logger with the outcome and per-phase timings.
         """
-        import json
-        from urllib.parse import unquote_plus, parse_qs
+        timer = PhaseTimer()
+
+        # Body is parsed once by TataWebhookParser (JSON-as-form-key format),
+        # JSONParser or MultiPartParser depending on the Content-Type
+        with timer.phase('parse'):
+            webhook_data = request.data
 
-        # IMPORTANT: Access raw body BEFORE request.data
-        raw_body = request.body.decode('utf-8')
-        print(f"[DEBUG] Raw body (first 300 chars): {raw_body[:300]}...")
-        print(f"[DEBUG] Content-Type: {request.content_type}")
+        if not webhook_data or not isinstance(webhook_data, dict):
+            logger.warning('Webhook body is not a dict: %s', type(webhook_data).__name__)
+            webhook_data = {}
 
-        webhook_data = None
+        summary = {'call_id': webhook_data.get('call_id')}
+
+        # A retry of a payload we already answered gets the same response
+        # back, without validating or saving it again
+        replays = get_replay_cache()
+        payload_key = None
+        if replays is not None and webhook_data:
+            with timer.phase('dedupe'):
+                payload_key = fingerprint(webhook_data)
+                replayed = replays.get(payload_key)
+                if replayed is None and not replays.claim(payload_key):
+                    # Answered meanwhile, or another request is processing it
+                    # right now - 409 at once rather than hold this worker
+                    replayed = replays.get(payload_key)
+                    if replayed is None:
+                        return self._in_flight(timer, summary)
+            if replayed is not None:
+                status_code, data = replayed
+                summary['outcome'] = 'duplicate'
+                summary['status'] = status_code
+                webhook_logger.info('webhook duplicate', extra={'fields': {**summary, **timer.fields()}})
+                return Response(data, status=status_code, headers={'X-Webhook-Replay': 'true'})
 
         try:
-            # Tata sends JSON as form-encoded where the entire JSON is the parameter key
-            # Format: {"call_id":"...","recording_url":"https://...?callId=X&type=rec&token=Y"}=
-            # The recording URL breaks normal parsing because of & and ?
-
-            # First, URL decode the body (use unquote_plus to handle + as space)
-            decoded_body = unquote_plus(raw_body)
-            print(f"[DEBUG] Decoded body (first 200 chars): {decoded_body[:200]}...")
-
-            if decoded_body.startswith('{'):
-                # Find the position of the last occurrence of "}= or just take everything before final =
-                # Strategy: Find where JSON ends (look for }= or }" pattern near end)
-                if '}"=' in decoded_body:
-                    json_end = decoded_body.rfind('}"=') + 2  # Include the closing }
-                elif '}=' in decoded_body:
-                    json_end = decoded_body.rfind('}=') + 1  # Include the closing }
-                else:
-                    # No = found, take entire body
-                    json_end = len(decoded_body)
-
-                json_str = decoded_body[:json_end]
-
-                # Parse JSON
-                webhook_data = json.loads(json_str)
-                print("[SUCCESS] Parsed JSON from raw body!")
-                print(f"[DEBUG] Parsed call_id: {webhook_data.get('call_id', 'NOT FOUND')}")
+            response = self._process(webhook_data, timer, summary)
+        except Exception:
+            if payload_key is not None:
+                replays.release(payload_key)
+            raise
+
+        if payload_key is not None:
+            if status.is_success(response.status_code):
+                replays.put(payload_key, response.status_code, response.data)
             else:
-                # Fallback: Try request.data
-                webhook_data = request.data
-                print("[INFO] Using request.data as fallback")
+                replays.release(payload_key)
+
+        summary['status'] = response.status_code
+        webhook_logger.info('webhook %s', summary['outcome'], extra={'fields': {**summary, **timer.fields()}})
+        return response
+
+    @staticmethod
+    def _in_flight(timer, summary):
+        """409 for a duplicate whose original is still being processed - the sender retries later"""
+        summary['outcome'] = 'in_flight'
+        summary['status'] = status.HTTP_409_CONFLICT
+        webhook_logger.info('webhook in_flight', extra={'fields': {**summary, **timer.fields()}})
+        return Response({
+            'status': 'processing',
+            'message': 'The same call data is still being processed - retry later',
+            'call_id': summary['call_id'],
+        }, status=status.HTTP_409_CONFLICT)
 
-        except Exception as e:
-            print(f"[ERROR] Failed to parse: {e}")
-            print(f"[ERROR] Trying fallback to request.data...")
-            webhook_data = request.data
+    def _process(self, webhook_data, timer, summary):
+        """Spool or validate and save webhook data; fills summary['outcome'] etc."""
 
-        if not webhook_data or not isinstance(webhook_data, dict):
-            print(f"[ERROR] webhook_data is not a dict: {type(webhook_data)}")
-            webhook_data = {}
-
-        print(f"[DEBUG] Final data keys: {list(webhook_data.keys())[:10] if isinstance(webhook_data, dict) else 'NOT A DICT'}")
+        # Spool mode: persist the payload and let drain_webhook_spool do the database work
+        if settings.WEBHOOK_INGEST_MODE == 'spool':
+            with timer.phase('spool'):
+                response = self._spool(webhook_data)
+            summary['outcome'] = 'spooled' if response.status_code == status.HTTP_202_ACCEPTED else 'spool_error'
+            return response
 
         # Validate and process webhook data
         serializer = WebhookCallSerializer(data=webhook_data)
 
-        if serializer.is_valid():
+        with timer.phase('validate'):
+            is_valid = serializer.is_valid()
+
+        if is_valid:
+            summary['direction'] = serializer.validated_data.get('call_direction')
             try:
                 # Create or update call record
-                call = serializer.save()
+                with timer.phase('save'):
+                    call = serializer.save()
 
+                summary['outcome'] = 'callback' if call.is_callback else 'saved'
                 # Return success response
                 return Response({
                     'status': 'success',
@@ -101,9 +164,8 @@ class WebhookViewSet(viewsets.ViewSet):
 
             except Exception as e:
                 # Log save errors
-                print(f"[ERROR] Failed to save call: {str(e)}")
-                import traceback
-                print(f"[ERROR] Traceback: {traceback.format_exc()}")
+                logger.exception('Failed to save call %s', summary['call_id'])
+                summary['outcome'] = 'error'
 
                 return Response({
                     'status': 'error',
@@ -112,17 +174,20 @@ class WebhookViewSet(viewsets.ViewSet):
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         else:
-            # Log validation errors
-            print(f"VALIDATION ERROR: {serializer.errors}")
-            print(f"Received data was: {webhook_data}")
-
             # Check if it's an ignored outbound call (not an actual error)
-            if 'call_direction' in serializer.errors and 'Outbound call ignored' in str(serializer.errors['call_direction']):
+            if is_ignored_outbound(serializer.errors):
+                summary['direction'] = 'outbound'
+                summary['outcome'] = 'ignored'
                 return Response({
                     'status': 'ignored',
                     'message': 'Outbound call ignored - no related missed incoming call found',
                 }, status=status.HTTP_200_OK)
 
+            # Log validation errors (the payload itself only at DEBUG, sampled)
+            logger.warning('Invalid webhook %s: %s', summary['call_id'], serializer.errors)
+            logger.debug('Invalid webhook payload: %s', webhook_data)
+            summary['outcome'] = 'invalid'
+
             # Return validation errors
             return Response({
                 'status': 'error',
@@ -130,16 +195,191 @@ class WebhookViewSet(viewsets.ViewSet):
                 'errors': serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
 
+    def _spool(self, webhook_data):
+        """Append webhook data to the local spool and acknowledge with 202"""
+        if hasattr(webhook_data, 'dict'):
+            # QueryDict from a plain form post
+            webhook_data = webhook_data.dict()
+
+        if not webhook_data:
+            return Response({
+                'status': 'error',
+                'message': 'Invalid data received',
+                'errors': {'non_field_errors': ['Empty webhook body.']}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            get_spool().append(webhook_data)
+        except Exception as e:
+            logger.exception('Failed to spool webhook %s', webhook_data.get('call_id'))
+            return Response({
+                'status': 'error',
+                'message': 'Failed to queue call data',
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({
+            'status': 'accepted',
+            'message': 'Call data queued for processing',
+            'call_id': webhook_data.get('call_id'),
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def batch(self, request):
+        """
+        Receive many call events in one request
+
+        Body: a JSON array, or NDJSON with Content-Type application/x-ndjson,
+        of Tata-format or standard-format events. Events are normalized like
+        single webhooks and upserted in bulk, one transaction per chunk.
+        Returns a result per event: created / updated / ignored / error
+        (queued in spool mode).
+        """
+        timer = PhaseTimer()
+
+        with timer.phase('parse'):
+            events = request.data
+
+        if not isinstance(events, list):
+            return Response({
+                'status': 'error',
+                'message': 'Expected a JSON array or NDJSON of call events'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(events) > settings.WEBHOOK_BATCH_MAX_EVENTS:
+            return Response({
+                'status': 'error',
+                'message': f'At most {settings.WEBHOOK_BATCH_MAX_EVENTS} events per batch'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if settings.WEBHOOK_INGEST_MODE == 'spool':
+            with timer.phase('spool'):
+                response = self._spool_batch(events)
+        else:
+            with timer.phase('ingest'):
+                results = ingest_events(events, chunk_size=settings.WEBHOOK_BATCH_CHUNK_SIZE)
+
+            counts = dict.fromkeys(RESULTS, 0)
+            for result in results:
+                counts[result['result']] += 1
+
+            response = Response({
+                'status': 'success',
+                'total': len(results),
+                'counts': counts,
+                'results': results,
+            })
+
+        webhook_logger.info(
+            'webhook batch', extra={'fields': {
+                'events': len(events), 'status': response.status_code,
+                **response.data.get('counts', {}), **timer.fields(),
+            }}
+        )
+        return response
+
+    def _spool_batch(self, events):
+        """Append a batch to the spool in one transaction and acknowledge with 202"""
+        results = []
+        payloads = []
+        for index, event in enumerate(events):
+            if isinstance(event, dict):
+                payloads.append(event)
+                results.append({'index': index, 'call_id': event.get('call_id'), 'result': 'queued'})
+            else:
+                results.append({
+                    'index': index, 'call_id': None, 'result': 'error',
+                    'errors': {'non_field_errors': ['Event must be a JSON object.']}
+                })
+
+        try:
+            get_spool().append_many(payloads)
+        except Exception as e:
+            logger.exception('Failed to spool webhook batch of %s events', len(payloads))
+            return Response({
+                'status': 'error',
+                'message': 'Failed to queue call data',
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({
+            'status': 'accepted',
+            'total': len(results),
+            'counts': {'queued': len(payloads), 'error': len(results) - len(payloads)},
+            'results': results,
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def replay_stats(self, request):
+        """Duplicate-suppression counters of this worker (see replays.py)"""
+        replays = get_replay_cache()
+        if replays is None:
+            return Response({'store': 'off'})
+        return Response(replays.stats())
+
+    def spool_stats(self, request):
+        """Spool depth and lag for monitoring the drain_webhook_spool worker"""
+        return Response({
+            'mode': settings.WEBHOOK_INGEST_MODE,
+            **get_spool().stats()
+        })
+
 
 class IncomingCallViewSet(viewsets.ModelViewSet):
     """ViewSet for managing incoming calls"""
 
-    queryset = IncomingCall.objects.all()
+    queryset = IncomingCall.objects.with_details()
     serializer_class = IncomingCallSerializer
+    pagination_class = CallPagination
+
+    # Actions listing calls - compact records unless ?view=full (never the raw payload)
+    list_actions = ('list', 'recent', 'pending', 'missed')
+    # Actions whose output can be cut down with ?fields= / ?omit=
+    projected_actions = list_actions + ('retrieve',)
+
+    def get_serializer_class(self):
+        if self.action in self.list_actions:
+            if self.request.query_params.get('view') == 'full':
+                return IncomingCallListSerializer
+            return IncomingCallSummarySerializer
+        return IncomingCallSerializer
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in self.projected_actions:
+            for param in ('fields', 'omit'):
+                value = self.request.query_params.get(param)
+                if value:
+                    kwargs.setdefault(param, [name.strip() for name in value.split(',') if name.strip()])
+        return super().get_serializer(*args, **kwargs)
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= is also DRF's format override: an unknown export format
+        # would be a 404 before export() could answer with its 400
+        if self.action == 'export' and request.query_params.get('format', 'csv') not in EXPORT_FORMATS:
+            return JSONRenderer(), JSONRenderer.media_type
+        return super().perform_content_negotiation(request, force)
+
+    def project(self, queryset):
+        """Load only the columns and relations the response serializer reads"""
+        if self.action not in self.projected_actions:
+            return queryset
+        return self.get_serializer().project_queryset(queryset)
+
+    def include_archive(self):
+        """?include_archive=true on a read: archived calls are listed too"""
+        return (
+            self.request.method in SAFE_METHODS
+            and self.request.query_params.get('include_archive', '').lower() in ('1', 'true')
+        )
+
+    def calls(self):
+        """Calls a request reads - the hot table, or AnyCall (hot + archive) with ?include_archive=true"""
+        return (AnyCall if self.include_archive() else IncomingCall).objects.with_details()
 
     def get_queryset(self):
         """Filter queryset based on query parameters"""
-        queryset = IncomingCall.objects.all()
+        return self.project(self.filter_calls(self.calls()))
+
+    def filter_calls(self, queryset):
+        """Apply the list filters (?start_date=, ?status=, ?search=, ...) to a queryset of calls"""
 
         # Filter by date range
         start_date = self.request.query_params.get('start_date', None)
@@ -170,79 +410,89 @@ class IncomingCallViewSet(viewsets.ModelViewSet):
         if lead_quality:
             queryset = queryset.filter(lead_quality=lead_quality)
 
-        # Search by caller number or name
+        # Search by number or name fragment - ?match=contains|prefix|suffix|fuzzy (see search.py)
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(caller_number__icontains=search) |
-                Q(caller_name__icontains=search) |
-                Q(customer_name__icontains=search)
-            )
+            try:
+                queryset = search_calls(queryset, search, self.request.query_params.get('match', 'contains'))
+            except ValueError as e:
+                raise ValidationError({'status': 'error', 'message': str(e)})
 
         return queryset
 
     @action(detail=False, methods=['get'])
+    @conditional(IncomingCall, CallDisposition, windowed=True)
+    @cached_analytics(window=days_window)
     def stats(self, request):
-        """Get call statistics"""
+        """
+        Get call statistics
+
+        Read from the CallRollup buckets (see stats.py). With
+        ?group_by=day|staff|direction the same figures are also returned
+        per group under 'groups'.
+        """
 
         # Get date range from query params
         days = int(request.query_params.get('days', 30))
-        start_date = datetime.now() - timedelta(days=days)
-
-        calls = IncomingCall.objects.filter(call_start_time__gte=start_date)
-
-        stats = {
-            'total_calls': calls.count(),
-            'answered_calls': calls.filter(call_status='answered').count(),
-            'missed_calls': calls.filter(call_status__in=['no-answer', 'busy']).count(),
-            'total_duration': calls.aggregate(Sum('call_duration'))['call_duration__sum'] or 0,
-            'average_duration': calls.aggregate(Avg('call_duration'))['call_duration__avg'] or 0,
-            'total_leads': calls.filter(is_lead=True).count(),
-            'hot_leads': calls.filter(lead_quality='hot').count(),
-            'warm_leads': calls.filter(lead_quality='warm').count(),
-            'cold_leads': calls.filter(lead_quality='cold').count(),
-        }
+        start_date = timezone.now() - timedelta(days=days)
+
+        group_by = request.query_params.get('group_by')
+        if group_by and group_by not in STATS_GROUP_BY:
+            return Response({
+                'status': 'error',
+                'message': f"group_by must be one of: {', '.join(STATS_GROUP_BY)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        stats, groups = call_stats(start_date, group_by=group_by)
 
         serializer = CallStatsSerializer(stats)
-        return Response(serializer.data)
+        if not group_by:
+            return Response(serializer.data)
+
+        return Response({
+            **serializer.data,
+            'group_by': group_by,
+            'groups': CallStatsGroupSerializer(groups, many=True).data,
+        })
 
     @action(detail=False, methods=['get'])
+    @conditional(IncomingCall, CallDisposition, windowed=True)
+    @cached_analytics(window=days_window)
     def by_disposition(self, request):
         """Get calls grouped by disposition"""
 
         days = int(request.query_params.get('days', 30))
-        start_date = datetime.now() - timedelta(days=days)
-
-        disposition_stats = IncomingCall.objects.filter(
-            call_start_time__gte=start_date
-        ).values(
-            'disposition__code',
-            'disposition__name',
-            'disposition__category'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count')
+        start_date = timezone.now() - timedelta(days=days)
 
-        return Response(disposition_stats)
+        return Response(disposition_counts(start_date))
 
     @action(detail=False, methods=['get'])
+    @conditional(IncomingCall, CallDisposition, CallNote, windowed=True)
+    @cached_analytics(window=lambda request: timedelta(days=1))
     def recent(self, request):
         """Get recent calls (last 24 hours)"""
 
-        yesterday = datetime.now() - timedelta(days=1)
-        recent_calls = IncomingCall.objects.filter(call_start_time__gte=yesterday)
+        yesterday = timezone.now() - timedelta(days=1)
+        recent_calls = self.project(self.calls().filter(call_start_time__gte=yesterday))
+
+        # Unpaginated unless the client asks for cursor pages
+        if CallPagination.is_cursor_request(request):
+            page = self.paginate_queryset(recent_calls)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
 
         serializer = self.get_serializer(recent_calls, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @conditional(IncomingCall, CallDisposition, CallNote)
     def pending(self, request):
         """Get pending calls that need follow-up (no disposition yet)"""
 
         # Get all calls without disposition (both inbound and outbound missed calls)
-        pending_calls = IncomingCall.objects.filter(
+        pending_calls = self.project(self.calls().filter(
             disposition__isnull=True
-        ).order_by('-call_start_time')
+        ).order_by('-call_start_time'))
 
         # Apply pagination
         page = self.paginate_queryset(pending_calls)
@@ -258,17 +508,19 @@ class IncomingCallViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @conditional(IncomingCall, CallDisposition, CallNote, windowed=True)
     def missed(self, request):
         """Get all missed calls"""
 
         # Get all missed/no-answer calls
-        missed_calls = IncomingCall.objects.filter(
-            Q(call_status='no-answer') | Q(call_status='busy') | Q(call_status='missed')
-        ).order_by('-call_start_time')
+        # (same IN list as the partial index call_missed_start_idx)
+        missed_calls = self.project(self.calls().filter(
+            call_status__in=MISSED_CALL_STATUSES
+        ).order_by('-call_start_time'))
 
         # Apply date filter if provided
         days = int(request.query_params.get('days', 30))
-        start_date = datetime.now() - timedelta(days=days)
+        start_date = timezone.now() - timedelta(days=days)
         missed_calls = missed_calls.filter(call_start_time__gte=start_date)
 
         # Apply pagination
@@ -284,6 +536,70 @@ class IncomingCallViewSet(viewsets.ModelViewSet):
             'data': serializer.data
         })
 
+    @action(
+        detail=False, methods=['get'],
+        renderer_classes=[JSONRenderer, CSVExportRenderer, NDJSONExportRenderer]
+    )
+    def export(self, request):
+        """
+        Stream calls as CSV or NDJSON
+
+        ?format=csv|ndjson (default csv) plus the same filters as the list,
+        e.g. ?format=ndjson&start_date=2024-01-01&end_date=2024-02-01
+        """
+
+        export_format = request.query_params.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({
+                'status': 'error',
+                'message': f"format must be one of: {', '.join(EXPORT_FORMATS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        stream, content_type = EXPORTERS[export_format]
+        queryset = self.filter_calls(self.calls())
+
+        response = StreamingHttpResponse(stream(queryset), content_type=f'{content_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="calls.{export_format}"'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """Hit/miss counters of this worker's analytics response cache"""
+        analytics_cache = get_analytics_cache()
+        if analytics_cache is None:
+            return Response({'enabled': False})
+        return Response({'enabled': True, **analytics_cache.stats()})
+
+    @action(detail=False, methods=['get'], renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def stream(self, request):
+        """
+        Server-Sent Events of new, updated and contacted calls
+
+        Replaces polling /missed/: load the list once, then apply the events.
+        EventSource resumes from the Last-Event-ID header after a reconnect.
+        Needs the ASGI server (incomingcall.asgi) - a WSGI worker would be
+        held for the whole connection.
+        """
+
+        if 'wsgi.version' in request.META:
+            return Response({
+                'status': 'error',
+                'message': 'The event stream is only served through ASGI (incomingcall.asgi:application)'
+            }, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        if settings.CALL_EVENTS == 'off':
+            return Response({
+                'status': 'error',
+                'message': 'Call events are disabled (CALL_EVENTS=off)'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_event_id')
+        response = StreamingHttpResponse(event_stream(last_event_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
     @action(detail=True, methods=['post'])
     def add_note(self, request, pk=None):
         """Add a note to a call"""
@@ -422,6 +738,20 @@ class CallDispositionViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    @conditional(CallDisposition)
+    def list(self, request, *args, **kwargs):
+        """Active dispositions, served from the process-wide disposition cache"""
+
+        dispositions = get_disposition_registry().active(category=request.query_params.get('category') or None)
+
+        page = self.paginate_queryset(dispositions)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(dispositions, many=True)
+        return Response(serializer.data)
+
 
 class CallNoteViewSet(viewsets.ModelViewSet):
     """ViewSet for managing call notes"""
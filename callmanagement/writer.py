@@ -0,0 +1,167 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .analytics_cache import calls_changed
+from .callbacks import CALLBACK_MATCH, get_callback_registry, mark_contacted, pop_callback_match
+from .events import publish_calls
+from .models import IncomingCall, ROLLUP_FIELDS, normalize_phone_number
+from .payloads import pop_payload, store_payloads
+from .rollups import apply_rollup_changes, rollup_values
+from .search import reindex_calls
+from .versions import mark_changed
+
+
+class CallBatchWriter:
+    """
+    Buffers IncomingCall rows and upserts them on call_id with bulk_create
+
+    Rows are grouped by the set of fields they carry so a webhook that
+    omits a field (e.g. no recording_url yet) never overwrites it on an
+    existing call - the same behaviour as update_or_create(defaults=...).
+
+    on_flush(keys) is called with the keys passed to add() once their rows
+    are committed. During that call last_created holds the call_ids the
+    flush inserted (the others were updates).
+
+    Outbound calls are matched to missed calls in the database, so a
+    validator calls flush_for_callback(number) first: it writes the queue
+    out only when a queued row bears on that number.
+    """
+
+    def __init__(self, batch_size=500, on_flush=None):
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self._rows = {}
+        self._keys = []
+        # Normalized numbers of queued inbound calls and of the missed calls
+        # queued callbacks answer
+        self._match_numbers = set()
+        self.last_created = set()
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def pending_keys(self):
+        return list(self._keys)
+
+    def add(self, fields, key=None):
+        """Queue one call (a dict of IncomingCall field values incl. call_id)"""
+        # A second event for the same call in one batch would hit the same row
+        # twice in a single INSERT ... ON CONFLICT - merge it into the queued
+        # row instead: the later values win and fields it leaves out keep
+        # the earlier ones, as two upserts in a row would
+        queued = self._rows.get(fields['call_id'])
+        if queued is not None:
+            fields = {**queued, **fields}
+
+        self._rows[fields['call_id']] = fields
+        if fields.get('call_direction') == 'inbound':
+            self._match_numbers.add(normalize_phone_number(fields.get('caller_number')))
+        elif fields.get(CALLBACK_MATCH) is not None:
+            self._match_numbers.add(fields[CALLBACK_MATCH].normalized_number)
+        # bulk_create() sends no post_save, so register missed calls here -
+        # before the flush, so callbacks later in the same batch find them
+        registry = get_callback_registry()
+        if registry is not None:
+            registry.record(fields)
+
+        if key is not None:
+            self._keys.append(key)
+
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def clear(self):
+        self._rows = {}
+        self._keys = []
+        self._match_numbers = set()
+
+    def flush_for_callback(self, number):
+        """Flush before an outbound call to number is matched, if a queued row could change the match"""
+        if normalize_phone_number(number) in self._match_numbers:
+            self.flush()
+
+    def flush(self):
+        """Write all queued rows in one transaction; returns the number written"""
+        if not self._rows:
+            return 0
+
+        groups = defaultdict(list)
+        payloads = {}
+        answered = []
+        for fields in self._rows.values():
+            payload = pop_payload(fields)
+            if payload is not None:
+                payloads[fields['call_id']] = payload
+            missed_call = pop_callback_match(fields)
+            if missed_call is not None:
+                answered.append((missed_call, fields['contacted_at']))
+            # bulk_create() skips IncomingCall.save(), which normally fills this
+            if 'caller_number' in fields:
+                fields['normalized_number'] = normalize_phone_number(fields['caller_number'])
+            groups[frozenset(fields)].append(fields)
+
+        with transaction.atomic():
+            # Current rollup values of calls that already exist (bulk_create
+            # sends no signals, so CallRollup is updated here)
+            existing = {
+                row.pop('call_id'): row
+                for row in IncomingCall.objects.select_for_update().filter(
+                    call_id__in=list(self._rows)
+                ).values('call_id', *ROLLUP_FIELDS)
+            }
+
+            call_pks = {}
+            for field_names, rows in groups.items():
+                update_fields = [name for name in field_names if name != 'call_id'] + ['updated_at']
+                calls = IncomingCall.objects.bulk_create(
+                    [IncomingCall(**fields) for fields in rows],
+                    update_conflicts=True,
+                    unique_fields=['call_id'],
+                    update_fields=update_fields,
+                )
+                call_pks.update((call.call_id, call.pk) for call in calls)
+
+            if payloads:
+                # Backends that cannot return ids from an upsert leave pk unset
+                missing = [call_id for call_id in payloads if call_pks.get(call_id) is None]
+                if missing:
+                    call_pks.update(
+                        IncomingCall.objects.filter(call_id__in=missing).values_list('call_id', 'pk')
+                    )
+                store_payloads({call_pks[call_id]: payload for call_id, payload in payloads.items()})
+
+            # Missed calls answered by callbacks in this batch - committed
+            # with the callbacks, so a failed flush leaves them pending
+            for missed_call, contacted_at in answered:
+                mark_contacted(missed_call, contacted_at)
+
+            changes = []
+            for call_id, fields in self._rows.items():
+                old = existing.get(call_id)
+                # Fields a webhook did not send keep their stored value
+                new = rollup_values({**old, **fields} if old else fields)
+                changes.append((old, new))
+            apply_rollup_changes(changes)
+            # Terms from the stored rows: a webhook may leave a name out
+            reindex_calls(list(self._rows))
+
+            created = {call_id for call_id in self._rows if call_id not in existing}
+            # bulk_create() sends no post_save either
+            publish_calls(IncomingCall.objects.filter(call_id__in=list(self._rows)), created=created)
+            mark_changed(IncomingCall)
+            calls_changed(
+                [fields.get('call_start_time') for fields in self._rows.values()]
+                + [row['call_start_time'] for row in existing.values()]
+            )
+
+        written = len(self._rows)
+        keys = self._keys
+        self.last_created = created
+        self.clear()
+
+        if self.on_flush:
+            self.on_flush(keys)
+        return written
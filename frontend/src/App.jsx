@@ -4,6 +4,9 @@ import './App.css'
 // Get API URL from environment variable
 const API_URL = import.meta.env.VITE_API_URL || ''
 
+// Same statuses as MISSED_CALL_STATUSES on the server
+const MISSED_STATUSES = ['missed', 'no-answer', 'busy']
+
 function App() {
   const [calls, setCalls] = useState([])
   const [loading, setLoading] = useState(true)
@@ -46,11 +49,49 @@ function App() {
     }
   }
 
-  // Auto-refresh every 10 seconds
+  // Apply one call event from the stream to the list
+  const applyCallEvent = (type, call) => {
+    setCalls(current => {
+      const others = current.filter(existing => existing.id !== call.id)
+      const isPending = type !== 'deleted' && call.call_direction === 'inbound' &&
+        !call.contacted_at && MISSED_STATUSES.includes(call.call_status)
+      if (!isPending) return others
+
+      // Latest call per number, newest first (as in fetchPendingCalls)
+      const number = call.caller_number.trim().replace(/\D/g, '').slice(-10)
+      const sameNumber = others.find(existing =>
+        existing.caller_number.trim().replace(/\D/g, '').slice(-10) === number
+      )
+      if (sameNumber && new Date(sameNumber.call_start_time) > new Date(call.call_start_time)) return others
+      return [call, ...others.filter(existing => existing !== sameNumber)].sort((a, b) =>
+        new Date(b.call_start_time) - new Date(a.call_start_time)
+      )
+    })
+  }
+
+  // Load once, then follow the server's call events instead of polling.
+  // Falls back to refreshing every 10 seconds where the stream is not
+  // available (e.g. the WSGI dev server).
   useEffect(() => {
     fetchPendingCalls()
-    const interval = setInterval(fetchPendingCalls, 10000)
-    return () => clearInterval(interval)
+
+    let interval = null
+    const source = new EventSource(`${API_URL}/api/incoming-calls/stream/`)
+    for (const type of ['new', 'updated', 'contacted', 'deleted']) {
+      source.addEventListener(type, event => applyCallEvent(type, JSON.parse(event.data)))
+    }
+    // Sent when the server cannot replay what was missed while disconnected
+    source.addEventListener('reset', fetchPendingCalls)
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED && !interval) {
+        interval = setInterval(fetchPendingCalls, 10000)
+      }
+    }
+
+    return () => {
+      source.close()
+      if (interval) clearInterval(interval)
+    }
   }, [])
 
   // Copy phone number to clipboard (only last 10 digits, without country code)
@@ -1,11 +1,22 @@
 """
 ASGI config for incomingcall project.
+
+Serves the API including the /api/incoming-calls/stream/ event stream, e.g.
+gunicorn incomingcall.asgi:application -k uvicorn.workers.UvicornWorker
+With ASYNC_VIEWS=True the webhook and the missed/pending/recent lists are
+served by async views (callmanagement/async_views.py), and static files by
+ASGIStaticFilesHandler in place of the (sync-only) WhiteNoise middleware.
 """
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'incomingcall.settings')
 
 application = get_asgi_application()
+
+if settings.ASYNC_VIEWS:
+    application = ASGIStaticFilesHandler(application)
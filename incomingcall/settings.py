@@ -70,6 +70,11 @@ if USE_SQLITE:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # Concurrent webhook requests wait for the write lock instead of
+            # failing with "database is locked"
+            'OPTIONS': {
+                'timeout': 20,
+            },
         }
     }
 else:
@@ -136,6 +141,144 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 50
 }
 
+# Webhook ingestion mode
+# - 'sync':  validate and save inside the webhook request (default)
+# - 'spool': append the payload to a local on-disk spool and return 202;
+#            run `python manage.py drain_webhook_spool` to write it to the database
+WEBHOOK_INGEST_MODE = config('WEBHOOK_INGEST_MODE', default='sync')
+WEBHOOK_SPOOL_PATH = config('WEBHOOK_SPOOL_PATH', default=str(BASE_DIR / 'webhook_spool.sqlite3'))
+WEBHOOK_SPOOL_MAX_ATTEMPTS = config('WEBHOOK_SPOOL_MAX_ATTEMPTS', default=5, cast=int)
+
+# /api/webhook/batch/: events per request and per bulk upsert transaction
+WEBHOOK_BATCH_MAX_EVENTS = config('WEBHOOK_BATCH_MAX_EVENTS', default=10000, cast=int)
+WEBHOOK_BATCH_CHUNK_SIZE = config('WEBHOOK_BATCH_CHUNK_SIZE', default=500, cast=int)
+
+# Duplicate suppression of retried webhooks: the response to a payload is
+# replayed for an identical payload received within WEBHOOK_REPLAY_TTL seconds
+# - 'db':     stored in the WebhookReceipt table, shared by all workers, with a
+#             per-process LRU of WEBHOOK_REPLAY_MAX_ENTRIES payloads in front (default)
+# - 'memory': the per-process LRU only - a retry reaching another worker is
+#             processed again; for a single worker
+# - 'off':    process every webhook
+WEBHOOK_REPLAY_STORE = config('WEBHOOK_REPLAY_STORE', default='db')
+WEBHOOK_REPLAY_TTL = config('WEBHOOK_REPLAY_TTL', default=600, cast=int)
+WEBHOOK_REPLAY_MAX_ENTRIES = config('WEBHOOK_REPLAY_MAX_ENTRIES', default=10000, cast=int)
+
+# Pending-callback registry - rejects outbound calls that are not callbacks
+# without a database query
+# - 'off':    always query the database (default - safe with any number of workers)
+# - 'local':  per-process; only for a single process writing calls (one
+#             gunicorn worker, or spool mode with one drain worker) - another
+#             worker's missed calls are unknown to it
+# - 'shared': stored in the CALLBACK_REGISTRY_CACHE cache, which must be set
+#             to a backend all workers share such as Redis or the database
+#             cache (a locmem or dummy cache raises ImproperlyConfigured)
+CALLBACK_REGISTRY = config('CALLBACK_REGISTRY', default='off')
+CALLBACK_REGISTRY_CACHE = config('CALLBACK_REGISTRY_CACHE', default='')
+
+# Cache holding the version stamp of the in-process CallDisposition registry;
+# use a shared cache so all workers reload as soon as a disposition changes
+DISPOSITION_CACHE = config('DISPOSITION_CACHE', default='default')
+
+# Caches - 'analytics' holds the stats/by_disposition/recent responses; the
+# backend can be any Django cache backend, e.g.
+# django.core.cache.backends.filebased.FileBasedCache with a directory as
+# ANALYTICS_CACHE_LOCATION to share it between the workers of one machine
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analytics': {
+        'BACKEND': config('ANALYTICS_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('ANALYTICS_CACHE_LOCATION', default='analytics'),
+    },
+}
+
+# Response cache of the analytics actions (see callmanagement/analytics_cache.py);
+# ANALYTICS_CACHE_TTL=0 turns it off
+ANALYTICS_CACHE = config('ANALYTICS_CACHE', default='analytics')
+ANALYTICS_CACHE_TTL = config('ANALYTICS_CACHE_TTL', default=300, cast=int)
+ANALYTICS_CACHE_LOCK_TIMEOUT = config('ANALYTICS_CACHE_LOCK_TIMEOUT', default=30, cast=int)
+
+# Serve /incoming-calls/stats/ and by_disposition from the CallRollup table
+# (False = aggregate the raw calls on every request)
+CALL_STATS_FROM_ROLLUPS = config('CALL_STATS_FROM_ROLLUPS', default=True, cast=bool)
+
+# Where raw webhook payloads are kept
+# - 'table':  compressed, in the separate CallPayload table (default)
+# - 'inline': in IncomingCall.raw_webhook_data, as before
+CALL_PAYLOAD_STORAGE = config('CALL_PAYLOAD_STORAGE', default='table')
+
+# Calls that started more than this many days ago are moved to the archive
+# tables by `manage.py archive_calls` (run it daily, e.g. from cron); list
+# them with ?include_archive=true
+CALL_ARCHIVE_AFTER_DAYS = config('CALL_ARCHIVE_AFTER_DAYS', default=90, cast=int)
+
+# Live call events for /api/incoming-calls/stream/ (served via incomingcall.asgi)
+# - 'local':    delivered within the process that saved the call
+# - 'postgres': NOTIFY/LISTEN, for several workers or separate webhook/stream servers
+# - 'off':      no events (the stream endpoint returns 503)
+CALL_EVENTS = config('CALL_EVENTS', default='local')
+CALL_EVENTS_BUFFER = config('CALL_EVENTS_BUFFER', default=1000, cast=int)
+CALL_EVENTS_HEARTBEAT = config('CALL_EVENTS_HEARTBEAT', default=15, cast=int)
+CALL_EVENTS_RETRY_MS = config('CALL_EVENTS_RETRY_MS', default=3000, cast=int)
+CALL_EVENTS_REPLAY_MAX = config('CALL_EVENTS_REPLAY_MAX', default=500, cast=int)
+
+# Serve /api/webhook/ and the missed, pending and recent lists from the async
+# views (callmanagement/async_views.py); for the ASGI server (incomingcall.asgi)
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+if ASYNC_VIEWS:
+    # WhiteNoise's middleware is sync-only, and one sync middleware makes
+    # Django run every request, async views included, on the single
+    # thread-sensitive thread; incomingcall.asgi serves static files instead
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+# Threads (each with its own database connection) running the async views'
+# queries, per worker (see callmanagement/dbthreads.py)
+ASYNC_DB_THREADS = config('ASYNC_DB_THREADS', default=10, cast=int)
+
+# Logging of the callmanagement app (see callmanagement/log.py)
+# - LOG_LEVEL:    level of the callmanagement loggers
+# - LOG_FORMAT:   'text' (message + key=value fields) or 'json' (one object per line)
+# - LOG_SAMPLING: keep 1 in N records per level, e.g. 'DEBUG:100,INFO:1'
+# - LOG_QUEUE:    write from a background thread so stdout never blocks a worker
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOG_FORMAT = config('LOG_FORMAT', default='text')
+LOG_SAMPLING = config('LOG_SAMPLING', default='DEBUG:100')
+LOG_QUEUE = config('LOG_QUEUE', default=False, cast=bool)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'structured': {
+            '()': 'callmanagement.log.StructuredFormatter',
+            'fmt': '%(asctime)s %(levelname)s %(name)s %(message)s',
+            'json_lines': LOG_FORMAT == 'json',
+        },
+    },
+    'filters': {
+        'sampling': {
+            '()': 'callmanagement.log.SamplingFilter',
+            'rates': LOG_SAMPLING,
+        },
+    },
+    'handlers': {
+        'callmanagement': {
+            'class': 'callmanagement.log.QueueStreamHandler' if LOG_QUEUE else 'logging.StreamHandler',
+            'stream': 'ext://sys.stdout',
+            'formatter': 'structured',
+            'filters': ['sampling'],
+        },
+    },
+    'loggers': {
+        'callmanagement': {
+            'handlers': ['callmanagement'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
 # CORS settings - Allow all origins for webhook
 CORS_ALLOW_ALL_ORIGINS = True
 